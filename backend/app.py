@@ -1,12 +1,37 @@
 # backend/main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routes import prompts, citations, analyze, domain_insights
+from routes import prompts, citations, analyze, domain_insights, jobs, history
+from utils.ai_client import init_client, close_client
+from utils.jobs import start_workers, stop_workers
+from utils.citation_store import start_citation_store, stop_citation_store
+from utils.duckduckgo import init_http, close_http
+from utils.reference_data import get_reference_data
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled OpenAI client for the whole process: warmed up on startup,
+    # drained and closed on shutdown.
+    await get_reference_data().start()
+    await init_client()
+    await init_http()
+    await start_citation_store()
+    await start_workers()
+    yield
+    await stop_workers()
+    await close_client()
+    await close_http()
+    await stop_citation_store()
+    await get_reference_data().stop()
+
 
 app = FastAPI(
     title="GEO Gap Compass - Backend",
     version="0.1.0",
-    description="OpenAI-powered brand visibility analysis"
+    description="OpenAI-powered brand visibility analysis",
+    lifespan=lifespan
 )
 
 # CORS
@@ -23,6 +48,8 @@ app.include_router(prompts.router)
 app.include_router(citations.router)
 app.include_router(analyze.router)
 app.include_router(domain_insights.router)
+app.include_router(jobs.router)
+app.include_router(history.router)
 
 
 @app.get("/")
@@ -32,8 +59,9 @@ async def root():
 
 @app.get("/health")
 async def health():
-    from utils.ai_client import OPENAI_AVAILABLE
+    from utils.ai_client import OPENAI_AVAILABLE, client_stats
     return {
         "status": "healthy",
-        "openai_enabled": OPENAI_AVAILABLE
+        "openai_enabled": OPENAI_AVAILABLE,
+        "upstream_pool": client_stats()
     }
\ No newline at end of file
@@ -1,10 +1,12 @@
 # backend/routes/analyze.py
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Query
 from typing import List, Optional
 from pydantic import BaseModel
 
 # Import OpenAI functions
 import sys
+import asyncio
+import logging
 from pathlib import Path
 # Add backend to path if needed
 backend_path = Path(__file__).resolve().parent.parent
@@ -17,8 +19,12 @@ from utils.ai_client import (
     generate_gap_analysis,
     OPENAI_AVAILABLE
 )
+from utils.prompt_suite import DEFAULT_TOPIC
+from utils.visibility import sample_visibility, sampling_prompt, heatmap_cell, VISIBILITY_SAMPLING_TIMEOUT
+from utils.brand_aliases import brand_matcher, term_matcher
 
 router = APIRouter()
+logger = logging.getLogger("analyze")
 
 
 # Pydantic models for request validation
@@ -60,6 +66,7 @@ async def analyze_domains(request: DomainAnalysisRequest):
         "tokens_used": result.get("tokens_used"),
         "using_openai": OPENAI_AVAILABLE,
         "is_mock": result.get("is_mock", False),
+        "stale": result.get("stale", False),
         "error": result.get("error")
     }
 
@@ -87,11 +94,12 @@ async def analyze_competitors(request: CompetitorAnalysisRequest):
     # Parse the analysis to extract scores (if possible)
     analysis_text = result.get("analysis", "")
     
-    # Simple scoring based on mentions (you can make this more sophisticated)
+    # Simple scoring based on mentions (names, aliases and owned domains)
+    mention_counts = brand_matcher(request.competitors).scan(analysis_text)
     competitor_scores = []
     for comp in request.competitors:
         # Count mentions as a simple proxy for importance
-        mentions = analysis_text.lower().count(comp.lower())
+        mentions = mention_counts.get(comp, {"count": 0})["count"]
         score = min(100, mentions * 20 + 50)  # Simple scoring algorithm
         competitor_scores.append({
             "name": comp,
@@ -106,6 +114,7 @@ async def analyze_competitors(request: CompetitorAnalysisRequest):
         "tokens_used": result.get("tokens_used"),
         "using_openai": OPENAI_AVAILABLE,
         "is_mock": result.get("is_mock", False),
+        "stale": result.get("stale", False),
         "error": result.get("error")
     }
 
@@ -113,7 +122,10 @@ async def analyze_competitors(request: CompetitorAnalysisRequest):
 @router.get("/gap_heatmap/")
 async def gap_heatmap(
     brand: str,
-    missing_topics: Optional[str] = None
+    missing_topics: Optional[str] = None,
+    competitor: Optional[str] = None,
+    samples: int = Query(0, ge=0, le=50),
+    topic: str = Query(DEFAULT_TOPIC, description="Topic or industry the sampled prompts ask about")
 ):
     """
     Generate gap analysis heatmap using OpenAI.
@@ -121,8 +133,12 @@ async def gap_heatmap(
     Query params:
     - brand: Brand name (required)
     - missing_topics: Comma-separated topics (optional)
+    - competitor: Competitor to score against (optional, used when sampling)
+    - samples: Answers to sample per topic; 0 keeps the single-analysis scores
+    - topic: Topic or industry the sampled prompts ask about (e.g. running shoes)
     
     Example: /gap_heatmap/?brand=Nike&missing_topics=sustainability,innovation,social-media
+    Sampled: /gap_heatmap/?brand=Nike&competitor=Adidas&samples=10&topic=running shoes
     """
     if not brand:
         raise HTTPException(status_code=400, detail="Brand parameter is required")
@@ -134,6 +150,15 @@ async def gap_heatmap(
         # Default topics if none provided
         topics = ["how-to", "comparison", "definition", "reviews", "tutorials"]
     
+    if samples and OPENAI_AVAILABLE:
+        try:
+            return await asyncio.wait_for(
+                sampled_heatmap(brand, topics, competitor, samples, topic), timeout=VISIBILITY_SAMPLING_TIMEOUT
+            )
+        except Exception as e:
+            # Rate limits, an open circuit or a slow provider: fall back to the single estimate
+            logger.warning("Sampling failed in /gap_heatmap, using the single estimate: %r", e)
+    
     # Use OpenAI to analyze gaps
     result = await generate_gap_analysis(
         brand=brand,
@@ -145,10 +170,11 @@ async def gap_heatmap(
     
     # Generate scores based on AI analysis
     # This is a simplified version - you can make it more sophisticated
+    topic_mentions = term_matcher(tuple(topics)).scan(recommendations)
     heatmap_data = []
     for i, topic in enumerate(topics):
-        # Check if topic is mentioned in recommendations
-        mentioned = topic.lower() in recommendations.lower()
+        # Check if topic is mentioned in recommendations (whole words, spelling variants)
+        mentioned = bool(topic_mentions.get(topic, {"count": 0})["count"])
         
         # Simple scoring logic
         your_brand_score = 30 + (i * 10) if mentioned else 20
@@ -169,10 +195,47 @@ async def gap_heatmap(
         "tokens_used": result.get("tokens_used"),
         "using_openai": OPENAI_AVAILABLE,
         "is_mock": result.get("is_mock", False),
+        "stale": result.get("stale", False),
         "error": result.get("error")
     }
 
 
+async def sampled_heatmap(
+    brand: str, topics: List[str], competitor: Optional[str], samples: int, topic: str = DEFAULT_TOPIC
+):
+    """
+    Heatmap scores measured from sampled answers: each topic is asked as a
+    brand-neutral prompt about `topic` and scored by the brand-mention rate,
+    with 95% intervals and early stopping per topic.
+    """
+    estimates = await asyncio.gather(*(
+        sample_visibility(sampling_prompt(t, topic), brand, competitor=competitor, max_samples=samples, prompt_type=t)
+        for t in topics
+    ))
+    
+    heatmap_data = []
+    for topic, estimate in zip(topics, estimates):
+        cell = heatmap_cell(topic, estimate)
+        if "competitorScore" not in cell:
+            # Without a named competitor, everything that is not the brand competes
+            cell["competitorScore"] = 100 - cell["yourBrandScore"]
+        cell["priority"] = "high" if cell["competitorScore"] - cell["yourBrandScore"] > 40 else "medium"
+        heatmap_data.append(cell)
+    
+    return {
+        "brand": brand,
+        "data": heatmap_data,
+        "recommendations": "",
+        "gaps_analyzed": topics,
+        "samples_drawn": sum(e["samples"] for e in estimates),
+        "upstream_calls": sum(e["calls"] for e in estimates),
+        "tokens_used": sum(e["tokens_used"] for e in estimates),
+        "using_openai": OPENAI_AVAILABLE,
+        "is_mock": False,
+        "error": None
+    }
+
+
 @router.get("/health")
 async def health_check():
     """Check if OpenAI is available."""
@@ -1,10 +1,13 @@
 # backend/routes/citations.py
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse, Response
+import os
 import re
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple
 import sys
 from pathlib import Path
 import json
+import asyncio
 import logging
 
 # Add backend to path if needed
@@ -12,7 +15,23 @@ backend_path = Path(__file__).resolve().parent.parent
 if str(backend_path) not in sys.path:
     sys.path.insert(0, str(backend_path))
 
-from utils.ai_client import generate_with_citations, OPENAI_AVAILABLE
+from utils.ai_client import stream_structured, OPENAI_AVAILABLE
+from utils.llm_cache import ttl_for
+from utils.prompt_suite import DEFAULT_TOPIC
+from utils.visibility import (
+    sample_visibility,
+    sampling_prompt,
+    heatmap_cell,
+    rollup_cell,
+    VISIBILITY_ROLLUP_MIN_ANSWERS,
+    VISIBILITY_ROLLUP_DAYS,
+    VISIBILITY_SAMPLING_TIMEOUT,
+)
+from utils.citation_store import get_citation_store
+from utils.text_index import TextIndex
+from utils.citation_extract import extract_citations, extract_many
+from utils.brand_domains import get_brand_domains
+from utils.structured import BrandMissingAnalysis, BrandPresenceAnalysis, BrandGapAnalysis
 
 # <-- IMPORTANT: prefix so frontend can call /citations/...
 router = APIRouter(prefix="/citations")
@@ -20,8 +39,11 @@ router = APIRouter(prefix="/citations")
 logger = logging.getLogger("citations")
 logger.setLevel(logging.INFO)
 
-URL_RE = re.compile(r"https?://[^\s,\)]+", re.IGNORECASE)
 MAX_CITATIONS = 10
+# NDJSON lines handed to the extractor at a time by /extract/bulk
+EXTRACT_BULK_BATCH = 200
+# /extract/bulk buffers its response, so the request body is capped
+EXTRACT_BULK_MAX_BYTES = int(os.getenv("EXTRACT_BULK_MAX_BYTES", str(32 * 1024 * 1024)))
 
 
 # -----------------------
@@ -34,6 +56,7 @@ class ExtractResponse(BaseModel):
     urls: List[str]
     count: int
     original_text_length: int
+    citations: List[Dict[str, Any]] = []
 
 
 class BrandMissingResponse(BaseModel):
@@ -49,6 +72,7 @@ class BrandMissingResponse(BaseModel):
     tokens_used: Optional[int]
     using_openai: bool
     is_mock: bool
+    stale: bool = False
 
 
 class AnalyzeBrandPresenceResponse(BaseModel):
@@ -59,10 +83,12 @@ class AnalyzeBrandPresenceResponse(BaseModel):
     structured_analysis: Optional[Dict[str, Any]] = None
     citations: List[str]
     citation_count: int
+    citation_share: Dict[str, int] = {}
     tokens_used: Optional[int]
     using_openai: bool
     recommendations: List[str]
     is_mock: bool
+    stale: bool = False
 
 
 class HealthResponse(BaseModel):
@@ -92,29 +118,35 @@ def extract_recommendations(text: str) -> List[str]:
     return recommendations[:10]
 
 
-def try_parse_structured(response_text: str) -> Optional[Dict[str, Any]]:
-    """
-    If the AI returned a JSON string, parse it and return the dict.
-    If parsing fails or it's not JSON, return None.
-    """
-    if not response_text:
-        return None
-    # Heuristic: if it starts with { or [, try json.loads
-    trimmed = response_text.strip()
-    if trimmed.startswith("{") or trimmed.startswith("["):
+def merge_citations(*groups: Optional[List[str]]) -> List[str]:
+    """Citation URLs from several sources, deduplicated in order."""
+    return list(dict.fromkeys(url for group in groups for url in (group or []) if isinstance(url, str)))
+
+
+async def final_result(events: AsyncIterator[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Drain an analysis event stream and return its result payload."""
+    result: Dict[str, Any] = {}
+    async for kind, data in events:
+        if kind == "result":
+            result = data
+    return result
+
+
+def sse_response(events: AsyncIterator[Tuple[str, Dict[str, Any]]]) -> StreamingResponse:
+    """Serve an analysis event stream as server-sent events."""
+    async def body():
         try:
-            return json.loads(trimmed)
-        except Exception:
-            # Try a relaxed attempt: find first { and last } and attempt parse
-            try:
-                start = trimmed.find("{")
-                end = trimmed.rfind("}")
-                if start != -1 and end != -1 and end > start:
-                    snippet = trimmed[start : end + 1]
-                    return json.loads(snippet)
-            except Exception:
-                return None
-    return None
+            async for kind, data in events:
+                yield f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            logger.exception("Analysis stream failed: %s", e)
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # -----------------------
@@ -123,29 +155,99 @@ def try_parse_structured(response_text: str) -> Optional[Dict[str, Any]]:
 @router.get("/extract", response_model=ExtractResponse)
 async def extract_urls(text: str = Query(..., description="Text to extract URLs from")):
     """
-    Extract URLs from text using regex.
-    Simple utility endpoint that doesn't require OpenAI.
+    Extract citations (markdown links, URLs and bare domains) from text.
+    Simple utility endpoint that doesn't require OpenAI; use
+    POST /extract/bulk for many or long answers.
     """
-    found = URL_RE.findall(text or "")
-    # Clean up URLs (remove trailing punctuation)
-    cleaned = [url.rstrip(".,;:!?)") for url in found]
+    citations = extract_citations(text or "")
     return {
-        "urls": cleaned,
-        "count": len(cleaned),
+        "urls": [c["url"] for c in citations],
+        "count": len(citations),
         "original_text_length": len(text or ""),
+        "citations": citations,
     }
 
 
-@router.get("/brand-missing", response_model=BrandMissingResponse)
-async def brand_missing(
-    brand: str = Query(..., description="Brand name to analyze"),
-    prompt_types: str = Query("", description="Comma-separated prompt types (e.g., how-to,comparison,definition)"),
-):
+def _bulk_line(number: int, line: bytes) -> Dict[str, Any]:
+    """Parse one NDJSON line: {"id": ..., "text": ...} or a bare JSON string."""
+    try:
+        item = json.loads(line)
+    except ValueError as e:
+        return {"id": number, "error": f"Invalid JSON: {e}"}
+    if isinstance(item, str):
+        return {"id": number, "text": item}
+    if not isinstance(item, dict) or not isinstance(item.get("text"), str):
+        return {"id": number, "error": "Expected a string or an object with a \"text\" field"}
+    return {"id": item.get("id", number), "text": item["text"]}
+
+
+def _extract_batch(items: List[Dict[str, Any]]) -> str:
+    texts = [item["text"] for item in items if "text" in item]
+    results = iter(extract_many(texts))
+    out = []
+    for item in items:
+        if "error" in item:
+            out.append(json.dumps(item))
+            continue
+        citations = next(results)
+        out.append(json.dumps({
+            "id": item["id"],
+            "urls": [c["url"] for c in citations],
+            "count": len(citations),
+            "citations": citations,
+        }))
+    return "\n".join(out) + "\n"
+
+
+@router.post("/extract/bulk")
+async def extract_urls_bulk(request: Request):
     """
-    Analyze which prompt types are missing brand mentions using OpenAI.
-
-    Example: /brand-missing?brand=Nike&prompt_types=how-to,comparison,reviews
+    Extract citations from many answers at once.
+
+    The body is NDJSON, one answer per line ({"id": ..., "text": ...} or a
+    JSON string); the response is NDJSON in the same order, one result per
+    line. Lines are extracted in batches as the body arrives, but the
+    response is only sent once the whole body has been read, so bodies over
+    EXTRACT_BULK_MAX_BYTES are rejected with 413.
+    Malformed lines come back as {"id", "error"}.
     """
+    # Read the body before responding: a streaming response's disconnect
+    # listener would otherwise compete for the request messages.
+    out: List[str] = []
+    pending: List[bytes] = []  # pieces of the line still arriving
+    batch: List[Dict[str, Any]] = []
+    number = 0
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > EXTRACT_BULK_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Body larger than {EXTRACT_BULK_MAX_BYTES} bytes")
+        if b"\n" not in chunk:
+            pending.append(chunk)
+            continue
+        head, *lines, tail = chunk.split(b"\n")
+        lines[:0] = [b"".join(pending) + head]
+        pending = [tail]
+        for line in lines:
+            if not line.strip():
+                continue
+            number += 1
+            batch.append(_bulk_line(number, line))
+            if len(batch) >= EXTRACT_BULK_BATCH:
+                out.append(await asyncio.to_thread(_extract_batch, batch))
+                batch = []
+    rest = b"".join(pending)
+    if rest.strip():
+        number += 1
+        batch.append(_bulk_line(number, rest))
+    if batch:
+        out.append(await asyncio.to_thread(_extract_batch, batch))
+
+    return Response("".join(out), media_type="application/x-ndjson")
+
+
+async def brand_missing_events(brand: str, prompt_types: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """("partial", analysis so far) events, then ("result", BrandMissingResponse payload)."""
     # Parse prompt types
     if prompt_types:
         prompt_list = [p.strip() for p in prompt_types.split(",") if p.strip()]
@@ -161,7 +263,7 @@ For each content type, assess:
 4. Gaps or opportunities
 
 Identify which content types have the WEAKEST {brand} presence.
-Return a clear summary and (optionally) a JSON object with fields 'missing' and 'strong' if possible.
+Return JSON: "summary" (a clear summary), "missing" and "strong" (lists of the content types above), "citations" (source URLs).
 """
 
     ai_response_text = ""
@@ -169,14 +271,24 @@ Return a clear summary and (optionally) a JSON object with fields 'missing' and
     tokens_used = None
     structured = None
     is_mock = False
+    stale = False
 
     if OPENAI_AVAILABLE:
         try:
-            result = await generate_with_citations(prompt=analysis_prompt, brand=brand, include_web_search=True)
-            ai_response_text = result.get("response", "") or ""
-            citations = result.get("citations", []) or []
-            tokens_used = result.get("tokens_used")
-            structured = try_parse_structured(ai_response_text)
+            async for event in stream_structured(
+                prompt=analysis_prompt, brand=brand, schema=BrandMissingAnalysis, cache_ttl=ttl_for("brand-missing")
+            ):
+                if event["type"] == "partial":
+                    yield "partial", event["data"]
+                    continue
+                result = event["result"]
+                structured = result.get("structured")
+                ai_response_text = (structured or {}).get("summary") or result.get("response", "") or ""
+                citations = merge_citations((structured or {}).get("citations"), result.get("citations"))
+                tokens_used = result.get("tokens_used")
+                # Served from the cache or the mock path while the provider is down
+                is_mock = bool(result.get("is_mock"))
+                stale = bool(result.get("stale"))
         except Exception as e:
             logger.exception("OpenAI call failed in /brand-missing: %s", e)
             # Fall back to mock analysis
@@ -188,60 +300,35 @@ Return a clear summary and (optionally) a JSON object with fields 'missing' and
         is_mock = True
 
     # Parse the AI response to identify missing prompt types (best-effort)
-    response_text = (ai_response_text or "").lower()
-
     missing = []
     strong = []
     weak_indicators = ["weak", "limited", "missing", "gap", "opportunity", "needs improvement", "lacking"]
     strong_indicators = ["strong", "good", "well-covered", "comprehensive", "abundant"]
+    index = TextIndex(ai_response_text, prompt_list + weak_indicators + strong_indicators)
 
     for prompt_type in prompt_list:
-        type_lower = prompt_type.lower()
-        # If structured JSON provided and contains missing/strong lists, prefer those
-        if structured and isinstance(structured, dict):
-            try:
-                s_missing = structured.get("missing", [])
-                s_strong = structured.get("strong", [])
-                if isinstance(s_missing, list) and prompt_type in s_missing:
-                    missing.append(prompt_type)
-                    continue
-                if isinstance(s_strong, list) and prompt_type in s_strong:
-                    strong.append(prompt_type)
-                    continue
-            except Exception:
-                # ignore structured parsing errors and fallback to text heuristics
-                pass
-
-        # Fallback heuristics using text proximity
-        is_weak = False
-        is_strong = False
-        if type_lower in response_text:
-            # find positions
-            try:
-                idx_type = response_text.find(type_lower)
-                for indicator in weak_indicators:
-                    if indicator in response_text:
-                        idx_ind = response_text.find(indicator)
-                        if abs(idx_ind - idx_type) < 150:
-                            is_weak = True
-                            break
-                for indicator in strong_indicators:
-                    if indicator in response_text:
-                        idx_ind = response_text.find(indicator)
-                        if abs(idx_ind - idx_type) < 150:
-                            is_strong = True
-                            break
-            except Exception:
-                pass
-
-        if is_weak or (type_lower not in response_text and len(missing) < 3):
+        # Structured missing/strong lists are authoritative when present
+        if structured:
+            if prompt_type in structured["missing"]:
+                missing.append(prompt_type)
+                continue
+            if prompt_type in structured["strong"]:
+                strong.append(prompt_type)
+                continue
+
+        # Fallback heuristics using text proximity (any mention of the type,
+        # any indicator within the window)
+        is_weak = bool(index.near(prompt_type, weak_indicators))
+        is_strong = bool(index.near(prompt_type, strong_indicators))
+
+        if is_weak or (not index.contains(prompt_type) and len(missing) < 3):
             missing.append(prompt_type)
         elif is_strong:
             strong.append(prompt_type)
 
-    brand_in_citations = any(brand.lower() in (url.lower() if isinstance(url, str) else "") for url in citations)
+    brand_in_citations = get_brand_domains().owns(brand, citations)
 
-    return {
+    yield "result", {
         "brand": brand,
         "prompt_types_analyzed": prompt_list,
         "missing_prompt_types": missing,
@@ -254,20 +341,34 @@ Return a clear summary and (optionally) a JSON object with fields 'missing' and
         "tokens_used": tokens_used,
         "using_openai": OPENAI_AVAILABLE,
         "is_mock": is_mock,
+        "stale": stale,
     }
 
 
-@router.get("/analyze-brand-presence", response_model=AnalyzeBrandPresenceResponse)
-async def analyze_brand_presence(
-    brand: str = Query(..., description="Brand name"),
-    competitors: str = Query("", description="Comma-separated competitor names"),
-    topic: str = Query("general marketing", description="Topic or industry to analyze"),
+@router.get("/brand-missing", response_model=BrandMissingResponse)
+async def brand_missing(
+    brand: str = Query(..., description="Brand name to analyze"),
+    prompt_types: str = Query("", description="Comma-separated prompt types (e.g., how-to,comparison,definition)"),
 ):
     """
-    Deep analysis of brand presence compared to competitors using OpenAI.
+    Analyze which prompt types are missing brand mentions using OpenAI.
 
-    Example: /analyze-brand-presence?brand=Nike&competitors=Adidas,Puma&topic=athletic footwear
+    Example: /brand-missing?brand=Nike&prompt_types=how-to,comparison,reviews
     """
+    return await final_result(brand_missing_events(brand, prompt_types))
+
+
+@router.get("/brand-missing/stream")
+async def brand_missing_stream(
+    brand: str = Query(..., description="Brand name to analyze"),
+    prompt_types: str = Query("", description="Comma-separated prompt types (e.g., how-to,comparison,definition)"),
+):
+    """Streaming variant of /brand-missing: `partial` events, then one `result` event."""
+    return sse_response(brand_missing_events(brand, prompt_types))
+
+
+async def brand_presence_events(brand: str, competitors: str, topic: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """("partial", analysis so far) events, then ("result", AnalyzeBrandPresenceResponse payload)."""
     competitor_list = [c.strip() for c in competitors.split(",") if c.strip()] if competitors else []
 
     analysis_prompt = f"""Analyze {brand}'s online presence and citation visibility in {topic}.
@@ -280,7 +381,7 @@ Provide:
 3. Gaps compared to competitors
 4. Recommendations to improve visibility
 
-If possible, return a JSON object with keys: citations (list), recommendations (list), summary (string).
+Return JSON with keys: summary (string), citations (list of URLs), recommendations (list).
 """
 
     ai_response_text = ""
@@ -288,14 +389,24 @@ If possible, return a JSON object with keys: citations (list), recommendations (
     tokens_used = None
     structured = None
     is_mock = False
+    stale = False
 
     if OPENAI_AVAILABLE:
         try:
-            result = await generate_with_citations(prompt=analysis_prompt, brand=brand, include_web_search=True)
-            ai_response_text = result.get("response", "") or ""
-            citations = result.get("citations", []) or []
-            tokens_used = result.get("tokens_used")
-            structured = try_parse_structured(ai_response_text)
+            async for event in stream_structured(
+                prompt=analysis_prompt, brand=brand, schema=BrandPresenceAnalysis, cache_ttl=ttl_for("analyze-brand-presence")
+            ):
+                if event["type"] == "partial":
+                    yield "partial", event["data"]
+                    continue
+                result = event["result"]
+                structured = result.get("structured")
+                ai_response_text = (structured or {}).get("summary") or result.get("response", "") or ""
+                citations = merge_citations((structured or {}).get("citations"), result.get("citations"))
+                tokens_used = result.get("tokens_used")
+                # Served from the cache or the mock path while the provider is down
+                is_mock = bool(result.get("is_mock"))
+                stale = bool(result.get("stale"))
         except Exception as e:
             logger.exception("OpenAI call failed in /analyze-brand-presence: %s", e)
             ai_response_text = f"Mock analysis for {brand}: OpenAI call failed."
@@ -305,17 +416,11 @@ If possible, return a JSON object with keys: citations (list), recommendations (
         is_mock = True
 
     recommendations = extract_recommendations(ai_response_text)
-    if structured and isinstance(structured, dict):
-        # If structured JSON contains recommendations, prefer them
-        try:
-            s_recs = structured.get("recommendations") or structured.get("recommend") or structured.get("recommendation")
-            if isinstance(s_recs, list) and len(s_recs) > 0:
-                # convert to strings
-                recommendations = [str(r) for r in s_recs[:10]]
-        except Exception:
-            pass
+    if structured and structured["recommendations"]:
+        # Structured recommendations are preferred over the bullet heuristics
+        recommendations = [str(r) for r in structured["recommendations"][:10]]
 
-    return {
+    yield "result", {
         "brand": brand,
         "competitors": competitor_list,
         "topic": topic,
@@ -323,51 +428,138 @@ If possible, return a JSON object with keys: citations (list), recommendations (
         "structured_analysis": structured,
         "citations": citations[:MAX_CITATIONS],
         "citation_count": len(citations),
+        # Citations on domains owned by the brand and each competitor
+        "citation_share": get_brand_domains().share(citations, [brand] + competitor_list),
         "tokens_used": tokens_used,
         "using_openai": OPENAI_AVAILABLE,
         "recommendations": recommendations,
         "is_mock": is_mock,
+        "stale": stale,
     }
-@router.get("/brand-gap")
-async def brand_gap(
-    brand: str = Query(..., description="Your brand name"),
-    competitor: str = Query(..., description="Competitor brand name"),
+
+
+@router.get("/analyze-brand-presence", response_model=AnalyzeBrandPresenceResponse)
+async def analyze_brand_presence(
+    brand: str = Query(..., description="Brand name"),
+    competitors: str = Query("", description="Comma-separated competitor names"),
+    topic: str = Query("general marketing", description="Topic or industry to analyze"),
 ):
     """
-    Compare brand visibility across common prompt types (how-to, comparison, definition, etc.)
-    Returns structured data for the frontend heatmap.
+    Deep analysis of brand presence compared to competitors using OpenAI.
+
+    Example: /analyze-brand-presence?brand=Nike&competitors=Adidas,Puma&topic=athletic footwear
     """
+    return await final_result(brand_presence_events(brand, competitors, topic))
+
+
+@router.get("/analyze-brand-presence/stream")
+async def analyze_brand_presence_stream(
+    brand: str = Query(..., description="Brand name"),
+    competitors: str = Query("", description="Comma-separated competitor names"),
+    topic: str = Query("general marketing", description="Topic or industry to analyze"),
+):
+    """Streaming variant of /analyze-brand-presence: `partial` events, then one `result` event."""
+    return sse_response(brand_presence_events(brand, competitors, topic))
+
+
+async def brand_gap_events(
+    brand: str, competitor: str, samples: int, topic: str
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """("partial", rows so far) events from the AI estimate, then ("result", heatmap payload)."""
     prompt_types = ["how-to", "comparison", "definition", "reviews", "use-case"]
 
+    store = get_citation_store()
+    if store is not None:
+        # Sampled answers for this pair are rolled up from now on
+        store.track_competitor(brand, competitor)
+    if not samples and store is not None:
+        try:
+            counts = await asyncio.to_thread(store.heatmap, brand, competitor, VISIBILITY_ROLLUP_DAYS, prompt_types)
+            if all(counts.get(pt, {}).get("answers", 0) >= VISIBILITY_ROLLUP_MIN_ANSWERS for pt in prompt_types):
+                yield "result", {
+                    "brand": brand,
+                    "competitor": competitor,
+                    "data": [rollup_cell(pt, counts[pt]) for pt in prompt_types],
+                    "source": "history",
+                    "tokens_used": 0,
+                    "using_openai": False,
+                    "is_mock": False,
+                }
+                return
+        except Exception as e:
+            logger.exception("Rollup lookup failed in /brand-gap: %s", e)
+
+    if samples and OPENAI_AVAILABLE:
+        try:
+            estimates = await asyncio.wait_for(asyncio.gather(*(
+                sample_visibility(sampling_prompt(pt, topic), brand, competitor=competitor, max_samples=samples, prompt_type=pt)
+                for pt in prompt_types
+            )), timeout=VISIBILITY_SAMPLING_TIMEOUT)
+            yield "result", {
+                "brand": brand,
+                "competitor": competitor,
+                "data": [heatmap_cell(pt, est) for pt, est in zip(prompt_types, estimates)],
+                "samples_drawn": sum(est["samples"] for est in estimates),
+                "upstream_calls": sum(est["calls"] for est in estimates),
+                "source": "sampling",
+                "tokens_used": sum(est["tokens_used"] for est in estimates),
+                "using_openai": True,
+                "is_mock": False,
+            }
+            return
+        except Exception as e:
+            logger.exception("Sampling failed in /brand-gap: %s", e)
+
     # If OpenAI available, generate structured output
+    tokens_used = None
+    structured_error = None
     if OPENAI_AVAILABLE:
         try:
             prompt = f"""
             Compare online citation visibility of {brand} vs {competitor}
             across the following prompt types: {', '.join(prompt_types)}.
 
-            Return a JSON object with this structure:
-            [
-              {{ "promptType": "how-to", "yourBrandScore": 50, "competitorScore": 70 }},
-              ...
-            ]
+            Return JSON: {{"data": [{{ "promptType": "how-to", "yourBrandScore": 50, "competitorScore": 70 }}, ...]}}
+            with one row per prompt type.
             The scores represent % strength (0–100) of citation presence.
             """
-            result = await generate_with_citations(prompt=prompt, brand=brand, include_web_search=True)
-            ai_text = result.get("response", "")
-            parsed = try_parse_structured(ai_text)
-            if isinstance(parsed, list) and all("promptType" in x for x in parsed):
-                return {
-                    "brand": brand,
-                    "competitor": competitor,
-                    "data": parsed,
-                    "using_openai": True,
-                    "is_mock": False,
-                }
+            wanted = set(prompt_types)
+
+            def covers_prompt_types(analysis: BrandGapAnalysis) -> Optional[str]:
+                got = {row.promptType for row in analysis.data}
+                if got == wanted and len(analysis.data) == len(wanted):
+                    return None
+                return f"Rows must be exactly one per promptType in {sorted(wanted)}; got {sorted(got)}"
+
+            async for event in stream_structured(
+                prompt=prompt, brand=brand, schema=BrandGapAnalysis, max_tokens=400, cache_ttl=ttl_for("brand-gap"),
+                check=covers_prompt_types
+            ):
+                if event["type"] == "partial":
+                    yield "partial", {"data": [row for row in event["data"]["data"] if row["promptType"] in wanted]}
+                    continue
+                result = event["result"]
+                tokens_used = result.get("tokens_used")
+                structured_error = result.get("structured_error") or result.get("error")
+                structured = result.get("structured")
+                if structured and structured["data"]:
+                    yield "result", {
+                        "brand": brand,
+                        "competitor": competitor,
+                        "data": structured["data"],
+                        "source": "estimate",
+                        "repaired": result.get("repaired", False),
+                        "tokens_used": tokens_used,
+                        "using_openai": True,
+                        "is_mock": False,
+                        "stale": bool(result.get("stale")),
+                    }
+                    return
         except Exception as e:
             logger.exception("AI failed in /brand-gap: %s", e)
+            structured_error = str(e)
 
-    # Fallback mock data (if OpenAI unavailable or invalid response)
+    # Fallback mock data (if OpenAI unavailable or the output could not be repaired)
     mock_data = [
         {"promptType": "how-to", "yourBrandScore": 40, "competitorScore": 75},
         {"promptType": "comparison", "yourBrandScore": 30, "competitorScore": 60},
@@ -375,20 +567,55 @@ async def brand_gap(
         {"promptType": "reviews", "yourBrandScore": 50, "competitorScore": 80},
         {"promptType": "use-case", "yourBrandScore": 35, "competitorScore": 55},
     ]
-    return {
+    yield "result", {
         "brand": brand,
         "competitor": competitor,
         "data": mock_data,
+        "source": "mock",
+        "tokens_used": tokens_used,
+        "error": structured_error,
         "using_openai": False,
         "is_mock": True,
     }
 
 
+@router.get("/brand-gap")
+async def brand_gap(
+    brand: str = Query(..., description="Your brand name"),
+    competitor: str = Query(..., description="Competitor brand name"),
+    samples: int = Query(0, ge=0, le=50, description="Answers to sample per prompt type (0 = one structured estimate)"),
+    topic: str = Query(DEFAULT_TOPIC, description="Topic used when sampling"),
+):
+    """
+    Compare brand visibility across common prompt types (how-to, comparison, definition, etc.)
+    Returns structured data for the frontend heatmap.
+
+    With samples > 0, each prompt type is asked directly and scored by how
+    often the sampled answers mention each brand, with a 95% interval.
+    Otherwise, when earlier sampling has stored enough answers for every
+    prompt type, scores come from the visibility rollups without any
+    upstream call. `source` says which it was: "sampling", "history",
+    "estimate" (one structured model estimate) or "mock".
+    """
+    return await final_result(brand_gap_events(brand, competitor, samples, topic))
+
+
+@router.get("/brand-gap/stream")
+async def brand_gap_stream(
+    brand: str = Query(..., description="Your brand name"),
+    competitor: str = Query(..., description="Competitor brand name"),
+    samples: int = Query(0, ge=0, le=50, description="Answers to sample per prompt type (0 = one structured estimate)"),
+    topic: str = Query(DEFAULT_TOPIC, description="Topic used when sampling"),
+):
+    """Streaming variant of /brand-gap: `partial` rows as the estimate streams, then one `result` event."""
+    return sse_response(brand_gap_events(brand, competitor, samples, topic))
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     """Check if citations routes and OpenAI are available."""
     return {
         "status": "healthy",
         "openai_available": OPENAI_AVAILABLE,
-        "routes": ["extract", "brand-missing", "analyze-brand-presence"],
+        "routes": ["extract", "extract/bulk", "brand-missing", "analyze-brand-presence", "brand-gap"],
     }
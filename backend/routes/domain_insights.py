@@ -1,10 +1,11 @@
 # backend/routes/domain_insights.py
 
 from fastapi import APIRouter, Query, HTTPException
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel
-import httpx
-import json
+import os
+import time
+import asyncio
 from pathlib import Path
 import sys
 
@@ -14,12 +15,18 @@ if str(backend_path) not in sys.path:
     sys.path.insert(0, str(backend_path))
 
 from utils.ai_client import generate_with_citations, analyze_domains, OPENAI_AVAILABLE
+from utils.llm_cache import ttl_for
+from utils.citation_store import domain_series
+from utils.timeseries import get_timeseries
+from utils.duckduckgo import fetch_domains_info
+from utils.domain_cache import get_domain_cache
+from utils.reference_data import get_reference_data
+from utils.text_index import TextIndex
 
 router = APIRouter(prefix="/insights", tags=["domain insights"])
 
-# Demo data path
-BASE_DIR = Path(__file__).resolve().parents[2]
-DEMO_PATH = BASE_DIR / "demo_data" / "fake_time_series.json"
+# Budget for the AI analysis phase (enrichment has its own DDG_DEADLINE)
+INSIGHTS_AI_TIMEOUT = float(os.getenv("INSIGHTS_AI_TIMEOUT", "30"))
 
 
 class DomainInsightRequest(BaseModel):
@@ -29,35 +36,51 @@ class DomainInsightRequest(BaseModel):
 
 
 def load_demo_data():
-    """Load fallback demo data."""
-    try:
-        with DEMO_PATH.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {"default": {"visibility": 50, "trend": [45, 47, 49, 50]}}
+    """Fallback demo data (memory-resident, reloaded when the file changes)."""
+    return get_reference_data()
 
 
-async def fetch_domain_info_duckduckgo(domain: str) -> Dict[str, Any]:
-    """Fetch basic domain info from DuckDuckGo API."""
-    try:
-        url = f"https://api.duckduckgo.com/?q={domain}&format=json&no_html=1"
-        async with httpx.AsyncClient(timeout=10) as client:
-            resp = await client.get(url)
-            data = resp.json()
-
-        return {
-            "title": data.get("Heading") or domain,
-            "description": data.get("Abstract") or "No description available.",
-            "image": data.get("Image") or "https://dummyimage.com/600x400/ccc/000.png&text=No+Image",
-            "source": "DuckDuckGo"
-        }
-    except Exception:
-        return {
-            "title": domain,
-            "description": f"Could not fetch data for {domain}",
-            "image": "https://dummyimage.com/600x400/ddd/000.png&text=No+Data",
-            "source": "error"
+def load_history(domains: List[str], brand: Optional[str] = None, days: int = 7) -> Dict[str, Dict[str, Any]]:
+    """
+    Visibility and daily trend from the citation time series, over the
+    answers given for `brand` (all answers when no brand is given).
+    Domains never cited in the window are left out (callers use demo data).
+    """
+    series = get_timeseries()
+    end = time.time()
+    history = {}
+    for domain in domains:
+        name, total = domain_series(domain, brand)
+        trend = series.share(name, total, start=end - days * 86400, end=end, resolution="day")
+        citing = sum(day["count"] for day in trend)
+        if not citing:
+            continue
+        total = sum(day["total"] for day in trend)
+        history[domain] = {
+            "visibility": round(100 * citing / total),
+            "trend": [day["share"] for day in trend],
+            "trend_source": "history"
         }
+    return history
+
+
+async def timed(coro) -> Tuple[Any, float]:
+    """Await `coro` and return (result, elapsed ms)."""
+    started = time.perf_counter()
+    result = await coro
+    return result, round((time.perf_counter() - started) * 1000, 1)
+
+
+async def ai_phase(domains: List[str], brand: str, timeout: float = INSIGHTS_AI_TIMEOUT) -> Dict[str, Any]:
+    """analyze_domains() bounded by its own timeout; never raises."""
+    try:
+        return await asyncio.wait_for(analyze_domains(domains=domains, brand=brand), timeout=timeout)
+    except asyncio.TimeoutError:
+        return {"analysis": "", "error": f"AI analysis timed out after {timeout}s"}
+
+
+async def skipped_phase(value: Dict[str, Any]) -> Dict[str, Any]:
+    return value
 
 
 @router.get("/domain-stats")
@@ -78,25 +101,35 @@ async def get_domain_stats(
     
     demo = load_demo_data()
     results = {}
+    run_ai = include_ai_analysis and brand and OPENAI_AVAILABLE
+
+    # History, DuckDuckGo enrichment and AI analysis are independent: run them
+    # together, each with its own time budget
+    started = time.perf_counter()
+    (history, history_ms), (ddg, enrichment_ms), (ai_result, analysis_ms) = await asyncio.gather(
+        timed(asyncio.to_thread(load_history, domain_list, brand)),
+        timed(fetch_domains_info(domain_list)),
+        timed(ai_phase(domain_list, brand) if run_ai else skipped_phase({}))
+    )
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
 
-    # Fetch basic info for each domain
     for domain in domain_list:
         try:
-            # Get DuckDuckGo data
-            ddg_info = await fetch_domain_info_duckduckgo(domain)
+            ddg_info = ddg["results"][domain]
             
-            # Add demo trend data
-            base = demo.get(domain, demo.get("default", {"visibility": 50, "trend": [45, 47, 49, 50]}))
+            # Stored citation history first, demo trend data otherwise
+            base = history.get(domain) or demo.domain_trend(domain)
             
             results[domain] = {
                 **ddg_info,
                 "visibility_score": base.get("visibility", 50),
-                "trend": base.get("trend", [45, 47, 49, 50])
+                "trend": base.get("trend", [45, 47, 49, 50]),
+                "trend_source": base.get("trend_source", "demo")
             }
             
         except Exception as e:
             # Fallback to demo data
-            base = demo.get("default", {"visibility": 50, "trend": [45, 47, 49, 50]})
+            base = demo.domain_trend("default")
             results[domain] = {
                 "title": domain,
                 "description": f"Demo data for {domain}",
@@ -107,24 +140,24 @@ async def get_domain_stats(
                 "error": str(e)
             }
 
-    # Add OpenAI analysis if requested and brand provided
-    ai_analysis = None
-    tokens_used = 0
-    
-    if include_ai_analysis and brand and OPENAI_AVAILABLE:
-        ai_result = await analyze_domains(
-            domains=domain_list,
-            brand=brand
-        )
-        ai_analysis = ai_result.get("analysis", "")
-        tokens_used = ai_result.get("tokens_used", 0)
+    # OpenAI analysis if requested and brand provided
+    ai_analysis = ai_result.get("analysis", "") if run_ai else None
+    tokens_used = ai_result.get("tokens_used", 0)
 
     return {
         "domains": results,
         "brand": brand,
         "ai_analysis": ai_analysis,
+        "ai_error": ai_result.get("error"),
         "tokens_used": tokens_used,
         "using_openai": OPENAI_AVAILABLE and include_ai_analysis,
+        "enrichment": {"elapsed_ms": ddg["elapsed_ms"], "timed_out": ddg["timed_out"]},
+        "timings": {
+            "history_ms": history_ms,
+            "enrichment_ms": enrichment_ms,
+            "analysis_ms": analysis_ms if run_ai else None,
+            "total_ms": total_ms
+        },
         "note": "Combined DuckDuckGo API data with OpenAI analysis"
     }
 
@@ -146,14 +179,24 @@ async def analyze_domains_detailed(request: DomainInsightRequest):
     
     demo = load_demo_data()
     
-    # Priority 1: Get basic domain info from DuckDuckGo
+    # DuckDuckGo enrichment and OpenAI analysis run concurrently, each with
+    # its own time budget; the response waits for the slower one only
+    started = time.perf_counter()
+    (history, history_ms), (ddg, enrichment_ms), (ai_result, analysis_ms) = await asyncio.gather(
+        timed(asyncio.to_thread(load_history, request.domains, request.brand)),
+        timed(fetch_domains_info(request.domains)),
+        timed(ai_phase(request.domains, request.brand) if OPENAI_AVAILABLE else skipped_phase({}))
+    )
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    
+    # Priority 1: Basic domain info from DuckDuckGo
     basic_info = {}
     for domain in request.domains:
-        ddg_data = await fetch_domain_info_duckduckgo(domain)
+        ddg_data = ddg["results"][domain]
         
-        # If DuckDuckGo failed, fallback to demo data
+        # If DuckDuckGo failed, fallback to stored history or demo data
         if ddg_data.get("source") == "error":
-            base = demo.get(domain, demo.get("default", {"visibility": 50}))
+            base = history.get(domain) or demo.domain_trend(domain)
             basic_info[domain] = {
                 "title": domain,
                 "description": f"Demo data (DuckDuckGo unavailable): {domain}",
@@ -164,17 +207,12 @@ async def analyze_domains_detailed(request: DomainInsightRequest):
         else:
             basic_info[domain] = ddg_data
     
-    # Priority 2: Get AI analysis from OpenAI (if available)
-    ai_result = None
+    # Priority 2: AI analysis from OpenAI (if available)
     analysis_text = ""
     tokens_used = 0
     is_mock = False
     
     if OPENAI_AVAILABLE:
-        ai_result = await analyze_domains(
-            domains=request.domains,
-            brand=request.brand
-        )
         analysis_text = ai_result.get("analysis", "")
         tokens_used = ai_result.get("tokens_used", 0)
         is_mock = ai_result.get("is_mock", False)
@@ -183,19 +221,21 @@ async def analyze_domains_detailed(request: DomainInsightRequest):
         analysis_text = f"Mock analysis for {request.brand} domains: {', '.join(request.domains)}"
         is_mock = True
     
-    # Extract insights per domain
+    # Extract insights per domain from one index of the analysis
+    authority_keywords = ["authoritative", "credible", "trusted", "reputable", "high authority"]
+    relevance_keywords = [request.brand.lower(), "relevant", "related", "pertinent"]
+    index = TextIndex(analysis_text, request.domains + authority_keywords + relevance_keywords)
+    
     domain_insights = {}
     for domain in request.domains:
         # Count mentions in analysis
-        mentions = analysis_text.lower().count(domain.lower())
+        mentions = index.count(domain)
         
-        # Look for authority indicators
-        authority_keywords = ["authoritative", "credible", "trusted", "reputable", "high authority"]
-        has_authority = any(keyword in analysis_text.lower() for keyword in authority_keywords)
+        # Look for authority indicators near this domain's mentions
+        has_authority = bool(index.near(domain, authority_keywords))
         
-        # Look for relevance indicators
-        relevance_keywords = [request.brand.lower(), "relevant", "related", "pertinent"]
-        relevance_score = sum(1 for keyword in relevance_keywords if keyword in analysis_text.lower())
+        # Look for relevance indicators near this domain's mentions
+        relevance_score = len(index.near(domain, relevance_keywords))
         
         domain_insights[domain] = {
             **basic_info[domain],
@@ -213,6 +253,14 @@ async def analyze_domains_detailed(request: DomainInsightRequest):
         "tokens_used": tokens_used,
         "using_openai": OPENAI_AVAILABLE,
         "is_mock": is_mock,
+        "ai_error": ai_result.get("error"),
+        "enrichment": {"elapsed_ms": ddg["elapsed_ms"], "timed_out": ddg["timed_out"]},
+        "timings": {
+            "history_ms": history_ms,
+            "enrichment_ms": enrichment_ms,
+            "analysis_ms": analysis_ms if OPENAI_AVAILABLE else None,
+            "total_ms": total_ms
+        },
         "data_sources": {
             "basic_info": "DuckDuckGo API (with mock fallback)",
             "analysis": "OpenAI" if OPENAI_AVAILABLE else "Mock"
@@ -254,29 +302,29 @@ Provide specific, actionable insights."""
     result = await generate_with_citations(
         prompt=comparison_prompt,
         brand=brand,
-        include_web_search=False
+        include_web_search=False,
+        cache_ttl=ttl_for("domain-comparison")
     )
     
     # Calculate simple scores
     your_score = 50  # Base score
     competitor_score = 50
     
-    analysis_lower = result.get("response", "").lower()
-    
-    # Adjust scores based on positive/negative mentions
+    # Adjust scores based on positive/negative words near each domain's mentions
     positive_words = ["strong", "good", "excellent", "better", "superior", "leading"]
     negative_words = ["weak", "poor", "lacking", "behind", "inferior", "struggling"]
+    index = TextIndex(result.get("response", ""), all_domains + positive_words + negative_words)
     
     for domain in your_list:
-        if domain.lower() in analysis_lower:
-            nearby_positive = sum(1 for word in positive_words if word in analysis_lower)
-            nearby_negative = sum(1 for word in negative_words if word in analysis_lower)
+        if index.contains(domain):
+            nearby_positive = len(index.near(domain, positive_words))
+            nearby_negative = len(index.near(domain, negative_words))
             your_score += (nearby_positive * 5) - (nearby_negative * 3)
     
     for domain in competitor_list:
-        if domain.lower() in analysis_lower:
-            nearby_positive = sum(1 for word in positive_words if word in analysis_lower)
-            nearby_negative = sum(1 for word in negative_words if word in analysis_lower)
+        if index.contains(domain):
+            nearby_positive = len(index.near(domain, positive_words))
+            nearby_negative = len(index.near(domain, negative_words))
             competitor_score += (nearby_positive * 5) - (nearby_negative * 3)
     
     return {
@@ -291,7 +339,9 @@ Provide specific, actionable insights."""
         },
         "citations": result.get("citations", []),
         "tokens_used": result.get("tokens_used"),
-        "using_openai": OPENAI_AVAILABLE
+        "using_openai": OPENAI_AVAILABLE,
+        "is_mock": result.get("is_mock", False),
+        "stale": result.get("stale", False)
     }
 
 
@@ -324,7 +374,8 @@ Focus on topics that would improve {brand}'s online visibility."""
     result = await generate_with_citations(
         prompt=prompt,
         brand=brand,
-        include_web_search=False
+        include_web_search=False,
+        cache_ttl=ttl_for("trending-topics")
     )
     
     # Parse topics from response (simplified)
@@ -360,7 +411,9 @@ Focus on topics that would improve {brand}'s online visibility."""
         "full_analysis": response_text,
         "domains_analyzed": domains.split(",") if domains else [],
         "tokens_used": result.get("tokens_used"),
-        "using_openai": OPENAI_AVAILABLE
+        "using_openai": OPENAI_AVAILABLE,
+        "is_mock": result.get("is_mock", False),
+        "stale": result.get("stale", False)
     }
 
 
@@ -370,5 +423,6 @@ async def health_check():
     return {
         "status": "healthy",
         "openai_available": OPENAI_AVAILABLE,
+        "domain_cache": get_domain_cache().stats() if get_domain_cache() else None,
         "routes": ["domain-stats", "analyze-domains", "domain-comparison", "trending-topics"]
     }
\ No newline at end of file
@@ -0,0 +1,181 @@
+# backend/routes/history.py
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from datetime import datetime
+import sys
+import asyncio
+from pathlib import Path
+
+# Add backend to path if needed
+backend_path = Path(__file__).resolve().parent.parent
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+from utils.citation_store import get_citation_store, normalize_domain, domain_series
+from utils.timeseries import get_timeseries
+from utils.visibility import rollup_cell, VISIBILITY_ROLLUP_DAYS
+from utils.brand_aliases import brand_matcher
+
+router = APIRouter(prefix="/history", tags=["history"])
+
+
+def _store():
+    store = get_citation_store()
+    if store is None:
+        raise HTTPException(status_code=503, detail="Citation history is disabled (CITATION_STORE_ENABLED)")
+    return store
+
+
+def _ts(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value else None
+
+
+@router.get("/responses")
+async def history_responses(
+    brand: Optional[str] = None,
+    prompt_type: Optional[str] = None,
+    model: Optional[str] = None,
+    since: Optional[datetime] = Query(None, description="ISO 8601 start (inclusive)"),
+    until: Optional[datetime] = Query(None, description="ISO 8601 end (exclusive)"),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
+    """Stored answers (newest first) with their citations."""
+    rows = await asyncio.to_thread(
+        _store().query_responses, limit, offset,
+        brand=brand, prompt_type=prompt_type, model=model, since=_ts(since), until=_ts(until)
+    )
+    return {"responses": rows, "count": len(rows), "offset": offset}
+
+
+@router.get("/citations")
+async def history_citations(
+    brand: Optional[str] = None,
+    domain: Optional[str] = None,
+    prompt_type: Optional[str] = None,
+    model: Optional[str] = None,
+    since: Optional[datetime] = Query(None, description="ISO 8601 start (inclusive)"),
+    until: Optional[datetime] = Query(None, description="ISO 8601 end (exclusive)"),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
+    """Individual citation rows (newest first)."""
+    rows = await asyncio.to_thread(
+        _store().query_citations, limit, offset,
+        brand=brand, domain=domain, prompt_type=prompt_type, model=model, since=_ts(since), until=_ts(until)
+    )
+    return {"citations": rows, "count": len(rows), "offset": offset}
+
+
+@router.get("/domains")
+async def history_domains(
+    brand: Optional[str] = None,
+    prompt_type: Optional[str] = None,
+    model: Optional[str] = None,
+    since: Optional[datetime] = Query(None, description="ISO 8601 start (inclusive)"),
+    until: Optional[datetime] = Query(None, description="ISO 8601 end (exclusive)"),
+    limit: int = Query(20, ge=1, le=200)
+):
+    """Most-cited domains in the stored answers."""
+    rows = await asyncio.to_thread(
+        _store().top_domains, limit,
+        brand=brand, prompt_type=prompt_type, model=model, since=_ts(since), until=_ts(until)
+    )
+    return {"domains": rows}
+
+
+@router.get("/domains/{domain}/trend")
+async def history_domain_trend(
+    domain: str,
+    brand: Optional[str] = Query(None, description="Only answers given for this brand"),
+    start: Optional[datetime] = Query(None, description="ISO 8601 start (default: 30 days before end)"),
+    end: Optional[datetime] = Query(None, description="ISO 8601 end (default: now)"),
+    resolution: str = Query("auto", description="hour, day, week or auto")
+):
+    """Share (%) of stored answers (for one brand, if given) that cite the domain, per time bucket."""
+    series, total = domain_series(domain, brand)
+    try:
+        trend = await asyncio.to_thread(get_timeseries().share, series, total, _ts(start), _ts(end), resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"domain": normalize_domain(domain), "brand": brand, "resolution": resolution, "trend": trend}
+
+
+@router.get("/timeseries")
+async def history_timeseries(
+    series: str = Query(..., description='Series name, e.g. "domain:nike.com", "domain:Nike:nike.com", "brand:Nike", "answers:all"'),
+    start: Optional[datetime] = Query(None, description="ISO 8601 start (default: 30 days before end)"),
+    end: Optional[datetime] = Query(None, description="ISO 8601 end (default: now)"),
+    resolution: str = Query("auto", description="raw, hour, day, week or auto")
+):
+    """Raw points or downsampled (count, sum, mean) buckets for one series."""
+    try:
+        points = await asyncio.to_thread(get_timeseries().query, series, _ts(start), _ts(end), resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"series": series, "resolution": resolution, "points": points}
+
+
+@router.get("/heatmap")
+async def history_heatmap(
+    brand: str = Query(..., description="Your brand name"),
+    competitor: Optional[str] = Query(None, description="Competitor brand name"),
+    prompt_types: Optional[str] = Query(None, description="Comma-separated prompt types (default: all stored)"),
+    days: int = Query(VISIBILITY_ROLLUP_DAYS, ge=1, le=365)
+):
+    """
+    GapHeatmap rows from the pre-aggregated visibility rollups (no upstream
+    calls). Only sampled answers to brand-neutral prompts are rolled up
+    (`source` "history"). The first request for a new competitor starts a
+    background backfill of its rollups from stored history (`backfilling`
+    is true until it is done); later answers are counted as they are
+    ingested.
+    """
+    store = _store()
+    types = [t.strip() for t in prompt_types.split(",") if t.strip()] if prompt_types else None
+    if competitor:
+        store.track_competitor(brand, competitor)
+    counts = await asyncio.to_thread(store.heatmap, brand, competitor or "", days, types)
+    # Untyped answers roll up under '' and have no heatmap row of their own
+    order = types or sorted(pt for pt in counts if pt)
+    return {
+        "brand": brand,
+        "competitor": competitor,
+        "days": days,
+        "data": [rollup_cell(pt, counts[pt], has_competitor=bool(competitor)) for pt in order if pt in counts],
+        "missing": [pt for pt in order if pt not in counts],
+        "source": "history",
+        "backfilling": bool(competitor) and not store.is_tracked(brand, competitor),
+        "tokens_used": 0
+    }
+
+
+@router.get("/share-of-voice")
+async def history_share_of_voice(
+    brand: str = Query(..., description="Your brand name"),
+    competitors: str = Query("", description="Comma-separated competitor names"),
+    prompt_type: Optional[str] = None,
+    since: Optional[datetime] = Query(None, description="ISO 8601 start (inclusive)"),
+    until: Optional[datetime] = Query(None, description="ISO 8601 end (exclusive)")
+):
+    """
+    Brand vs competitor mentions across the stored answers for `brand`.
+    Names, configured aliases, spelling variants and owned domains all
+    count; every answer is scanned once for the whole brand set.
+    """
+    store = _store()
+    names = [brand] + [c.strip() for c in competitors.split(",") if c.strip()]
+    matcher = brand_matcher(names)
+
+    def measure():
+        batches = store.iter_response_texts(brand=brand, prompt_type=prompt_type, since=_ts(since), until=_ts(until))
+        return matcher.share_of_voice(text for batch in batches for text in batch)
+
+    result = await asyncio.to_thread(measure)
+    return {"brand": brand, "competitors": names[1:], **result, "tokens_used": 0}
+
+
+@router.get("/health")
+async def health():
+    store = get_citation_store()
+    return {"status": "healthy", "enabled": store is not None, "store": store.stats() if store else None}
@@ -0,0 +1,170 @@
+# backend/routes/jobs.py
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+# Add backend to path if needed
+backend_path = Path(__file__).resolve().parent.parent
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+from utils.jobs import get_store, JOBS_MODE, JOBS_WORKERS
+from utils.prompt_suite import PromptSuite
+from utils.ai_client import OPENAI_AVAILABLE
+from utils.citation_store import get_citation_store
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+MAX_JOB_PROMPTS = 100_000
+
+
+class SuiteSpec(BaseModel):
+    brands: List[str] = Field(..., description="Brands to audit")
+    topics: Optional[List[str]] = Field(None, description="Topics (default: general use)")
+    competitors: Optional[List[str]] = Field(None, description="Competitors for {competitor} templates")
+    prompt_types: Optional[List[str]] = Field(None, description="Template types (default: all)")
+
+
+class JobSubmitRequest(BaseModel):
+    brand: Optional[str] = Field(None, description="Brand name to analyze (required with prompts)")
+    prompts: Optional[List[str]] = Field(None, description="Explicit prompts to run")
+    suite: Optional[SuiteSpec] = Field(None, description="Brands x topics x templates to expand instead of prompts")
+    model: Optional[str] = Field("gpt-4o-mini", description="OpenAI model to use")
+    concurrency: Optional[int] = Field(None, ge=1, le=50, description="Max prompts in flight per worker batch")
+
+
+@router.post("")
+async def submit_job(req: JobSubmitRequest):
+    """
+    Queue an audit suite and return its job id immediately.
+    
+    Workers pick the prompts up in batches; poll /jobs/{id}, follow
+    /jobs/{id}/events, and page through /jobs/{id}/results.
+    """
+    store = get_store()
+    if req.suite:
+        try:
+            suite = PromptSuite(
+                req.suite.brands, req.suite.topics, req.suite.competitors, req.suite.prompt_types
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if suite.max_size() == 0:
+            raise HTTPException(status_code=400, detail="Suite expands to no prompts")
+        if suite.max_size() > MAX_JOB_PROMPTS:
+            raise HTTPException(status_code=400, detail=f"Maximum {MAX_JOB_PROMPTS} prompts per job")
+        # The suite is expanded lazily while rows are written
+        job = await asyncio.to_thread(
+            store.create_job, ", ".join(suite.brands), suite, req.model, req.concurrency
+        )
+        history = get_citation_store()
+        if history is not None:
+            # Count competitor mentions in the rollups as the answers arrive
+            for brand in suite.brands:
+                for competitor in suite.competitors:
+                    if competitor.casefold() != brand.casefold():
+                        history.track_competitor(brand, competitor)
+    else:
+        if not req.prompts or not req.brand:
+            raise HTTPException(status_code=400, detail="Provide brand and prompts, or a suite")
+        if len(req.prompts) > MAX_JOB_PROMPTS:
+            raise HTTPException(status_code=400, detail=f"Maximum {MAX_JOB_PROMPTS} prompts per job")
+        job = await asyncio.to_thread(
+            store.create_job, req.brand, req.prompts, req.model, req.concurrency
+        )
+    return {"job_id": job["id"], "status": job["status"], "total": job["total"]}
+
+
+@router.get("")
+async def list_jobs(limit: int = Query(50, ge=1, le=500)):
+    """Most recent jobs first."""
+    return {"jobs": await asyncio.to_thread(get_store().list_jobs, limit)}
+
+
+@router.get("/health")
+async def health_check():
+    """Check job workers configuration."""
+    return {
+        "status": "healthy",
+        "openai_available": OPENAI_AVAILABLE,
+        "mode": JOBS_MODE,
+        "workers": JOBS_WORKERS,
+        "routes": ["", "{job_id}", "{job_id}/events", "{job_id}/results", "{job_id}/cancel"]
+    }
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """Job status and progress counters."""
+    job = await asyncio.to_thread(get_store().get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/{job_id}/results")
+async def get_job_results(
+    job_id: str,
+    offset: int = Query(0, ge=0, description="Index of the first prompt to return"),
+    limit: int = Query(100, ge=1, le=1000, description="Page size")
+):
+    """Page through per-prompt results in input order."""
+    store = get_store()
+    job = await asyncio.to_thread(store.get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    results = await asyncio.to_thread(store.get_results, job_id, offset, limit)
+    next_offset = offset + limit if offset + limit < job["total"] else None
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "total": job["total"],
+        "offset": offset,
+        "next_offset": next_offset,
+        "results": results
+    }
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str, interval: float = Query(1.0, ge=0.2, le=30.0)):
+    """Server-Sent Events stream of job progress until the job finishes."""
+    store = get_store()
+    job = await asyncio.to_thread(store.get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        last = None
+        while True:
+            current = await asyncio.to_thread(store.get_job, job_id)
+            snapshot = (current["status"], current["completed"], current["failed"])
+            if snapshot != last:
+                last = snapshot
+                yield f"event: progress\ndata: {json.dumps(current)}\n\n"
+            if current["status"] not in ("queued", "running"):
+                yield f"event: end\ndata: {json.dumps({'status': current['status']})}\n\n"
+                return
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job; prompts already in flight still finish."""
+    store = get_store()
+    if not await asyncio.to_thread(store.cancel, job_id):
+        job = await asyncio.to_thread(store.get_job, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return {"job_id": job_id, "status": job["status"], "cancelled": False}
+    return {"job_id": job_id, "status": "cancelled", "cancelled": True}
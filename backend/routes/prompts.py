@@ -1,10 +1,13 @@
 # backend/routes/prompts.py
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import sys
 from pathlib import Path
-import os
+import json
+import time
+from itertools import islice
 
 
 # Add backend to path if needed
@@ -12,7 +15,16 @@ backend_path = Path(__file__).resolve().parent.parent
 if str(backend_path) not in sys.path:
     sys.path.insert(0, str(backend_path))
 
-from utils.ai_client import generate_responses, generate_with_citations, OPENAI_AVAILABLE
+from utils.ai_client import (
+    generate_responses,
+    generate_with_citations,
+    iter_responses,
+    stream_with_citations,
+    complete,
+    OPENAI_AVAILABLE
+)
+from utils.llm_cache import ttl_for
+from utils.prompt_suite import PromptSuite, PROMPT_TEMPLATES, DEFAULT_TOPIC
 
 router = APIRouter(prefix="/prompts", tags=["prompts"])
 
@@ -22,6 +34,16 @@ class PromptTestRequest(BaseModel):
     prompt_variations: Optional[List[str]] = Field(None, description="Custom prompt variations (optional)")
     model: Optional[str] = Field("gpt-4o-mini", description="OpenAI model to use")
     include_citations: Optional[bool] = Field(True, description="Whether to include web citations")
+    concurrency: Optional[int] = Field(None, ge=1, le=20, description="Max prompts in flight at once (1 = sequential)")
+    packed: Optional[bool] = Field(None, description="Answer several prompts per upstream call (default: LLM_PACKED)")
+
+
+class SuitePreviewRequest(BaseModel):
+    brands: List[str] = Field(..., description="Brands to expand")
+    topics: Optional[List[str]] = Field(None, description="Topics (default: general use)")
+    competitors: Optional[List[str]] = Field(None, description="Competitors for {competitor} templates")
+    prompt_types: Optional[List[str]] = Field(None, description="Template types (default: all)")
+    limit: int = Field(50, ge=1, le=1000, description="How many expanded prompts to return")
 
 
 class SinglePromptRequest(BaseModel):
@@ -30,31 +52,53 @@ class SinglePromptRequest(BaseModel):
     model: Optional[str] = "gpt-4o-mini"
 
 
-# Predefined prompt templates
+# Predefined prompt types (templates live in utils/prompt_suite.py)
 DEFAULT_PROMPT_TYPES = [
     "how-to", "comparison", "definition", "use-case", "benefits", "problem-solution"
 ]
 
-PROMPT_TEMPLATES = {
-    "how-to": "How to use {brand} for {topic}?",
-    "comparison": "Compare {brand} vs competitors for {topic}",
-    "definition": "What is {brand} and how does it work in {topic}?",
-    "use-case": "What are the best use cases for {brand} in {topic}?",
-    "benefits": "What are the key benefits of {brand} for {topic}?",
-    "problem-solution": "How does {brand} solve common problems in {topic}?",
-    "reviews": "What do users say about {brand} for {topic}?",
-    "pricing": "What is the pricing structure for {brand} in {topic}?",
-    "alternatives": "What are the best alternatives to {brand} for {topic}?",
-    "tutorial": "Step-by-step guide to getting started with {brand} in {topic}?"
-}
-
-
-def make_prompts(brand: str, topic: str = "general use") -> List[str]:
+
+def make_prompts(brand: str, topic: str = DEFAULT_TOPIC) -> List[str]:
     """Generate default prompt variations for a brand."""
-    prompts = []
-    for prompt_type, template in PROMPT_TEMPLATES.items():
-        prompts.append(template.format(brand=brand, topic=topic))
-    return prompts[:10]  # Return first 10
+    suite = PromptSuite([brand], [topic])
+    return [item["prompt"] for item in islice(suite, 10)]  # Return first 10
+
+
+def summarize_results(results: List[Dict[str, Any]], model: str, wall_time_ms: float) -> Dict[str, Any]:
+    """Summary block shared by /test and /test/stream."""
+    total_tokens = sum(r.get("tokens_used", 0) for r in results if r.get("tokens_used"))
+    has_errors = any(r.get("error") for r in results)
+    cache_hits = sum(1 for r in results if r.get("cached"))
+    citation_count = sum(len(r.get("citations", [])) for r in results)
+    latencies = [r["latency_ms"] for r in results if r.get("latency_ms") is not None]
+    
+    return {
+        "total_prompts": len(results),
+        "total_tokens_used": total_tokens,
+        "total_citations": citation_count,
+        "cache_hits": cache_hits,
+        "has_errors": has_errors,
+        "using_openai": OPENAI_AVAILABLE,
+        "model": model,
+        "wall_time_ms": wall_time_ms,
+        "avg_prompt_latency_ms": round(sum(latencies) / len(latencies), 1) if latencies else None
+    }
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def check_prompt_count(prompts: List[str]) -> None:
+    if len(prompts) > 20:
+        raise HTTPException(
+            status_code=400, 
+            detail="Maximum 20 prompts allowed per request to manage API costs; submit larger suites to /jobs"
+        )
 
 
 @router.post("/test")
@@ -66,38 +110,55 @@ async def test_prompts(req: PromptTestRequest):
     Returns AI responses with citations for each prompt.
     """
     prompts = req.prompt_variations or make_prompts(req.brand)
-    
-    if len(prompts) > 20:
-        raise HTTPException(
-            status_code=400, 
-            detail="Maximum 20 prompts allowed per request to manage API costs"
-        )
+    check_prompt_count(prompts)
     
     try:
         # Use OpenAI to generate responses
-        results = await generate_responses(prompts, req.brand, model=req.model)
-        
-        # Calculate summary statistics
-        total_tokens = sum(r.get("tokens_used", 0) for r in results if r.get("tokens_used"))
-        has_errors = any(r.get("error") for r in results)
-        citation_count = sum(len(r.get("citations", [])) for r in results)
+        started = time.perf_counter()
+        results = await generate_responses(
+            prompts, req.brand, model=req.model, concurrency=req.concurrency, cache_ttl=ttl_for("prompts"), packed=req.packed
+        )
+        wall_time_ms = round((time.perf_counter() - started) * 1000, 1)
         
         return {
             "brand": req.brand,
             "results": results,
-            "summary": {
-                "total_prompts": len(prompts),
-                "total_tokens_used": total_tokens,
-                "total_citations": citation_count,
-                "has_errors": has_errors,
-                "using_openai": OPENAI_AVAILABLE,
-                "model": req.model
-            }
+            "summary": summarize_results(results, req.model, wall_time_ms)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating responses: {str(e)}")
 
 
+@router.post("/test/stream")
+async def test_prompts_stream(req: PromptTestRequest):
+    """
+    Streaming variant of /test (Server-Sent Events).
+    
+    Emits one `result` event per prompt as soon as it finishes (with its
+    input `index` and extracted citations), then a final `summary` event
+    carrying the same summary block /test returns.
+    """
+    prompts = req.prompt_variations or make_prompts(req.brand)
+    check_prompt_count(prompts)
+
+    async def events():
+        started = time.perf_counter()
+        results: List[Dict[str, Any]] = [{} for _ in prompts]
+        try:
+            async for i, result in iter_responses(
+                prompts, req.brand, model=req.model, concurrency=req.concurrency, cache_ttl=ttl_for("prompts"), packed=req.packed
+            ):
+                results[i] = result
+                yield sse_event("result", {"index": i, **result})
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Error generating responses: {str(e)}"})
+            return
+        wall_time_ms = round((time.perf_counter() - started) * 1000, 1)
+        yield sse_event("summary", {"brand": req.brand, "summary": summarize_results(results, req.model, wall_time_ms)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 @router.post("/single")
 async def single_prompt(req: SinglePromptRequest):
     """
@@ -126,6 +187,31 @@ async def single_prompt(req: SinglePromptRequest):
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
 
+@router.post("/single/stream")
+async def single_prompt_stream(req: SinglePromptRequest):
+    """
+    Streaming variant of /single (Server-Sent Events).
+    
+    Emits `token` events while the answer is generated, then one `result`
+    event with the same payload /single returns.
+    """
+    async def events():
+        try:
+            async for event in stream_with_citations(prompt=req.prompt, brand=req.brand, model=req.model):
+                if event["type"] == "token":
+                    yield sse_event("token", {"content": event["content"]})
+                else:
+                    yield sse_event("result", {
+                        "brand": req.brand,
+                        "result": event["result"],
+                        "using_openai": OPENAI_AVAILABLE
+                    })
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Error generating response: {str(e)}"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 @router.get("/templates")
 async def get_prompt_templates():
     """
@@ -135,7 +221,25 @@ async def get_prompt_templates():
     return {
         "templates": PROMPT_TEMPLATES,
         "prompt_types": list(PROMPT_TEMPLATES.keys()),
-        "example_usage": "Use {brand} and {topic} placeholders in templates"
+        "example_usage": "Use {brand}, {topic} and (optionally) {competitor} placeholders in templates"
+    }
+
+
+@router.post("/suite/preview")
+async def preview_suite(req: SuitePreviewRequest):
+    """
+    Expand brands x topics x prompt types (x competitors) without calling
+    OpenAI. Returns the first `limit` unique prompts with their stable ids;
+    submit the same spec to /jobs to run it.
+    """
+    try:
+        suite = PromptSuite(req.brands, req.topics, req.competitors, req.prompt_types)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "max_prompts": suite.max_size(),
+        "prompts": list(islice(suite, req.limit))
     }
 
 
@@ -143,8 +247,11 @@ async def get_prompt_templates():
 async def batch_by_type(
     brand: str,
     prompt_types: List[str],
-    topic: str = "general use",
-    model: str = "gpt-4o-mini"
+    topic: str = DEFAULT_TOPIC,
+    model: str = "gpt-4o-mini",
+    concurrency: Optional[int] = Query(None, ge=1, le=20, description="Max prompts in flight at once"),
+    competitor: Optional[str] = Query(None, description="Competitor for head-to-head prompts"),
+    packed: Optional[bool] = Query(None, description="Answer several prompt types per upstream call")
 ):
     """
     Generate responses for specific prompt types.
@@ -156,31 +263,44 @@ async def batch_by_type(
         "topic": "running shoes"
     }
     """
-    # Validate prompt types
-    invalid_types = [pt for pt in prompt_types if pt not in PROMPT_TEMPLATES]
-    if invalid_types:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid prompt types: {invalid_types}. Valid types: {list(PROMPT_TEMPLATES.keys())}"
-        )
+    try:
+        suite = PromptSuite([brand], [topic], competitors=[competitor] if competitor else None, prompt_types=prompt_types)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Generate prompts from templates
-    prompts = [
-        PROMPT_TEMPLATES[pt].format(brand=brand, topic=topic)
-        for pt in prompt_types
-    ]
+    # Generate prompts from templates (identical prompts are only sent once)
+    items = list(suite)
+    skipped = [pt for pt in prompt_types if pt not in {item["prompt_type"] for item in items}]
+    if skipped:
+        if competitor and competitor.casefold() == brand.casefold():
+            detail = f"Prompt types {skipped} need a competitor other than the brand itself"
+        else:
+            detail = f"Prompt types {skipped} need a competitor"
+        raise HTTPException(status_code=400, detail=detail)
     
     try:
-        results = await generate_responses(prompts, brand, model=model)
+        started = time.perf_counter()
+        results = await generate_responses(
+            [item["prompt"] for item in items],
+            brand,
+            model=model,
+            concurrency=concurrency,
+            cache_ttl=ttl_for("prompts"),
+            prompt_types=[item["prompt_type"] for item in items],
+            packed=packed
+        )
+        wall_time_ms = round((time.perf_counter() - started) * 1000, 1)
         
         # Add prompt type to each result
-        for i, result in enumerate(results):
-            result["prompt_type"] = prompt_types[i]
+        for item, result in zip(items, results):
+            result["prompt_type"] = item["prompt_type"]
+            result["prompt_id"] = item["id"]
         
         return {
             "brand": brand,
             "topic": topic,
             "results": results,
+            "wall_time_ms": wall_time_ms,
             "using_openai": OPENAI_AVAILABLE
         }
     except Exception as e:
@@ -208,9 +328,6 @@ async def generate_variations(
             "is_mock": True
         }
     
-    from openai import AsyncOpenAI
-    client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    
     meta_prompt = f"""Generate {num_variations} variations of this prompt for {brand}:
 
 Base prompt: "{base_prompt}"
@@ -224,17 +341,18 @@ Create variations that:
 Return ONLY the variations, one per line, numbered."""
     
     try:
-        resp = await client.chat.completions.create(
+        completion = await complete(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are an SEO and content strategy expert."},
                 {"role": "user", "content": meta_prompt}
             ],
             max_tokens=400,
-            temperature=0.8
+            temperature=0.8,
+            cache_ttl=0
         )
         
-        text = resp.choices[0].message.content
+        text = completion["text"]
         
         # Parse variations (assuming numbered format)
         import re
@@ -248,7 +366,7 @@ Return ONLY the variations, one per line, numbered."""
             "brand": brand,
             "base_prompt": base_prompt,
             "variations": variations[:num_variations],
-            "tokens_used": resp.usage.total_tokens,
+            "tokens_used": completion["tokens_used"],
             "using_openai": True
         }
         
@@ -262,6 +380,6 @@ async def health_check():
     return {
         "status": "healthy",
         "openai_available": OPENAI_AVAILABLE,
-        "routes": ["test", "single", "templates", "batch-by-type", "generate-variations"],
+        "routes": ["test", "test/stream", "single", "single/stream", "templates", "suite/preview", "batch-by-type", "generate-variations"],
         "available_templates": len(PROMPT_TEMPLATES)
     }
\ No newline at end of file
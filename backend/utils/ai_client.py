@@ -2,14 +2,41 @@
 import os
 import json
 import asyncio
-import re
-from typing import List, Dict, Any
+import time
+import logging
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable, Tuple, Type
 from pathlib import Path
 from dotenv import load_dotenv
 
+from .llm_cache import get_cache, make_key, LLM_CACHE_TTL
+from .citation_store import record_result
+from .citation_extract import citation_urls
+from .reference_data import get_reference_data
+from .singleflight import SingleFlight
+from .latency import get_latency_tracker, LLM_HEDGE_MODEL
+from .circuit_breaker import get_breaker, CircuitOpenError
+from .llm_provider import get_provider
+from .structured import (
+    IncrementalJSON,
+    parse as parse_structured,
+    validate as validate_structured,
+    repair_messages,
+    response_format as structured_format,
+    schema_hint,
+    PackedAnswers,
+    STRUCTURED_REPAIR_ATTEMPTS
+)
+from .rate_limiter import (
+    RateLimiter,
+    estimate_tokens,
+    retry_after_seconds,
+    backoff_delay,
+    LLM_RATE_LIMIT_RETRIES
+)
+
 # Define paths first
 HERE = Path(__file__).resolve().parent.parent  # backend/
-DEMO_PATH = HERE / "demo_data" / "fake_citations.json"
 
 # Load environment variables from .env - use explicit path
 ENV_PATH = HERE / ".env"
@@ -17,26 +44,481 @@ load_dotenv(dotenv_path=ENV_PATH)
 
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
 
-# Try to import OpenAI at module level
+# Try to import OpenAI at module level (LLM_PROVIDER picks where calls go)
 try:
     from openai import AsyncOpenAI
-    OPENAI_AVAILABLE = bool(OPENAI_KEY)
+    from openai import RateLimitError, APIConnectionError, InternalServerError
+    import httpx
+    OPENAI_AVAILABLE = get_provider().available
 except ImportError:
     OPENAI_AVAILABLE = False
 
+logger = logging.getLogger("ai_client")
 
-async def _mock_generate(prompts: List[str], brand: str) -> List[Dict[str, Any]]:
-    """Fallback mock responses if OPENAI_KEY is missing."""
-    demo_responses = {}
+# Connection pool settings for the shared upstream client
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() in ("1", "true", "yes")
+LLM_WARMUP = os.getenv("LLM_WARMUP", "true").lower() in ("1", "true", "yes")
+LLM_DRAIN_TIMEOUT = float(os.getenv("LLM_DRAIN_TIMEOUT", "10"))
+
+# Fan-out limits for multi-prompt runs
+LLM_REQUEST_CONCURRENCY = int(os.getenv("LLM_REQUEST_CONCURRENCY", "8"))
+LLM_GLOBAL_CONCURRENCY = int(os.getenv("LLM_GLOBAL_CONCURRENCY", "32"))
+
+# Packed mode (opt-in): up to LLM_PACK_SIZE short prompts answered per upstream call
+LLM_PACKED = os.getenv("LLM_PACKED", "false").lower() in ("1", "true", "yes")
+LLM_PACK_SIZE = int(os.getenv("LLM_PACK_SIZE", "5"))
+
+_client: Optional["AsyncOpenAI"] = None
+_inflight = 0
+_drained: Optional[asyncio.Event] = None
+_global_limit: Optional[asyncio.Semaphore] = None
+_inflight_requests = SingleFlight()
+_rate_limiter = RateLimiter()
+
+
+# -----------------------
+# Shared client lifecycle
+# -----------------------
+def _http2_supported() -> bool:
+    """HTTP/2 needs the optional `h2` package (pip install httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _build_client() -> "AsyncOpenAI":
+    http2 = LLM_HTTP2 and _http2_supported()
+    if LLM_HTTP2 and not http2:
+        logger.warning("LLM_HTTP2 requested but 'h2' is not installed; using HTTP/1.1")
+
+    return get_provider().client(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_client() -> "AsyncOpenAI":
+    """
+    Return the process-wide OpenAI client.
+
+    Normally created by init_client() in the app lifespan; created lazily
+    here for scripts that import ai_client without running the app.
+    """
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+async def init_client(warm_up: bool = LLM_WARMUP) -> None:
+    """Create the shared client and optionally open a pooled connection up front."""
+    if not OPENAI_AVAILABLE:
+        return
+
+    client = get_client()
+    if warm_up:
+        try:
+            # Any cheap authenticated call will do: it pays the TLS handshake now
+            # so the first user request finds a warm connection in the pool.
+            await asyncio.wait_for(client.models.list(), timeout=5.0)
+        except Exception as e:
+            logger.warning("OpenAI warm-up failed: %s", e)
+
+
+async def close_client(timeout: float = LLM_DRAIN_TIMEOUT) -> None:
+    """Wait for in-flight upstream calls to finish, then close the pool."""
+    global _client
+    if _client is None:
+        return
+
+    if _inflight and _drained is not None:
+        try:
+            await asyncio.wait_for(_drained.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Closing OpenAI client with %d request(s) still in flight", _inflight)
+
+    client, _client = _client, None
+    await client.close()
+
+
+def client_stats() -> Dict[str, Any]:
+    """Pool configuration, current load and cache counters, for /health."""
+    cache = get_cache()
+    return {
+        "provider": get_provider().describe(),
+        "initialized": _client is not None,
+        "inflight": _inflight,
+        "max_connections": LLM_MAX_CONNECTIONS,
+        "max_keepalive": LLM_MAX_KEEPALIVE,
+        "keepalive_expiry": LLM_KEEPALIVE_EXPIRY,
+        "http2": LLM_HTTP2 and _http2_supported(),
+        "request_concurrency": LLM_REQUEST_CONCURRENCY,
+        "global_concurrency": LLM_GLOBAL_CONCURRENCY,
+        "cache": cache.stats() if cache else None,
+        "single_flight": _inflight_requests.stats(),
+        "rate_limiter": _rate_limiter.stats(),
+        "latency": get_latency_tracker().stats(),
+        "circuit_breaker": get_breaker().stats(),
+    }
+
+
+@asynccontextmanager
+async def _global_slot():
+    """Hold one of the process-wide LLM_GLOBAL_CONCURRENCY upstream slots."""
+    global _global_limit
+    if _global_limit is None:
+        _global_limit = asyncio.Semaphore(max(1, LLM_GLOBAL_CONCURRENCY))
+    async with _global_limit:
+        yield
+
+
+@asynccontextmanager
+async def _track_inflight():
+    """Count an upstream call so close_client() can wait for it."""
+    global _inflight, _drained
+    if _drained is None:
+        _drained = asyncio.Event()
+
+    _inflight += 1
+    _drained.clear()
+    try:
+        yield
+    finally:
+        _inflight -= 1
+        if _inflight == 0:
+            _drained.set()
+
+
+async def chat_completion(**kwargs) -> Any:
+    """Send a chat completion through the shared pooled client."""
+    async with _track_inflight():
+        return await get_client().chat.completions.create(**kwargs)
+
+
+async def _timed_completion(endpoint: str, **kwargs) -> Any:
+    """
+    chat_completion, with its latency recorded (also when cancelled
+    mid-flight, as a lower bound) and its outcome reported to the circuit
+    breaker. A cancelled call (hedge loser, timeout) has no outcome: it only
+    frees its probe slot.
+    """
+    started = time.perf_counter()
     try:
-        demo_responses = json.loads(DEMO_PATH.read_text())
-    except Exception:
-        pass
+        resp = await chat_completion(**kwargs)
+    except asyncio.CancelledError:
+        get_latency_tracker().record(kwargs["model"], endpoint, time.perf_counter() - started)
+        get_breaker().release()
+        raise
+    except (RateLimitError, APIConnectionError, InternalServerError):
+        get_breaker().record(time.perf_counter() - started, failed=True)
+        raise
+    elapsed = time.perf_counter() - started
+    get_latency_tracker().record(kwargs["model"], endpoint, elapsed)
+    get_breaker().record(elapsed)
+    return resp
+
+
+async def _send_with_retries(endpoint: str = "chat", **kwargs) -> Any:
+    """
+    Send one chat completion through the rate limiter and global slots,
+    retrying 429s (after Retry-After), connection errors and 5xx responses.
+    """
+    estimated = estimate_tokens(kwargs["messages"], kwargs.get("max_tokens"), kwargs.get("n", 1))
+    for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+        if attempt and get_breaker().is_open():
+            raise CircuitOpenError("Upstream provider unavailable (circuit open)")
+        await _rate_limiter.acquire(estimated)
+        try:
+            async with _global_slot():
+                resp = await _timed_completion(endpoint, **kwargs)
+            break
+        except asyncio.CancelledError:
+            _rate_limiter.refund(estimated)
+            raise
+        except RateLimitError as e:
+            if attempt >= LLM_RATE_LIMIT_RETRIES:
+                raise
+            retry_after = retry_after_seconds(e)
+            _rate_limiter.on_rate_limited(retry_after)
+            logger.warning("OpenAI 429 (attempt %d), retrying after %.1fs", attempt + 1, retry_after or 0)
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+        except (APIConnectionError, InternalServerError):
+            _rate_limiter.refund(estimated)
+            if attempt >= LLM_RATE_LIMIT_RETRIES:
+                raise
+            await asyncio.sleep(backoff_delay(attempt))
+
+    _rate_limiter.settle(estimated, resp.usage.total_tokens if resp.usage else None)
+    return resp
+
+
+async def _hedged_send(endpoint: str = "chat", **kwargs) -> Tuple[Any, str]:
+    """
+    _send_with_retries with a hedge: once the call has run past the
+    observed LLM_HEDGE_PERCENTILE latency for its model and endpoint, a
+    duplicate goes out (to LLM_HEDGE_MODEL when set), the first answer wins
+    and the other request is cancelled. Hedging stays within
+    LLM_HEDGE_BUDGET of calls and waits for enough latency samples.
+    
+    Returns (response, model that answered).
+    """
+    model = kwargs["model"]
+    tracker = get_latency_tracker()
+    delay = tracker.hedge_delay(model, endpoint)
+    if delay is None:
+        return await _send_with_retries(endpoint, **kwargs), model
+
+    hedge_model = LLM_HEDGE_MODEL or model
+    primary = asyncio.ensure_future(_send_with_retries(endpoint, **kwargs))
+    hedge = None
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result(), model
+        tracker.hedged += 1
+        hedge = asyncio.ensure_future(_send_with_retries(endpoint, **{**kwargs, "model": hedge_model}))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        tracker.hedge_wins += 1
+                        return task.result(), hedge_model
+                    return task.result(), model
+                error = task.exception()
+        raise error
+    finally:
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+async def _stale_completion(
+    messages: List[Dict[str, Any]],
+    model: str,
+    max_tokens: int,
+    temperature: float,
+    response_format: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """Last cached answer for a request, even if expired (served while the circuit is open)."""
+    cache = get_cache()
+    if cache is None:
+        return None
+    extra = {"response_format": response_format} if response_format else {}
+    return await cache.get(make_key(model, messages, temperature, max_tokens, **extra), stale=True)
+
+
+async def complete(
+    messages: List[Dict[str, Any]],
+    model: str = "gpt-4o-mini",
+    max_tokens: int = 300,
+    temperature: float = 0.7,
+    cache_ttl: Optional[float] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+    endpoint: str = "chat"
+) -> Dict[str, Any]:
+    """
+    Run one chat completion, served from the response cache when possible.
+    
+    Concurrent calls with the same request share a single upstream call
+    (callers that joined it get cached=True).
+    Misses go through the RPM/TPM limiter; 429s are retried after
+    Retry-After with jittered backoff instead of surfacing as errors.
+    While the circuit breaker is open, the last cached answer is returned
+    (marked stale) even if expired, or CircuitOpenError is raised at once.
+    
+    Args:
+        messages: Chat messages to send
+        model: OpenAI model to use
+        max_tokens: Completion token cap
+        temperature: Sampling temperature
+        cache_ttl: Seconds to keep the answer (None = LLM_CACHE_TTL, 0 = bypass)
+        response_format: Structured-output parameter (JSON mode / JSON schema)
+        endpoint: Call site the upstream latency is tracked (and hedged) under
+    
+    Returns:
+        Dict with text, tokens_used, model (the one that answered: a hedge
+        may be won by LLM_HEDGE_MODEL) and cached
+    """
+    cache = get_cache()
+    ttl = LLM_CACHE_TTL if cache_ttl is None else cache_ttl
+    extra = {"response_format": response_format} if response_format else {}
+    key = make_key(model, messages, temperature, max_tokens, **extra)
+    if cache is not None and ttl > 0:
+        hit = await cache.get(key)
+        if hit is not None:
+            return {"model": model, **hit, "cached": True}
+
+    if not get_breaker().allow():
+        stale = await _stale_completion(messages, model, max_tokens, temperature, response_format)
+        if stale is None:
+            raise CircuitOpenError("Upstream provider unavailable (circuit open)")
+        return {"model": model, **stale, "cached": True, "stale": True}
+
+    async def fetch() -> Dict[str, Any]:
+        resp, answered_by = await _hedged_send(
+            endpoint,
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **extra
+        )
+        tokens_used = resp.usage.total_tokens if resp.usage else None
+        result = {
+            "text": resp.choices[0].message.content or "",
+            "tokens_used": tokens_used,
+            "model": answered_by
+        }
+        if cache is not None and ttl > 0:
+            # A hedge won by LLM_HEDGE_MODEL is cached as that model's answer
+            if answered_by != model:
+                key_for = make_key(answered_by, messages, temperature, max_tokens, **extra)
+            else:
+                key_for = key
+            await cache.set(key_for, result, ttl)
+        return result
+
+    # Identical requests already on their way upstream share that one call;
+    # only its leader reports a fresh answer, so it is recorded once
+    result, joined = await _inflight_requests.do_shared(key, fetch)
+    return {**result, "cached": joined}
+
+
+async def complete_samples(
+    messages: List[Dict[str, Any]],
+    n: int,
+    model: str = "gpt-4o-mini",
+    max_tokens: int = 300,
+    temperature: float = 0.7
+) -> Dict[str, Any]:
+    """
+    Draw n independent answers to the same messages in one upstream call
+    (the `n` parameter), so the prompt is only sent and billed once.
+    Never cached: callers want fresh samples.
+    
+    Returns:
+        Dict with texts (list of n answers) and tokens_used
+    """
+    if not get_breaker().allow():
+        raise CircuitOpenError("Upstream provider unavailable (circuit open)")
+    resp, _ = await _hedged_send(
+        "samples",
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        n=n
+    )
+    return {
+        "texts": [choice.message.content or "" for choice in resp.choices],
+        "tokens_used": resp.usage.total_tokens if resp.usage else None
+    }
+
+
+async def stream_completion(
+    messages: List[Dict[str, Any]],
+    model: str = "gpt-4o-mini",
+    max_tokens: int = 300,
+    temperature: float = 0.7,
+    cache_ttl: Optional[float] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+    endpoint: str = "stream",
+    status: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[str]:
+    """
+    Stream one chat completion as text deltas.
+    
+    Cached answers are replayed as a single delta; a fully streamed answer
+    is written back to the cache like complete() does, and its duration is
+    tracked under `endpoint` (streams are not hedged). A `status` dict, when
+    passed, gets "cached" and "tokens_used" (the provider's usage report, if
+    it sent one). Raises CircuitOpenError while the circuit breaker is open.
+    """
+    cache = get_cache()
+    ttl = LLM_CACHE_TTL if cache_ttl is None else cache_ttl
+    extra = {"response_format": response_format} if response_format else {}
+    key = make_key(model, messages, temperature, max_tokens, **extra)
+    if cache is not None and ttl > 0:
+        hit = await cache.get(key)
+        if hit is not None:
+            if status is not None:
+                status.update(cached=True, tokens_used=hit.get("tokens_used"))
+            yield hit["text"]
+            return
+
+    if not get_breaker().allow():
+        raise CircuitOpenError("Upstream provider unavailable (circuit open)")
+    estimated = estimate_tokens(messages, max_tokens)
+    await _rate_limiter.acquire(estimated)
+    parts = []
+    tokens_used = None
+    async with _global_slot(), _track_inflight():
+        started = time.perf_counter()
+        try:
+            stream = await get_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True},
+                **extra
+            )
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    tokens_used = chunk.usage.total_tokens
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except (RateLimitError, APIConnectionError, InternalServerError):
+            get_breaker().record(time.perf_counter() - started, failed=True)
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            get_breaker().release()
+            _rate_limiter.refund(estimated)
+            raise
+        elapsed = time.perf_counter() - started
+        get_latency_tracker().record(model, endpoint, elapsed)
+        get_breaker().record(elapsed)
+
+    text = "".join(parts)
+    _rate_limiter.settle(estimated, tokens_used or estimate_tokens(messages, 0) + len(text) // 4)
+    if status is not None:
+        status["tokens_used"] = tokens_used
+    if cache is not None and ttl > 0:
+        await cache.set(key, {"text": text, "tokens_used": tokens_used}, ttl)
+
+
+async def _mock_generate(prompts: List[str], brand: str) -> List[Dict[str, Any]]:
+    """Fallback mock responses when no provider is available (e.g. OPENAI_KEY is missing)."""
+    # demo_data/fake_citations.json samples, held in memory by the registry
+    demo_samples = get_reference_data().get("citations")
     
     results = []
     for i, p in enumerate(prompts):
-        if str(i) in demo_responses:
-            results.append(demo_responses[str(i)])
+        if i < len(demo_samples):
+            sample = demo_samples[i]
+            results.append({
+                "prompt": p,
+                "response": f"Mock response for '{p}' about {brand}",
+                "citations": list(sample.get("citations", [])),
+                "is_mock": True
+            })
         else:
             has_brand = (i % 3 != 0)
             citations = (
@@ -51,16 +533,27 @@ async def _mock_generate(prompts: List[str], brand: str) -> List[Dict[str, Any]]
                 "is_mock": True
             })
     
-    await asyncio.sleep(0.1)
     return results
 
 
+def _mock_single(prompt: str, brand: str) -> Dict[str, Any]:
+    """Mock answer for one prompt (no API key, or the circuit is open with nothing cached)."""
+    return {
+        "prompt": prompt,
+        "response": f"Mock response for '{prompt}' about {brand}",
+        "citations": ["https://example.com/mock"],
+        "is_mock": True
+    }
+
+
 async def generate_with_citations(
     prompt: str,
     brand: str,
     include_web_search: bool = False,
     model: str = "gpt-4o-mini",
-    timeout: float = 30.0
+    timeout: float = 30.0,
+    cache_ttl: Optional[float] = None,
+    prompt_type: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Generate AI response with citations.
@@ -70,24 +563,21 @@ async def generate_with_citations(
         brand: Brand name for context
         include_web_search: Whether to search web for citations
         model: OpenAI model to use
-        timeout: Timeout per request
+        timeout: Upper bound per request (tightened to the observed latency)
+        cache_ttl: Response cache TTL in seconds (None = default, 0 = bypass)
+        prompt_type: Stored with the answer in the citation history
     
     Returns:
         Dict with prompt, response, citations, and metadata
     """
     if not OPENAI_AVAILABLE:
-        return {
-            "prompt": prompt,
-            "response": f"Mock response for '{prompt}' about {brand}",
-            "citations": ["https://example.com/mock"],
-            "is_mock": True
-        }
+        return _mock_single(prompt, brand)
 
-    client = AsyncOpenAI(api_key=OPENAI_KEY)
-    
+    # Bounded by the observed latency for this call site once there is enough history
+    timeout = get_latency_tracker().timeout(model, "single", timeout)
     try:
-        resp = await asyncio.wait_for(
-            client.chat.completions.create(
+        completion = await asyncio.wait_for(
+            complete(
                 model=model,
                 messages=[
                     {
@@ -97,25 +587,32 @@ async def generate_with_citations(
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=600,
-                temperature=0.7
+                temperature=0.7,
+                cache_ttl=cache_ttl,
+                endpoint="single"
             ),
             timeout=timeout
         )
         
-        text = resp.choices[0].message.content or ""
+        text = completion["text"]
         
-        # Extract URLs from response
-        urls = re.findall(r"https?://[^\s,\)]+", text)
-        urls = [url.rstrip(".,;:!?)") for url in urls]
+        urls = citation_urls(text)
         
-        return {
+        result = {
             "prompt": prompt,
             "response": text,
             "citations": urls,
-            "model": model,
-            "tokens_used": resp.usage.total_tokens if resp.usage else None
+            "model": completion["model"],
+            "tokens_used": completion["tokens_used"],
+            "cached": completion["cached"]
         }
+        if completion.get("stale"):
+            result["stale"] = True
+        record_result(result, brand, prompt_type, source="single")
+        return result
         
+    except CircuitOpenError:
+        return _mock_single(prompt, brand)
     except asyncio.TimeoutError:
         return {
             "prompt": prompt,
@@ -132,93 +629,528 @@ async def generate_with_citations(
         }
 
 
+async def stream_with_citations(
+    prompt: str,
+    brand: str,
+    model: str = "gpt-4o-mini",
+    timeout: float = 30.0,
+    cache_ttl: Optional[float] = None,
+    prompt_type: Optional[str] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of generate_with_citations.
+    
+    Yields {"type": "token", "content": ...} events while the answer is
+    generated, then one {"type": "result", "result": {...}} event with the
+    same shape generate_with_citations returns. A fresh answer is recorded
+    in the citation store the same way.
+    """
+    if not OPENAI_AVAILABLE:
+        result = await generate_with_citations(prompt, brand, model=model, prompt_type=prompt_type)
+        for word in result["response"].split(" "):
+            yield {"type": "token", "content": word + " "}
+        yield {"type": "result", "result": result}
+        return
+
+    messages = [
+        {
+            "role": "system", 
+            "content": f"You are an expert analyst helping with {brand} research. Provide detailed, factual information. When applicable, mention authoritative sources or websites."
+        },
+        {"role": "user", "content": prompt}
+    ]
+    parts = []
+    error = None
+    circuit_open = False
+    timeout = get_latency_tracker().timeout(model, "stream", timeout)
+    deadline = time.monotonic() + timeout
+    status: Dict[str, Any] = {}
+    stream = stream_completion(messages, model=model, max_tokens=600, temperature=0.7, cache_ttl=cache_ttl, status=status)
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            try:
+                delta = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+            except StopAsyncIteration:
+                break
+            parts.append(delta)
+            yield {"type": "token", "content": delta}
+    except CircuitOpenError:
+        circuit_open = True
+    except asyncio.TimeoutError:
+        error = f"Request timed out after {timeout}s"
+    except Exception as e:
+        error = str(e)
+    finally:
+        await stream.aclose()
+
+    stale = await _stale_completion(messages, model, 600, 0.7) if circuit_open else None
+    if circuit_open and stale is None:
+        result = _mock_single(prompt, brand)
+        yield {"type": "token", "content": result["response"]}
+        yield {"type": "result", "result": result}
+        return
+    if stale is not None:
+        parts = [stale["text"]]
+        yield {"type": "token", "content": stale["text"]}
+
+    text = "".join(parts)
+    urls = citation_urls(text)
+    result = {
+        "prompt": prompt,
+        "response": text,
+        "citations": urls,
+        "model": model,
+        "tokens_used": stale.get("tokens_used") if stale is not None else status.get("tokens_used"),
+        "cached": stale is not None or status.get("cached", False)
+    }
+    if stale is not None:
+        result["stale"] = True
+    if error:
+        result["error"] = error
+    record_result(result, brand, prompt_type, source="single")
+    yield {"type": "result", "result": result}
+
+
+async def stream_structured(
+    prompt: str,
+    brand: str,
+    schema: Type[Any],
+    model: str = "gpt-4o-mini",
+    max_tokens: int = 800,
+    timeout: float = 30.0,
+    cache_ttl: Optional[float] = None,
+    prompt_type: Optional[str] = None,
+    check: Optional[Callable[[Any], Optional[str]]] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Schema-constrained analysis, parsed while it streams.
+    
+    Yields {"type": "partial", "data": {...}} each time more of the
+    structure has arrived (list items are held back until complete), then
+    one {"type": "result", "result": {...}} event shaped like
+    generate_with_citations' result plus "structured" (the validated dict,
+    or None), "repaired" and "structured_error". Output that does not
+    validate, or that `check` (model -> error or None) rejects, is fixed
+    locally when possible, otherwise by up to STRUCTURED_REPAIR_ATTEMPTS
+    short calls that only correct the JSON.
+    """
+    if not OPENAI_AVAILABLE:
+        yield {"type": "result", "result": {**_mock_single(prompt, brand), "structured": None, "repaired": False, "structured_error": None}}
+        return
+
+    messages = [
+        {
+            "role": "system",
+            "content": f"You are an expert analyst helping with {brand} research. Provide detailed, factual information. "
+                       f"Reply with one JSON object matching this JSON schema: {schema_hint(schema)}"
+        },
+        {"role": "user", "content": prompt}
+    ]
+    fmt = structured_format(schema)
+
+    def parse(text: str) -> Tuple[Any, Optional[str], bool]:
+        parsed, problem, fixed = parse_structured(schema, text)
+        if parsed is not None and check is not None:
+            problem = check(parsed)
+            if problem:
+                return None, problem, False
+        return parsed, problem, fixed
+
+    parser = IncrementalJSON()
+    parts: List[str] = []
+    last = None
+    error = None
+    circuit_open = False
+    timeout = get_latency_tracker().timeout(model, "structured", timeout)
+    deadline = time.monotonic() + timeout
+    status: Dict[str, Any] = {}
+    stream = stream_completion(
+        messages, model=model, max_tokens=max_tokens, temperature=0.2, cache_ttl=cache_ttl, response_format=fmt,
+        endpoint="structured", status=status
+    )
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            try:
+                delta = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+            except StopAsyncIteration:
+                break
+            parts.append(delta)
+            parser.feed(delta)
+            partial, _ = validate_structured(schema, parser.partial() or {}, partial=True)
+            if partial is not None:
+                data = partial.model_dump()
+                if data != last:
+                    last = data
+                    yield {"type": "partial", "data": data}
+    except CircuitOpenError:
+        circuit_open = True
+    except asyncio.TimeoutError:
+        error = f"Request timed out after {timeout}s"
+    except Exception as e:
+        error = str(e)
+    finally:
+        await stream.aclose()
+
+    stale = await _stale_completion(messages, model, max_tokens, 0.2, fmt) if circuit_open else None
+    if circuit_open and stale is None:
+        yield {"type": "result", "result": {**_mock_single(prompt, brand), "structured": None, "repaired": False, "structured_error": None}}
+        return
+    if stale is not None:
+        parts = [stale["text"]]
+
+    text = "".join(parts)
+    tokens_used = status.get("tokens_used") or (estimate_tokens(messages, 0) + len(text) // 4 if text else 0)
+    structured, structured_error, repaired = parse(text) if text else (None, error, False)
+    attempts = STRUCTURED_REPAIR_ATTEMPTS if text and not error else 0
+    broken = text
+    while structured is None and attempts > 0:
+        # Ask only for the JSON to be fixed, not for the analysis again
+        attempts -= 1
+        try:
+            fixed = await asyncio.wait_for(
+                complete(
+                    repair_messages(schema, broken, structured_error or ""),
+                    model=model,
+                    max_tokens=max_tokens,
+                    temperature=0,
+                    cache_ttl=cache_ttl,
+                    response_format=fmt,
+                    endpoint="repair"
+                ),
+                timeout=get_latency_tracker().timeout(model, "repair", timeout)
+            )
+        except Exception as e:
+            structured_error = f"Repair failed: {e}"
+            break
+        tokens_used += fixed["tokens_used"] or 0
+        broken = fixed["text"]
+        structured, structured_error, _ = parse(broken)
+        repaired = structured is not None
+
+    result = {
+        "prompt": prompt,
+        "response": text,
+        "citations": citation_urls(text),
+        "model": model,
+        "tokens_used": tokens_used,
+        # Replays (cache hits, stale answers) are already in the store
+        "cached": stale is not None or status.get("cached", False),
+        "structured": structured.model_dump() if structured is not None else None,
+        "repaired": repaired,
+        "structured_error": structured_error
+    }
+    if stale is not None:
+        result["stale"] = True
+    if error:
+        result["error"] = error
+    record_result(result, brand, prompt_type, source="structured")
+    yield {"type": "result", "result": result}
+
+
+def _answer_messages(prompt: str, brand: str) -> List[Dict[str, str]]:
+    """Messages for one batch prompt (also the response cache key packed answers are stored under)."""
+    return [
+        {
+            "role": "system", 
+            "content": f"You are an assistant helping with {brand} content. Cite URLs when applicable."
+        },
+        {"role": "user", "content": prompt}
+    ]
+
+
+async def _generate_one(
+    prompt: str,
+    brand: str,
+    model: str,
+    timeout: float,
+    cache_ttl: Optional[float] = None,
+    prompt_type: Optional[str] = None
+) -> Dict[str, Any]:
+    """Run a single prompt for generate_responses; never raises."""
+    started = time.perf_counter()
+    timeout = get_latency_tracker().timeout(model, "batch", timeout)
+    try:
+        completion = await asyncio.wait_for(
+            complete(
+                model=model,
+                messages=_answer_messages(prompt, brand),
+                max_tokens=300,
+                temperature=0.7,
+                cache_ttl=cache_ttl,
+                endpoint="batch"
+            ),
+            timeout=timeout
+        )
+        
+        text = completion["text"]
+        urls = citation_urls(text)
+        
+        result = {
+            "prompt": prompt,
+            "response": text,
+            "citations": urls,
+            "model": completion["model"],
+            "tokens_used": completion["tokens_used"],
+            "cached": completion["cached"],
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+        if completion.get("stale"):
+            result["stale"] = True
+        record_result(result, brand, prompt_type, source="batch")
+        return result
+        
+    except CircuitOpenError:
+        return {**_mock_single(prompt, brand), "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+    except asyncio.TimeoutError:
+        return {
+            "prompt": prompt,
+            "response": "",
+            "citations": [],
+            "error": f"Request timed out after {timeout}s",
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+    except Exception as e:
+        return {
+            "prompt": prompt,
+            "response": "",
+            "citations": [],
+            "error": str(e),
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+
+
+async def _generate_packed(
+    pack: List[Tuple[int, str]],
+    brand: str,
+    model: str,
+    timeout: float,
+    cache_ttl: Optional[float] = None,
+    prompt_types: Optional[List[Optional[str]]] = None
+) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Answer several prompts with one structured request; never raises.
+    
+    Prompts already in the response cache are served from it. The rest go
+    upstream together as numbered items under one system prompt, and each
+    answer is split back out into the same result dict _generate_one
+    returns (tokens_used is the call's total shared by answer length) and
+    cached under the key a single call would use. Items the reply leaves
+    unanswered, or a reply that cannot be parsed, fall back to individual
+    calls, as do answers a truncated reply cuts off (repair drops them
+    rather than closing their open string).
+    """
+    started = time.perf_counter()
+    cache = get_cache()
+    ttl = LLM_CACHE_TTL if cache_ttl is None else cache_ttl
+    use_cache = cache is not None and ttl > 0
+
+    singles: List[Tuple[int, str]] = []
+    pending: List[Tuple[int, str, str]] = []
+    for i, prompt in pack:
+        key = make_key(model, _answer_messages(prompt, brand), 0.7, 300)
+        if use_cache and await cache.get(key) is not None:
+            singles.append((i, prompt))
+        else:
+            pending.append((i, prompt, key))
+    if len(pending) < 2:
+        singles += [(i, prompt) for i, prompt, _ in pending]
+        pending = []
+
+    done: List[Tuple[int, Dict[str, Any]]] = []
+    answers: Dict[int, str] = {}
+    tokens_used = None
+    answered_by = model
+    if pending:
+        items = [{"id": n, "prompt": prompt} for n, (_, prompt, _) in enumerate(pending, start=1)]
+        messages = [
+            {
+                "role": "system",
+                "content": f"You are an assistant helping with {brand} content. Cite URLs when applicable. "
+                           f"Answer each item on its own, as if it were the only question asked. "
+                           f"Reply with JSON matching this schema: {schema_hint(PackedAnswers)}"
+            },
+            {"role": "user", "content": json.dumps(items, ensure_ascii=False)}
+        ]
+        pack_timeout = get_latency_tracker().timeout(model, "packed", timeout)
+        try:
+            completion = await asyncio.wait_for(
+                complete(
+                    messages,
+                    model=model,
+                    max_tokens=300 * len(pending),
+                    temperature=0.7,
+                    cache_ttl=0,  # answers are cached one by one below
+                    response_format=structured_format(PackedAnswers),
+                    endpoint="packed"
+                ),
+                timeout=pack_timeout
+            )
+            tokens_used = completion["tokens_used"]
+            answered_by = completion["model"]
+            # Only answers the reply finished survive a repaired parse
+            parsed, error, _ = parse_structured(PackedAnswers, completion["text"], allow_dropped=True)
+            if parsed is None:
+                logger.warning("Packed reply did not parse (%s); answering %d prompts one by one", error, len(pending))
+            else:
+                answers = {a.id: a.answer.strip() for a in parsed.answers if a.answer.strip()}
+        except asyncio.TimeoutError:
+            # A retry would wait out the same timeout again
+            latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            for i, prompt, _ in pending:
+                done.append((i, {
+                    "prompt": prompt,
+                    "response": "",
+                    "citations": [],
+                    "error": f"Request timed out after {pack_timeout}s",
+                    "latency_ms": latency_ms
+                }))
+            pending = []
+        except Exception as e:
+            logger.warning("Packed request failed (%s); answering %d prompts one by one", e, len(pending))
+
+    latency_ms = round((time.perf_counter() - started) * 1000, 1)
+    answered_chars = sum(len(answers[n]) for n in range(1, len(pending) + 1) if n in answers)
+    for n, (i, prompt, key) in enumerate(pending, start=1):
+        text = answers.get(n)
+        if text is None:
+            singles.append((i, prompt))
+            continue
+        share = round(tokens_used * len(text) / answered_chars) if tokens_used and answered_chars else None
+        result = {
+            "prompt": prompt,
+            "response": text,
+            "citations": citation_urls(text),
+            "model": answered_by,
+            "tokens_used": share,
+            "cached": False,
+            "packed": True,
+            "latency_ms": latency_ms
+        }
+        if use_cache:
+            if answered_by != model:
+                key = make_key(answered_by, _answer_messages(prompt, brand), 0.7, 300)
+            await cache.set(key, {"text": text, "tokens_used": share, "model": answered_by}, ttl)
+        record_result(result, brand, prompt_types[i] if prompt_types else None, source="batch")
+        done.append((i, result))
+
+    if singles:
+        results = await asyncio.gather(*(
+            _generate_one(prompt, brand, model, timeout, cache_ttl, prompt_types[i] if prompt_types else None)
+            for i, prompt in singles
+        ))
+        done += [(i, result) for (i, _), result in zip(singles, results)]
+    return done
+
+
 async def generate_responses(
     prompts: List[str], 
     brand: str,
     model: str = "gpt-4o-mini",
-    timeout: float = 30.0
+    timeout: float = 30.0,
+    concurrency: Optional[int] = None,
+    cache_ttl: Optional[float] = None,
+    prompt_types: Optional[List[Optional[str]]] = None,
+    packed: Optional[bool] = None
 ) -> List[Dict[str, Any]]:
     """
     Generate AI responses for multiple prompts.
     
+    Prompts run concurrently, at most `concurrency` at a time for this call
+    and at most LLM_GLOBAL_CONCURRENCY across the whole process. Results
+    come back in input order; a failing or slow prompt only affects its own
+    entry. In packed mode, up to LLM_PACK_SIZE prompts share one upstream
+    call and `concurrency` counts packs.
+    
     Args:
         prompts: List of prompt strings to process
         brand: Brand name for context
         model: OpenAI model to use
-        timeout: Timeout per request in seconds
+        timeout: Upper bound per request in seconds (tightened to the
+            observed latency once there is enough history, see utils/latency.py)
+        concurrency: Max prompts in flight for this call (1 = sequential,
+            default LLM_REQUEST_CONCURRENCY)
+        cache_ttl: Response cache TTL in seconds (None = default, 0 = bypass)
+        prompt_types: Optional prompt type per prompt, stored with each
+            answer in the citation history
+        packed: Answer several prompts per upstream call (default LLM_PACKED)
     
     Returns:
-        List of dicts with keys: prompt, response, citations, (optional: error, is_mock)
+        List of dicts with keys: prompt, response, citations, latency_ms,
+        (optional: cached, packed, error, is_mock)
     """
     if not OPENAI_AVAILABLE:
         return await _mock_generate(prompts, brand)
 
-    client = AsyncOpenAI(api_key=OPENAI_KEY)
-    results = []
+    results: List[Dict[str, Any]] = [{} for _ in prompts]
+    async for i, result in iter_responses(prompts, brand, model, timeout, concurrency, cache_ttl, prompt_types, packed):
+        results[i] = result
+    return results
 
-    for p in prompts:
-        try:
-            resp = await asyncio.wait_for(
-                client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {
-                            "role": "system", 
-                            "content": f"You are an assistant helping with {brand} content. Cite URLs when applicable."
-                        },
-                        {"role": "user", "content": p}
-                    ],
-                    max_tokens=300,
-                    temperature=0.7
-                ),
-                timeout=timeout
-            )
-            
-            text = resp.choices[0].message.content or ""
-            urls = re.findall(r"https?://[^\s,\)]+", text)
-            urls = [url.rstrip(".,;:!?)") for url in urls]
-            
-            results.append({
-                "prompt": p,
-                "response": text,
-                "citations": urls,
-                "model": model,
-                "tokens_used": resp.usage.total_tokens if resp.usage else None
-            })
-            
-        except asyncio.TimeoutError:
-            results.append({
-                "prompt": p,
-                "response": "",
-                "citations": [],
-                "error": f"Request timed out after {timeout}s"
-            })
-        except Exception as e:
-            results.append({
-                "prompt": p,
-                "response": "",
-                "citations": [],
-                "error": str(e)
-            })
 
-    return results
+async def iter_responses(
+    prompts: List[str],
+    brand: str,
+    model: str = "gpt-4o-mini",
+    timeout: float = 30.0,
+    concurrency: Optional[int] = None,
+    cache_ttl: Optional[float] = None,
+    prompt_types: Optional[List[Optional[str]]] = None,
+    packed: Optional[bool] = None
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Same fan-out as generate_responses, but yields (index, result) pairs in
+    completion order so callers can stream each answer as soon as it lands
+    (in packed mode, a pack's answers land together). Closing the iterator
+    early cancels the prompts still running.
+    """
+    if not OPENAI_AVAILABLE:
+        for i, result in enumerate(await _mock_generate(prompts, brand)):
+            yield i, result
+        return
+
+    limit = asyncio.Semaphore(max(1, concurrency or LLM_REQUEST_CONCURRENCY))
+
+    async def run(pack: List[Tuple[int, str]]) -> List[Tuple[int, Dict[str, Any]]]:
+        async with limit:
+            if len(pack) > 1:
+                return await _generate_packed(pack, brand, model, timeout, cache_ttl, prompt_types)
+            i, p = pack[0]
+            prompt_type = prompt_types[i] if prompt_types else None
+            return [(i, await _generate_one(p, brand, model, timeout, cache_ttl, prompt_type))]
+
+    indexed = list(enumerate(prompts))
+    size = max(1, LLM_PACK_SIZE) if (LLM_PACKED if packed is None else packed) else 1
+    tasks = [asyncio.ensure_future(run(indexed[k:k + size])) for k in range(0, len(indexed), size)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            for item in await next_done:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
 
 
 async def analyze_competitors(
     brand: str,
     competitors: List[str],
-    model: str = "gpt-4o-mini"
+    model: str = "gpt-4o-mini",
+    cache_ttl: Optional[float] = None
 ) -> Dict[str, Any]:
     """Analyze competitors for a brand."""
+    mock = {
+        "brand": brand,
+        "competitors": competitors,
+        "analysis": f"Mock competitor analysis for {brand} vs {', '.join(competitors)}",
+        "is_mock": True
+    }
     if not OPENAI_AVAILABLE:
-        return {
-            "brand": brand,
-            "competitors": competitors,
-            "analysis": f"Mock competitor analysis for {brand} vs {', '.join(competitors)}",
-            "is_mock": True
-        }
-    
-    client = AsyncOpenAI(api_key=OPENAI_KEY)
+        return mock
     
     prompt = f"""Analyze the competitive landscape for {brand}.
     
@@ -232,23 +1164,30 @@ Provide a detailed analysis including:
 """
     
     try:
-        resp = await client.chat.completions.create(
+        completion = await complete(
             model=model,
             messages=[
                 {"role": "system", "content": "You are a competitive analysis expert specializing in brand strategy."},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=800,
-            temperature=0.7
+            temperature=0.7,
+            cache_ttl=cache_ttl
         )
         
-        return {
+        result = {
             "brand": brand,
             "competitors": competitors,
-            "analysis": resp.choices[0].message.content,
-            "tokens_used": resp.usage.total_tokens if resp.usage else None
+            "analysis": completion["text"],
+            "tokens_used": completion["tokens_used"],
+            "cached": completion["cached"]
         }
+        if completion.get("stale"):
+            result["stale"] = True
+        return result
         
+    except CircuitOpenError:
+        return mock
     except Exception as e:
         return {
             "brand": brand,
@@ -261,18 +1200,18 @@ Provide a detailed analysis including:
 async def analyze_domains(
     domains: List[str],
     brand: str,
-    model: str = "gpt-4o-mini"
+    model: str = "gpt-4o-mini",
+    cache_ttl: Optional[float] = None
 ) -> Dict[str, Any]:
     """Analyze domain relevance and quality for a brand."""
+    mock = {
+        "brand": brand,
+        "domains": domains,
+        "analysis": f"Mock domain analysis for {', '.join(domains)}",
+        "is_mock": True
+    }
     if not OPENAI_AVAILABLE:
-        return {
-            "brand": brand,
-            "domains": domains,
-            "analysis": f"Mock domain analysis for {', '.join(domains)}",
-            "is_mock": True
-        }
-    
-    client = AsyncOpenAI(api_key=OPENAI_KEY)
+        return mock
     
     prompt = f"""Analyze these domains for {brand} marketing visibility:
 
@@ -286,23 +1225,30 @@ For each domain, provide:
 """
     
     try:
-        resp = await client.chat.completions.create(
+        completion = await complete(
             model=model,
             messages=[
                 {"role": "system", "content": "You are a digital marketing and SEO expert."},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=800,
-            temperature=0.7
+            temperature=0.7,
+            cache_ttl=cache_ttl
         )
         
-        return {
+        result = {
             "brand": brand,
             "domains": domains,
-            "analysis": resp.choices[0].message.content,
-            "tokens_used": resp.usage.total_tokens if resp.usage else None
+            "analysis": completion["text"],
+            "tokens_used": completion["tokens_used"],
+            "cached": completion["cached"]
         }
+        if completion.get("stale"):
+            result["stale"] = True
+        return result
         
+    except CircuitOpenError:
+        return mock
     except Exception as e:
         return {
             "brand": brand,
@@ -315,18 +1261,18 @@ For each domain, provide:
 async def generate_gap_analysis(
     brand: str,
     missing_topics: List[str],
-    model: str = "gpt-4o-mini"
+    model: str = "gpt-4o-mini",
+    cache_ttl: Optional[float] = None
 ) -> Dict[str, Any]:
     """Generate content gap analysis and recommendations."""
+    mock = {
+        "brand": brand,
+        "gaps": missing_topics,
+        "recommendations": f"Mock gap analysis for {', '.join(missing_topics)}",
+        "is_mock": True
+    }
     if not OPENAI_AVAILABLE:
-        return {
-            "brand": brand,
-            "gaps": missing_topics,
-            "recommendations": f"Mock gap analysis for {', '.join(missing_topics)}",
-            "is_mock": True
-        }
-    
-    client = AsyncOpenAI(api_key=OPENAI_KEY)
+        return mock
     
     prompt = f"""Analyze content gaps for {brand}:
 
@@ -340,23 +1286,30 @@ Provide:
 """
     
     try:
-        resp = await client.chat.completions.create(
+        completion = await complete(
             model=model,
             messages=[
                 {"role": "system", "content": "You are a content strategy and SEO expert."},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=800,
-            temperature=0.7
+            temperature=0.7,
+            cache_ttl=cache_ttl
         )
         
-        return {
+        result = {
             "brand": brand,
             "gaps": missing_topics,
-            "recommendations": resp.choices[0].message.content,
-            "tokens_used": resp.usage.total_tokens if resp.usage else None
+            "recommendations": completion["text"],
+            "tokens_used": completion["tokens_used"],
+            "cached": completion["cached"]
         }
+        if completion.get("stale"):
+            result["stale"] = True
+        return result
         
+    except CircuitOpenError:
+        return mock
     except Exception as e:
         return {
             "brand": brand,
@@ -0,0 +1,186 @@
+# backend/utils/brand_aliases.py
+import os
+import json
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from .text_index import PatternMatcher
+from .brand_domains import get_brand_domains
+
+HERE = Path(__file__).resolve().parent.parent  # backend/
+
+# JSON object of brand -> extra names, e.g. {"Nike": ["Nike Inc", "NKE", "Nikey"]}.
+# All-caps aliases of up to 5 letters are treated as tickers and matched case-sensitively.
+BRAND_ALIASES_PATH = Path(os.getenv("BRAND_ALIASES_PATH") or HERE / "brand_aliases.json")
+
+logger = logging.getLogger("brand_aliases")
+
+_aliases: Optional[Dict[str, List[str]]] = None
+
+
+def configured_aliases() -> Dict[str, List[str]]:
+    """Aliases from BRAND_ALIASES_PATH, keyed by lowercased brand name (loaded once)."""
+    global _aliases
+    if _aliases is None:
+        try:
+            with BRAND_ALIASES_PATH.open("r", encoding="utf-8") as f:
+                raw = json.load(f) or {}
+            _aliases = {str(k).lower(): [v] if isinstance(v, str) else list(v) for k, v in raw.items()}
+        except FileNotFoundError:
+            _aliases = {}
+        except Exception as e:
+            logger.warning("Could not load brand aliases from %s: %s", BRAND_ALIASES_PATH, e)
+            _aliases = {}
+    return _aliases
+
+
+def name_variants(name: str) -> List[str]:
+    """Spelling variants of a name: "Under Armour" -> "under-armour", "underarmour"; "&" <-> "and"."""
+    name = " ".join(name.split())
+    if not name:
+        return []
+    variants = [name]
+    for a, b in ((" & ", " and "), (" and ", " & ")):
+        if a in name.lower():
+            variants.append(name.lower().replace(a, b))
+    for v in list(variants):
+        if " " in v or "-" in v:
+            variants.append(v.replace("-", " "))
+            variants.append(v.replace(" ", "-"))
+            variants.append(v.replace(" ", "").replace("-", ""))
+    return list(dict.fromkeys(variants))
+
+
+def _is_ticker(alias: str) -> bool:
+    return alias.isalpha() and alias.isupper() and len(alias) <= 5
+
+
+def _word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class BrandMatcher:
+    """
+    One automaton over every name, alias and owned domain of a brand set.
+
+    scan() reports per-brand mention counts and [start, end) spans from a
+    single pass over the answer. Matches must sit on word boundaries
+    ("Nike's" counts, "Nikes" or "mynike.com" do not) and overlapping
+    matches resolve to the leftmost, then longest ("Under Armour" is one
+    mention, not also one of "Armour").
+    """
+
+    def __init__(self, names: Dict[str, Iterable[str]], case_sensitive: Iterable[str] = ()):
+        self.brands: List[str] = list(names)
+        self._owner: Dict[str, int] = {}
+        self._case_sensitive: Dict[str, str] = {alias.lower(): alias for alias in case_sensitive}
+        for i, brand in enumerate(self.brands):
+            for alias in names[brand]:
+                key = alias.lower()
+                if key and key not in self._owner:
+                    self._owner[key] = i
+        self._matcher = PatternMatcher(self._owner)
+
+    def spans(self, text: str) -> List[Tuple[int, int, str]]:
+        """(start, end, brand) for every mention, in text order."""
+        text = text or ""
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # Offsets must line up with the original text: characters whose
+            # lowercase form is longer ("İ") are kept as they are
+            lowered = "".join(low if len(low) == 1 else ch for ch, low in ((ch, ch.lower()) for ch in text))
+        patterns = self._matcher.patterns
+        found = []
+        for start, pid in self._matcher.finditer(lowered):
+            pattern = patterns[pid]
+            end = start + len(pattern)
+            if start > 0 and _word_char(lowered[start - 1]) and _word_char(pattern[0]):
+                continue
+            if end < len(lowered) and _word_char(lowered[end]) and _word_char(pattern[-1]):
+                continue
+            exact = self._case_sensitive.get(pattern)
+            if exact is not None and text[start:end] != exact:
+                continue
+            found.append((start, end, pattern))
+
+        found.sort(key=lambda m: (m[0], m[0] - m[1]))
+        result = []
+        last_end = -1
+        for start, end, pattern in found:
+            if start >= last_end:
+                result.append((start, end, self.brands[self._owner[pattern]]))
+                last_end = end
+        return result
+
+    def scan(self, text: str) -> Dict[str, Dict[str, Any]]:
+        """{brand: {"count", "spans"}} for one answer (every brand present, even at zero)."""
+        counts: Dict[str, Dict[str, Any]] = {b: {"count": 0, "spans": []} for b in self.brands}
+        for start, end, brand in self.spans(text):
+            counts[brand]["count"] += 1
+            counts[brand]["spans"].append([start, end])
+        return counts
+
+    def scan_many(self, texts: Iterable[str]) -> List[Dict[str, Dict[str, Any]]]:
+        return [self.scan(text) for text in texts]
+
+    def share_of_voice(self, texts: Iterable[str]) -> Dict[str, Any]:
+        """
+        Mentions, answers mentioning, and share of all brand mentions for
+        each brand across `texts`.
+        """
+        answers = 0
+        mentions = {b: 0 for b in self.brands}
+        mentioned_in = {b: 0 for b in self.brands}
+        for text in texts:
+            answers += 1
+            seen = set()
+            for _, _, brand in self.spans(text):
+                mentions[brand] += 1
+                seen.add(brand)
+            for brand in seen:
+                mentioned_in[brand] += 1
+        total = sum(mentions.values())
+        return {
+            "answers": answers,
+            "total_mentions": total,
+            "brands": {
+                b: {
+                    "mentions": mentions[b],
+                    "answers_mentioning": mentioned_in[b],
+                    "mention_rate": round(100 * mentioned_in[b] / answers, 1) if answers else 0.0,
+                    "share_of_voice": round(100 * mentions[b] / total, 1) if total else 0.0,
+                }
+                for b in self.brands
+            },
+        }
+
+
+@lru_cache(maxsize=256)
+def _compiled(brands: Tuple[str, ...], domains_version: int) -> BrandMatcher:
+    aliases = configured_aliases()
+    index = get_brand_domains()
+    names = {}
+    tickers = []
+    for brand in brands:
+        extra = aliases.get(brand.lower(), [])
+        tickers += [alias for alias in extra if _is_ticker(alias)]
+        names[brand] = (
+            name_variants(brand)
+            + [v for alias in extra for v in ([alias] if _is_ticker(alias) else name_variants(alias))]
+            + index.domains_of(brand)
+        )
+    return BrandMatcher(names, case_sensitive=tickers)
+
+
+def brand_matcher(brands: Iterable[str]) -> BrandMatcher:
+    """Shared matcher for a brand set (rebuilt when the owned-domain index changes)."""
+    unique = tuple(dict.fromkeys(b for b in brands if b and b.strip()))
+    return _compiled(unique, get_brand_domains().version)
+
+
+@lru_cache(maxsize=256)
+def term_matcher(terms: Tuple[str, ...]) -> BrandMatcher:
+    """Matcher for plain terms (topics, prompt types) with spelling variants but no aliases."""
+    return BrandMatcher({t: name_variants(t) for t in dict.fromkeys(terms) if t.strip()})
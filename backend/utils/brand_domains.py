@@ -0,0 +1,147 @@
+# backend/utils/brand_domains.py
+import os
+import re
+import json
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .public_suffix import registrable_domain
+
+HERE = Path(__file__).resolve().parent.parent  # backend/
+
+# JSON object of brand -> list of owned domains, e.g. {"Nike": ["nike.com", "jordan.com"]}
+BRAND_DOMAINS_PATH = Path(os.getenv("BRAND_DOMAINS_PATH") or HERE / "brand_domains.json")
+
+logger = logging.getLogger("brand_domains")
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]")
+
+
+def brand_token(name: str) -> str:
+    """Brand name reduced to lowercase letters and digits ("Coca-Cola" -> "cocacola")."""
+    return _NON_ALNUM.sub("", (name or "").lower())
+
+
+def _host(url_or_host: str) -> str:
+    if "://" in url_or_host:
+        try:
+            host = urlsplit(url_or_host).hostname or ""
+        except ValueError:
+            return ""
+    else:
+        host = url_or_host.split("/", 1)[0].split(":", 1)[0]
+    host = host.lower().rstrip(".")
+    return host[4:] if host.startswith("www.") else host
+
+
+class BrandDomainIndex:
+    """
+    Which brand owns which domain.
+
+    Owned domains come from configuration only (BRAND_DOMAINS_PATH). A
+    citation resolves to its owner with an exact host probe and then a
+    registrable-domain probe, both O(URL length); domains nobody is listed
+    for fall back to the "<brand>.<suffix>" rule, so "apple" owns apple.com
+    and apple.co.uk but not pineapple.com.
+    """
+
+    def __init__(self, config_path: Optional[Path] = BRAND_DOMAINS_PATH):
+        # host or registrable domain -> (brand token, brand name)
+        self._owners: Dict[str, Tuple[str, str]] = {}
+        self.configured = 0
+        # Bumped on every change so derived structures (brand matchers) know to rebuild
+        self.version = 0
+        if config_path is not None:
+            self.load_config(config_path)
+
+    def add(self, brand: str, domains: Iterable[str], override: bool = True) -> int:
+        """Record `brand` as owner of `domains`; returns how many entries changed."""
+        token = brand_token(brand)
+        if not token:
+            return 0
+        owners = dict(self._owners)
+        added = 0
+        for domain in domains:
+            host = _host(domain)
+            if not host or (not override and host in owners):
+                continue
+            if owners.get(host) != (token, brand):
+                owners[host] = (token, brand)
+                added += 1
+        self._owners = owners  # swapped whole so readers never see a partial update
+        if added:
+            self.version += 1
+        return added
+
+    def load_config(self, path: Path) -> None:
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning("Could not load brand domains from %s: %s", path, e)
+            return
+        for brand, domains in (config or {}).items():
+            self.configured += self.add(brand, [domains] if isinstance(domains, str) else domains)
+
+    def _resolve(self, url: str) -> Tuple[Optional[str], str]:
+        """(owning brand token or None, token of the registrable label)."""
+        host = _host(url)
+        if not host:
+            return None, ""
+        owner = self._owners.get(host)
+        registrable = registrable_domain(host)
+        if owner is None and registrable != host:
+            owner = self._owners.get(registrable)
+        return (owner[0] if owner else None), brand_token(registrable.split(".", 1)[0])
+
+    def owner(self, url_or_host: str) -> Optional[str]:
+        """Name of the brand that owns a URL or host, if any is known."""
+        host = _host(url_or_host)
+        if not host:
+            return None
+        owner = self._owners.get(host) or self._owners.get(registrable_domain(host))
+        return owner[1] if owner else None
+
+    def domains_of(self, brand: str) -> List[str]:
+        """Domains recorded as owned by `brand`."""
+        token = brand_token(brand)
+        return [domain for domain, (owner, _) in self._owners.items() if owner == token]
+
+    def owns(self, brand: str, urls: Iterable[str]) -> bool:
+        """True if any URL is on a domain owned by `brand`."""
+        token = brand_token(brand)
+        if not token:
+            return False
+        for url in urls:
+            owner, label = self._resolve(url)
+            if owner == token or (owner is None and label == token):
+                return True
+        return False
+
+    def share(self, urls: Iterable[str], brands: List[str]) -> Dict[str, int]:
+        """Citations owned by each of `brands` (each URL counts for at most one)."""
+        tokens = {brand_token(b): b for b in brands if brand_token(b)}
+        counts = {b: 0 for b in brands}
+        for url in urls:
+            owner, label = self._resolve(url)
+            brand = tokens.get(owner if owner is not None else label)
+            if brand is not None:
+                counts[brand] += 1
+        return counts
+
+    def stats(self) -> Dict[str, Any]:
+        return {"domains": len(self._owners), "configured": self.configured}
+
+
+_index: Optional[BrandDomainIndex] = None
+
+
+def get_brand_domains() -> BrandDomainIndex:
+    global _index
+    if _index is None:
+        _index = BrandDomainIndex()
+    return _index
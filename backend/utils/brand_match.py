@@ -0,0 +1,9 @@
+# backend/utils/brand_match.py
+from typing import List
+
+from .brand_domains import get_brand_domains
+
+
+def cites_brand(urls: List[str], name: str) -> bool:
+    """True if any URL is on a domain the brand owns (see BrandDomainIndex)."""
+    return get_brand_domains().owns(name, urls)
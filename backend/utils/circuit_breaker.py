@@ -0,0 +1,159 @@
+# backend/utils/circuit_breaker.py
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+# Trip when, over the last LLM_BREAKER_WINDOW seconds (and at least
+# LLM_BREAKER_MIN_CALLS calls), this share of upstream calls failed or ran
+# longer than LLM_BREAKER_SLOW_SECONDS
+LLM_BREAKER_ENABLED = os.getenv("LLM_BREAKER_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_BREAKER_WINDOW = float(os.getenv("LLM_BREAKER_WINDOW", "30"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.8"))
+LLM_BREAKER_SLOW_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "15"))
+# Seconds to fail fast before letting probe calls through (half-open)
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+# Probe calls that must succeed in a row to close again
+LLM_BREAKER_PROBES = int(os.getenv("LLM_BREAKER_PROBES", "2"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker over upstream call outcomes.
+
+    Closed: every call goes through and its outcome (error, or latency
+    against LLM_BREAKER_SLOW_SECONDS) lands in a sliding time window; a high
+    error or slow-call rate opens the breaker. Open: allow() refuses
+    immediately, so callers serve stale or mock results instead of waiting
+    out timeouts. After LLM_BREAKER_COOLDOWN it goes half-open and lets
+    LLM_BREAKER_PROBES calls through one at a time; they all succeeding
+    closes it, any failure re-opens it.
+    """
+
+    def __init__(
+        self,
+        window: float = LLM_BREAKER_WINDOW,
+        min_calls: int = LLM_BREAKER_MIN_CALLS,
+        error_rate: float = LLM_BREAKER_ERROR_RATE,
+        slow_rate: float = LLM_BREAKER_SLOW_RATE,
+        slow_seconds: float = LLM_BREAKER_SLOW_SECONDS,
+        cooldown: float = LLM_BREAKER_COOLDOWN,
+        probes: int = LLM_BREAKER_PROBES,
+        enabled: bool = LLM_BREAKER_ENABLED
+    ):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self.cooldown = cooldown
+        self.probes = max(1, probes)
+        self.enabled = enabled
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.opened = 0
+        self.rejected = 0
+        self._outcomes: Deque[Tuple[float, bool, bool]] = deque()  # (time, failed, slow)
+        self._probe_inflight = False
+        self._probe_started = 0.0
+        self._probe_successes = 0
+
+    def _trim(self, now: float) -> None:
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self.opened_at = now
+        self.opened += 1
+        self._outcomes.clear()
+        self._probe_inflight = False
+
+    def is_open(self) -> bool:
+        """True while calls are being refused (open, cooldown not yet over)."""
+        return self.enabled and self.state == OPEN and time.monotonic() - self.opened_at < self.cooldown
+
+    def allow(self) -> bool:
+        """Whether the next upstream call may go out; counts a probe when half-open."""
+        if not self.enabled or self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self.opened_at < self.cooldown:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probe_successes = 0
+            self._probe_inflight = False
+        # Half-open: one probe at a time (a probe that never reported back frees its slot after a cooldown)
+        if self._probe_inflight and now - self._probe_started < self.cooldown:
+            self.rejected += 1
+            return False
+        self._probe_inflight = True
+        self._probe_started = now
+        return True
+
+    def release(self) -> None:
+        """A call that ended without an outcome (cancelled): frees the probe slot, counts nothing."""
+        if self.enabled and self.state == HALF_OPEN:
+            self._probe_inflight = False
+
+    def record(self, seconds: float, failed: bool = False) -> None:
+        """Outcome of one upstream call."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        slow = seconds >= self.slow_seconds
+        if self.state == HALF_OPEN:
+            self._probe_inflight = False
+            if failed or slow:
+                self._open(now)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.probes:
+                self.state = CLOSED
+            return
+        if self.state == OPEN:
+            return  # calls that started before the breaker opened
+        self._outcomes.append((now, failed, slow))
+        self._trim(now)
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return
+        failures = sum(1 for _, f, _ in self._outcomes if f)
+        slow_calls = sum(1 for _, _, s in self._outcomes if s)
+        if failures >= self.error_rate * calls or slow_calls >= self.slow_rate * calls:
+            self._open(now)
+
+    def stats(self) -> Dict[str, Any]:
+        self._trim(time.monotonic())
+        calls = len(self._outcomes)
+        return {
+            "enabled": self.enabled,
+            "state": HALF_OPEN if self.state == OPEN and not self.is_open() else self.state,
+            "window_calls": calls,
+            "window_errors": sum(1 for _, f, _ in self._outcomes if f),
+            "window_slow": sum(1 for _, _, s in self._outcomes if s),
+            "times_opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+_breaker: Optional[CircuitBreaker] = None
+
+
+def get_breaker() -> CircuitBreaker:
+    global _breaker
+    if _breaker is None:
+        _breaker = CircuitBreaker()
+    return _breaker
@@ -0,0 +1,135 @@
+# backend/utils/citation_extract.py
+import re
+import sys
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from .public_suffix import registrable_domain
+
+# Query parameters that only identify the click, never the page
+TRACKING_PARAMS = frozenset({
+    "gclid", "dclid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "referrer", "_hsenc", "_hsmi", "spm", "si",
+})
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_")
+
+# TLDs accepted for bare domains ("see nike.com"); keeps "Node.js" or "README.md" out
+BARE_TLDS = frozenset("""
+com org net edu gov mil int io co ai app dev info biz me tv us uk ca au de fr es it nl be ch at se no dk fi
+ie pl pt cz gr ru ua in jp cn kr sg hk tw nz za br mx ar cl eu asia xyz tech site online store shop blog news
+""".split())
+
+# One pass finds markdown links, explicit URLs and bare domains, leftmost first
+_SCAN_RE = re.compile(
+    r"\[(?P<anchor>[^\]\n]{0,300})\]\((?P<md>https?://[^\s()]+(?:\([^\s()]*\)[^\s()]*)*)\)"
+    r"|(?P<url>https?://[^\s<>\"'`\[\]{}|\\^]+)"
+    r"|(?<![\w@./-])(?P<bare>(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+(?P<tld>[a-z]{2,24})\b(?:/[^\s<>\"'`\[\]{}|\\^]*)?)",
+    re.IGNORECASE,
+)
+
+TRAILING = ".,;:!?'\"*_"
+
+
+def _trim(url: str) -> str:
+    """Drop sentence punctuation and unbalanced closing brackets from a match."""
+    while url:
+        if url[-1] in TRAILING:
+            url = url[:-1]
+        elif url[-1] == ")" and url.count(")") > url.count("("):
+            url = url[:-1]
+        else:
+            break
+    return url
+
+
+@lru_cache(maxsize=65536)
+def canonicalize(raw: str) -> Optional[Tuple[str, str, str, str, str]]:
+    """
+    (url, domain, registrable_domain, path, key) for a raw match, or None if
+    it is not a usable web address. The host is lowercased; default ports,
+    fragments and tracking parameters are dropped. `domain` also loses a
+    leading "www.", and `key` ignores scheme and "www." so the http and
+    www variants of one page dedupe together.
+    """
+    if "://" not in raw:
+        raw = "https://" + raw
+    try:
+        parts = urlsplit(raw)
+        host = (parts.hostname or "").rstrip(".")
+        port = parts.port
+    except ValueError:
+        return None
+    if "." not in host:
+        return None
+    scheme = parts.scheme.lower()
+    if port == {"http": 80, "https": 443}.get(scheme):
+        port = None
+    netloc = host if port is None else f"{host}:{port}"
+    query = urlencode(
+        [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+         if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)],
+        doseq=True,
+    )
+    path = parts.path if parts.path not in ("", "/") else ""
+    domain = host[4:] if host.startswith("www.") else host
+    url = urlunsplit((scheme, netloc, path or "/", query, ""))
+    if not path and not query:
+        url = url[:-1]
+    key = urlunsplit(("", domain if port is None else f"{domain}:{port}", path, query, ""))
+    return url, sys.intern(domain), sys.intern(registrable_domain(domain)), path or "/", key
+
+
+def _matches(text: str) -> Iterable[Tuple[str, int, int, Optional[str]]]:
+    """(raw url, start, end, anchor text) for every candidate in `text`."""
+    for m in _SCAN_RE.finditer(text):
+        if m.group("md"):
+            yield m.group("md"), m.start("md"), m.end("md"), m.group("anchor").strip() or None
+            continue
+        kind = "url" if m.group("url") else "bare"
+        if kind == "bare" and m.group("tld").lower() not in BARE_TLDS:
+            continue
+        raw = _trim(m.group(kind))
+        start = m.start(kind)
+        if raw:
+            yield raw, start, start + len(raw), None
+
+
+def extract_citations(text: str) -> List[Dict[str, Any]]:
+    """
+    Citations in one answer, deduplicated, in order of first appearance.
+
+    Each is {"url", "domain", "registrable_domain", "path", "spans", "anchor"}
+    where spans are the [start, end) character offsets of every occurrence
+    and anchor is the link text of the first markdown occurrence, if any.
+    """
+    found: Dict[str, Dict[str, Any]] = {}
+    for raw, start, end, anchor in _matches(text or ""):
+        canonical = canonicalize(raw)
+        if canonical is None:
+            continue
+        url, domain, registrable, path, key = canonical
+        citation = found.get(key)
+        if citation is None:
+            citation = found[key] = {
+                "url": url,
+                "domain": domain,
+                "registrable_domain": registrable,
+                "path": path,
+                "spans": [],
+                "anchor": anchor,
+            }
+        elif citation["anchor"] is None:
+            citation["anchor"] = anchor
+        citation["spans"].append([start, end])
+    return list(found.values())
+
+
+def extract_many(texts: Iterable[str]) -> List[List[Dict[str, Any]]]:
+    """extract_citations() over a batch; canonical forms and domains are shared across answers."""
+    return [extract_citations(text) for text in texts]
+
+
+def citation_urls(text: str) -> List[str]:
+    """Just the canonical URLs, the shape stored on results as "citations"."""
+    return [c["url"] for c in extract_citations(text)]
@@ -0,0 +1,575 @@
+# backend/utils/citation_store.py
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional
+from urllib.parse import urlparse
+
+from .brand_match import cites_brand
+from .brand_aliases import brand_matcher
+from .timeseries import get_timeseries
+
+HERE = Path(__file__).resolve().parent.parent  # backend/
+
+CITATION_DB_PATH = Path(os.getenv("CITATION_DB_PATH") or HERE / ".cache" / "citations.sqlite3")
+CITATION_STORE_ENABLED = os.getenv("CITATION_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+CITATION_BATCH_SIZE = int(os.getenv("CITATION_BATCH_SIZE", "200"))
+CITATION_FLUSH_INTERVAL = float(os.getenv("CITATION_FLUSH_INTERVAL", "1.0"))
+# Rows held for retry while flushes keep failing; the oldest are dropped past this
+CITATION_BUFFER_MAX = int(os.getenv("CITATION_BUFFER_MAX", "20000"))
+
+logger = logging.getLogger("citation_store")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    brand TEXT NOT NULL,
+    prompt_type TEXT,
+    model TEXT,
+    source TEXT,
+    prompt TEXT NOT NULL,
+    response TEXT NOT NULL,
+    tokens_used INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_responses_brand_ts ON responses(brand, ts);
+CREATE INDEX IF NOT EXISTS idx_responses_type_ts ON responses(prompt_type, ts);
+CREATE INDEX IF NOT EXISTS idx_responses_model_ts ON responses(model, ts);
+CREATE INDEX IF NOT EXISTS idx_responses_ts ON responses(ts);
+
+CREATE TABLE IF NOT EXISTS citations (
+    id INTEGER PRIMARY KEY,
+    response_id INTEGER NOT NULL REFERENCES responses(id),
+    ts REAL NOT NULL,
+    brand TEXT NOT NULL,
+    prompt_type TEXT,
+    model TEXT,
+    position INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    domain TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_citations_domain_ts ON citations(domain, ts);
+CREATE INDEX IF NOT EXISTS idx_citations_brand_ts ON citations(brand, ts);
+CREATE INDEX IF NOT EXISTS idx_citations_type_ts ON citations(prompt_type, ts);
+CREATE INDEX IF NOT EXISTS idx_citations_model_ts ON citations(model, ts);
+CREATE INDEX IF NOT EXISTS idx_citations_response ON citations(response_id);
+
+-- Per-day visibility counts, maintained on ingest. competitor = '' holds
+-- the brand-only counts; other rows exist for tracked competitors.
+CREATE TABLE IF NOT EXISTS visibility_rollups (
+    brand TEXT NOT NULL,
+    competitor TEXT NOT NULL,
+    prompt_type TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    answers INTEGER NOT NULL DEFAULT 0,
+    brand_mentions INTEGER NOT NULL DEFAULT 0,
+    brand_citations INTEGER NOT NULL DEFAULT 0,
+    competitor_mentions INTEGER NOT NULL DEFAULT 0,
+    competitor_citations INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (brand, competitor, prompt_type, day)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS tracked_competitors (
+    brand TEXT NOT NULL,
+    competitor TEXT NOT NULL,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (brand, competitor)
+) WITHOUT ROWID;
+"""
+
+# Only answers to brand-neutral prompts (visibility sampling) are rolled up:
+# the other sources ask about the brand by name, so their answers mention it
+# almost every time and the rate would measure nothing
+ROLLUP_SOURCES = ("sampling",)
+
+ROLLUP_COUNTS = ("answers", "brand_mentions", "brand_citations", "competitor_mentions", "competitor_citations")
+
+UPSERT_ROLLUP = """
+INSERT INTO visibility_rollups (brand, competitor, prompt_type, day, {cols})
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (brand, competitor, prompt_type, day) DO UPDATE SET {updates}
+""".format(
+    cols=", ".join(ROLLUP_COUNTS),
+    updates=", ".join(f"{c} = {c} + excluded.{c}" for c in ROLLUP_COUNTS),
+)
+
+
+def normalize_domain(url_or_host: str) -> str:
+    """Lowercased host without port or leading www."""
+    host = urlparse(url_or_host).hostname if "://" in url_or_host else url_or_host
+    host = (host or "").lower().rstrip(".")
+    return host[4:] if host.startswith("www.") else host
+
+
+def _visibility_counts(brand: str, competitor: str, response: str, urls: List[str]) -> List[int]:
+    """One answer's contribution to a rollup row, in ROLLUP_COUNTS order."""
+    # Blank names are not matched at all (brand_matcher drops them)
+    mentions = brand_matcher([brand, competitor] if competitor else [brand]).scan(response)
+    counts = [1, int(bool(mentions.get(brand, {}).get("count", 0))), int(cites_brand(urls, brand)), 0, 0]
+    if competitor:
+        counts[3] = int(bool(mentions.get(competitor, {}).get("count", 0)))
+        counts[4] = int(cites_brand(urls, competitor))
+    return counts
+
+
+def domain_series(domain: str, brand: Optional[str] = None) -> tuple:
+    """
+    (series, total_series) for the share of answers citing `domain`: all
+    answers, or only the answers given for `brand`.
+    """
+    domain = normalize_domain(domain)
+    if brand:
+        return f"domain:{brand}:{domain}", f"brand:{brand}"
+    return f"domain:{domain}", "answers:all"
+
+
+class CitationStore:
+    """
+    Embedded SQLite (WAL) store of every prompt/response/citation row.
+
+    record() only appends to an in-memory buffer; a background task flushes
+    the buffer in one transaction per batch, so ingestion never blocks a
+    request on disk I/O. The same transaction bumps the per-day visibility
+    rollups, so heatmaps read a handful of pre-aggregated rows instead of
+    scanning history, and each flushed batch is appended to the time series
+    ("answers:all", "brand:<brand>", "domain:<domain>",
+    "domain:<brand>:<domain>") behind trend charts.
+    """
+
+    def __init__(
+        self,
+        path: Path = CITATION_DB_PATH,
+        batch_size: int = CITATION_BATCH_SIZE,
+        buffer_max: int = CITATION_BUFFER_MAX
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.buffer_max = buffer_max
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        # Serializes flushes with competitor backfills so no answer is counted twice or missed
+        self._write_lock = threading.Lock()
+        # Refreshed from tracked_competitors in every flush (other processes add to it too)
+        self._tracked: Dict[str, set] = {}
+        self._pending_tracks: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._tracked = self._read_tracked(conn)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.path), timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # -----------------------
+    # Ingestion
+    # -----------------------
+    def record(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Queue rows for writing. Each row: brand, prompt, response, citations,
+        and optionally prompt_type, model, source, tokens_used, ts.
+        """
+        if not rows:
+            return
+        now = time.time()
+        with self._lock:
+            for row in rows:
+                self._buffer.append({**row, "ts": row.get("ts") or now})
+            full = len(self._buffer) >= self.batch_size
+        if full and self._wakeup is not None:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Write everything buffered so far; returns the number of responses
+        written. When the database fails, the rows go back to the front of
+        the buffer for the next flush (past buffer_max the oldest are
+        dropped) and the error is re-raised. A batch that fails on its data
+        is written row by row instead, and the rows that fail are dropped.
+        """
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        error: Optional[Exception] = None
+        try:
+            self._commit(rows)
+        except sqlite3.OperationalError:
+            self._requeue(rows)
+            raise
+        except Exception:
+            logger.exception("Citation batch of %d row(s) failed; writing it row by row", len(rows))
+            rows, error = self._commit_each(rows)
+        self.written += len(rows)
+        try:
+            get_timeseries().append(self._series_points(rows))
+        except OSError as e:
+            logger.warning("Time series append failed: %s", e)
+        if error is not None:
+            raise error
+        return len(rows)
+
+    def _commit(self, rows: List[Dict[str, Any]]) -> None:
+        with self._write_lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._tracked = self._read_tracked(conn)
+                self._write(conn, rows)
+                self._rollup(conn, rows)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _commit_each(self, rows: List[Dict[str, Any]]) -> tuple:
+        """(rows written, database error that stopped it or None); bad rows are logged and dropped."""
+        written = []
+        for n, row in enumerate(rows):
+            try:
+                self._commit([row])
+            except sqlite3.OperationalError as e:
+                self._requeue(rows[n:])
+                return written, e
+            except Exception:
+                logger.exception("Dropping citation row that cannot be written (brand %r)", row.get("brand"))
+                self.dropped += 1
+                continue
+            written.append(row)
+        return written, None
+
+    def _requeue(self, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._buffer = rows + self._buffer
+            overflow = len(self._buffer) - self.buffer_max
+            if overflow > 0:
+                del self._buffer[:overflow]
+                self.dropped += overflow
+        if overflow > 0:
+            logger.warning("Citation buffer full: dropped %d unwritten row(s)", overflow)
+
+    @staticmethod
+    def _series_points(rows: List[Dict[str, Any]]) -> List[tuple]:
+        points = []
+        for row in rows:
+            ts = row["ts"]
+            points.append(("answers:all", ts, 1.0))
+            # Mean of the brand series is its mention rate
+            mentions = brand_matcher([row["brand"]]).scan(row.get("response") or "")
+            points.append((f"brand:{row['brand']}", ts, float(bool(mentions.get(row["brand"], {}).get("count", 0)))))
+            for domain in {normalize_domain(url) for url in row.get("citations") or []}:
+                if domain:
+                    points.append((f"domain:{domain}", ts, 1.0))
+                    points.append((domain_series(domain, row["brand"])[0], ts, 1.0))
+        return points
+
+    def _write(self, conn: sqlite3.Connection, rows: List[Dict[str, Any]]) -> None:
+        citation_rows = []
+        for row in rows:
+            cur = conn.execute(
+                """INSERT INTO responses (ts, brand, prompt_type, model, source, prompt, response, tokens_used)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (row["ts"], row["brand"], row.get("prompt_type"), row.get("model"), row.get("source"),
+                 row["prompt"], row.get("response") or "", row.get("tokens_used")),
+            )
+            response_id = cur.lastrowid
+            for position, url in enumerate(row.get("citations") or []):
+                citation_rows.append((
+                    response_id, row["ts"], row["brand"], row.get("prompt_type"), row.get("model"),
+                    position, url, normalize_domain(url),
+                ))
+        conn.executemany(
+            """INSERT INTO citations (response_id, ts, brand, prompt_type, model, position, url, domain)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            citation_rows,
+        )
+
+    def _rollup(self, conn: sqlite3.Connection, rows: List[Dict[str, Any]], only: Optional[str] = None) -> None:
+        """Add rows from ROLLUP_SOURCES to visibility_rollups (for one competitor when `only` is given)."""
+        totals: Dict[tuple, List[int]] = {}
+        for row in rows:
+            if row.get("source") not in ROLLUP_SOURCES:
+                continue
+            brand = row["brand"]
+            competitors = [only] if only is not None else ["", *sorted(self._tracked.get(brand, ()))]
+            for competitor in competitors:
+                key = (brand, competitor, row.get("prompt_type") or "", int(row["ts"] // 86400))
+                counts = _visibility_counts(brand, competitor, row.get("response") or "", row.get("citations") or [])
+                acc = totals.setdefault(key, [0] * len(ROLLUP_COUNTS))
+                for i, c in enumerate(counts):
+                    acc[i] += c
+        conn.executemany(UPSERT_ROLLUP, [(*key, *acc) for key, acc in totals.items()])
+
+    @staticmethod
+    def _read_tracked(conn: sqlite3.Connection) -> Dict[str, set]:
+        tracked: Dict[str, set] = {}
+        for r in conn.execute("SELECT brand, competitor FROM tracked_competitors"):
+            tracked.setdefault(r["brand"], set()).add(r["competitor"])
+        return tracked
+
+    def is_tracked(self, brand: str, competitor: str) -> bool:
+        return competitor in self._tracked.get(brand, ())
+
+    def track_competitor(self, brand: str, competitor: str) -> bool:
+        """
+        Start keeping rollups for (brand, competitor). Only queues the pair:
+        the flush task registers it and backfills its rollups from stored
+        history, off the request path. Returns True if it was newly queued.
+        """
+        if not competitor or self.is_tracked(brand, competitor):
+            return False
+        with self._lock:
+            if (brand, competitor) in self._pending_tracks:
+                return False
+            self._pending_tracks.add((brand, competitor))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def backfill_pending(self) -> int:
+        """Register queued competitors and backfill their rollups; returns how many were new."""
+        with self._lock:
+            pending, self._pending_tracks = self._pending_tracks, set()
+        added = 0
+        for brand, competitor in sorted(pending):
+            try:
+                added += self._backfill(brand, competitor)
+            except Exception:
+                with self._lock:
+                    self._pending_tracks.add((brand, competitor))
+                raise
+        return added
+
+    def _backfill(self, brand: str, competitor: str) -> bool:
+        # Registration and backfill share one transaction, and flushes read the
+        # tracked set inside theirs, so every answer is counted exactly once
+        with self._write_lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO tracked_competitors (brand, competitor, added_at) VALUES (?, ?, ?)",
+                    (brand, competitor, time.time()),
+                )
+                # Already registered (e.g. by another process), which backfilled it then
+                if cur.rowcount:
+                    marks = ",".join("?" * len(ROLLUP_SOURCES))
+                    history = [dict(r) for r in conn.execute(
+                        f"SELECT id, ts, brand, prompt_type, source, response FROM responses WHERE brand = ? AND source IN ({marks})",
+                        (brand, *ROLLUP_SOURCES),
+                    )]
+                    urls: Dict[int, List[str]] = {}
+                    for c in conn.execute("SELECT response_id, url FROM citations WHERE brand = ?", (brand,)):
+                        urls.setdefault(c["response_id"], []).append(c["url"])
+                    for row in history:
+                        row["citations"] = urls.get(row["id"], [])
+                    self._rollup(conn, history, only=competitor)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._tracked.setdefault(brand, set()).add(competitor)
+        return bool(cur.rowcount)
+
+    async def _flush_loop(self, interval: float) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+                await asyncio.to_thread(self.backfill_pending)
+            except Exception as e:
+                logger.warning("Citation store flush failed: %s", e)
+
+    def start(self, interval: float = CITATION_FLUSH_INTERVAL) -> None:
+        if self._flusher is None:
+            self._wakeup = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop(interval))
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await asyncio.to_thread(self.flush)
+        await asyncio.to_thread(self.backfill_pending)
+
+    # -----------------------
+    # Queries
+    # -----------------------
+    @staticmethod
+    def _filters(
+        brand: Optional[str] = None,
+        prompt_type: Optional[str] = None,
+        model: Optional[str] = None,
+        domain: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None
+    ):
+        clauses, params = [], []
+        for column, value in (("brand", brand), ("prompt_type", prompt_type), ("model", model)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if domain is not None:
+            clauses.append("domain = ?")
+            params.append(normalize_domain(domain))
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query_responses(self, limit: int = 100, offset: int = 0, **filters) -> List[Dict[str, Any]]:
+        where, params = self._filters(**filters)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM responses{where} ORDER BY ts DESC LIMIT ? OFFSET ?", (*params, limit, offset)
+            ).fetchall()
+            responses = [dict(r) for r in rows]
+            if responses:
+                ids = [r["id"] for r in responses]
+                marks = ",".join("?" * len(ids))
+                by_response: Dict[int, List[str]] = {}
+                for c in conn.execute(
+                    f"SELECT response_id, url FROM citations WHERE response_id IN ({marks}) ORDER BY position", ids
+                ):
+                    by_response.setdefault(c["response_id"], []).append(c["url"])
+                for r in responses:
+                    r["citations"] = by_response.get(r["id"], [])
+        return responses
+
+    def iter_response_texts(self, batch: int = 1000, **filters) -> Iterator[List[str]]:
+        """Stored answer texts in batches, streamed from one cursor (oldest first)."""
+        where, params = self._filters(**filters)
+        with self._connect() as conn:
+            cursor = conn.execute(f"SELECT response FROM responses{where} ORDER BY ts", params)
+            while True:
+                rows = cursor.fetchmany(batch)
+                if not rows:
+                    return
+                yield [r[0] for r in rows]
+
+    def query_citations(self, limit: int = 100, offset: int = 0, **filters) -> List[Dict[str, Any]]:
+        where, params = self._filters(**filters)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM citations{where} ORDER BY ts DESC LIMIT ? OFFSET ?", (*params, limit, offset)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def top_domains(self, limit: int = 20, **filters) -> List[Dict[str, Any]]:
+        where, params = self._filters(**filters)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"""SELECT domain, COUNT(*) AS citations, COUNT(DISTINCT response_id) AS responses
+                    FROM citations{where} GROUP BY domain ORDER BY citations DESC LIMIT ?""",
+                (*params, limit),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def heatmap(
+        self,
+        brand: str,
+        competitor: str = "",
+        days: int = 30,
+        prompt_types: Optional[List[str]] = None
+    ) -> Dict[str, Dict[str, int]]:
+        """Rollup counts per prompt type over the last `days` days."""
+        since_day = int(time.time() // 86400) - days + 1
+        type_clause = ""
+        params: List[Any] = [brand, competitor or "", since_day]
+        if prompt_types:
+            type_clause = f" AND prompt_type IN ({','.join('?' * len(prompt_types))})"
+            params.extend(prompt_types)
+        sums = ", ".join(f"SUM({c}) AS {c}" for c in ROLLUP_COUNTS)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"""SELECT prompt_type, {sums} FROM visibility_rollups
+                    WHERE brand = ? AND competitor = ? AND day >= ?{type_clause}
+                    GROUP BY prompt_type""",
+                params,
+            ).fetchall()
+        return {r["prompt_type"]: {c: r[c] for c in ROLLUP_COUNTS} for r in rows}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._buffer)
+        return {"path": str(self.path), "written": self.written, "pending": pending, "dropped": self.dropped}
+
+
+_store: Optional[CitationStore] = None
+
+
+def get_citation_store() -> Optional[CitationStore]:
+    """Process-wide store, or None when CITATION_STORE_ENABLED is off."""
+    global _store
+    if not CITATION_STORE_ENABLED:
+        return None
+    if _store is None:
+        _store = CitationStore()
+    return _store
+
+
+def record_result(
+    result: Dict[str, Any],
+    brand: str,
+    prompt_type: Optional[str] = None,
+    source: Optional[str] = None
+) -> None:
+    """
+    Queue one fresh upstream answer for the store. Mock, cached and failed
+    results are skipped: they are either not real answers or already stored.
+    So are answers without a brand, which no history view can select.
+    """
+    if result.get("is_mock") or result.get("cached") or result.get("error") or not result.get("response"):
+        return
+    brand = (brand or "").strip()
+    if not brand:
+        return
+    store = get_citation_store()
+    if store is None:
+        return
+    store.record([{
+        "brand": brand,
+        "prompt": result.get("prompt", ""),
+        "response": result["response"],
+        "citations": result.get("citations") or [],
+        "model": result.get("model"),
+        "tokens_used": result.get("tokens_used"),
+        "prompt_type": prompt_type,
+        "source": source,
+    }])
+
+
+async def start_citation_store() -> None:
+    store = get_citation_store()
+    if store is not None:
+        store.start()
+
+
+async def stop_citation_store() -> None:
+    if _store is not None:
+        await _store.stop()
@@ -0,0 +1,229 @@
+# backend/utils/domain_cache.py
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Awaitable, Callable, Tuple
+
+from .singleflight import SingleFlight
+
+HERE = Path(__file__).resolve().parent.parent  # backend/
+
+DOMAIN_CACHE_ENABLED = os.getenv("DOMAIN_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Good answers are fresh for a week, then served stale (while refreshing) for a month
+DOMAIN_CACHE_TTL = float(os.getenv("DOMAIN_CACHE_TTL", str(7 * 86400)))
+DOMAIN_CACHE_STALE_TTL = float(os.getenv("DOMAIN_CACHE_STALE_TTL", str(30 * 86400)))
+# Failed lookups are remembered briefly so a dead upstream is not hammered
+DOMAIN_CACHE_NEGATIVE_TTL = float(os.getenv("DOMAIN_CACHE_NEGATIVE_TTL", "300"))
+DOMAIN_CACHE_MAX_ENTRIES = int(os.getenv("DOMAIN_CACHE_MAX_ENTRIES", "50000"))
+DOMAIN_CACHE_DISK = os.getenv("DOMAIN_CACHE_DISK", "true").lower() in ("1", "true", "yes")
+DOMAIN_CACHE_PATH = Path(os.getenv("DOMAIN_CACHE_PATH") or HERE / ".cache" / "domain_cache.sqlite3")
+
+logger = logging.getLogger("domain_cache")
+
+# (fresh_until, stale_until, negative, value)
+Entry = Tuple[float, float, bool, Dict[str, Any]]
+
+
+class _DiskTier:
+    """SQLite (WAL) copy of the memory tier, shared by every worker on the host."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS domain_info (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                fresh_until REAL NOT NULL,
+                stale_until REAL NOT NULL,
+                negative INTEGER NOT NULL
+            )"""
+        )
+
+    def get(self, key: str, now: float) -> Optional[Entry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fresh_until, stale_until, negative, value FROM domain_info WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM domain_info WHERE key = ?", (key,))
+                return None
+            return row[0], row[1], bool(row[2]), json.loads(row[3])
+
+    def put(self, key: str, entry: Entry) -> None:
+        fresh_until, stale_until, negative, value = entry
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO domain_info (key, value, fresh_until, stale_until, negative) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), fresh_until, stale_until, int(negative)),
+            )
+
+
+class DomainInfoCache:
+    """
+    Memory LRU (+ optional SQLite tier) for per-domain lookups.
+
+    get_or_fetch() returns fresh entries directly. Entries past their TTL
+    but inside the stale window are returned immediately while one
+    background refresh replaces them. Misses are coalesced so concurrent
+    requests for the same domain share a single upstream call. Results
+    whose "source" is "error" are cached for DOMAIN_CACHE_NEGATIVE_TTL only
+    and never served stale.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DOMAIN_CACHE_TTL,
+        stale_ttl: float = DOMAIN_CACHE_STALE_TTL,
+        negative_ttl: float = DOMAIN_CACHE_NEGATIVE_TTL,
+        max_entries: int = DOMAIN_CACHE_MAX_ENTRIES,
+        disk_path: Optional[Path] = DOMAIN_CACHE_PATH if DOMAIN_CACHE_DISK else None
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._inflight = SingleFlight()
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.disk: Optional[_DiskTier] = None
+        if disk_path is not None:
+            try:
+                self.disk = _DiskTier(disk_path)
+            except Exception as e:
+                logger.warning("Domain disk cache unavailable (%s); using memory only", e)
+        self.hits = 0
+        self.disk_hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def _remember(self, key: str, entry: Entry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _lookup(self, key: str, now: float) -> Optional[Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= now:
+            del self._entries[key]
+            entry = None
+        if entry is None and self.disk is not None:
+            try:
+                entry = await asyncio.to_thread(self.disk.get, key, now)
+            except Exception as e:
+                logger.warning("Domain disk cache read failed: %s", e)
+            if entry is not None:
+                self.disk_hits += 1
+                self._remember(key, entry)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    async def _store(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        negative = value.get("source") == "error"
+        fresh_until = now + (self.negative_ttl if negative else self.ttl)
+        stale_until = fresh_until if negative else fresh_until + self.stale_ttl
+        entry = (fresh_until, stale_until, negative, value)
+        self._remember(key, entry)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.put, key, entry)
+            except Exception as e:
+                logger.warning("Domain disk cache write failed: %s", e)
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        value = await fetch()
+        await self._store(key, value)
+        return value
+
+    def _refresh(self, key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        if key in self._refreshing:
+            return
+
+        async def run() -> None:
+            try:
+                value = await fetch()
+                if value.get("source") == "error":
+                    # Keep serving the stale copy rather than a placeholder
+                    self.refresh_failures += 1
+                    return
+                await self._store(key, value)
+            except Exception as e:
+                self.refresh_failures += 1
+                logger.warning("Background refresh for %s failed: %s", key, e)
+            finally:
+                self._refreshing.pop(key, None)
+
+        self.refreshes += 1
+        self._refreshing[key] = asyncio.ensure_future(run())
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        now = time.time()
+        entry = await self._lookup(key, now)
+        if entry is not None:
+            fresh_until, _, negative, value = entry
+            if fresh_until > now:
+                if negative:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return {**value, "cache": "negative" if negative else "hit"}
+            self.stale_hits += 1
+            self._refresh(key, fetch)
+            return {**value, "cache": "stale"}
+
+        self.misses += 1
+        value = await self._inflight.do(key, lambda: self._fetch_and_store(key, fetch))
+        return {**value, "cache": "miss"}
+
+    async def close(self) -> None:
+        for task in list(self._refreshing.values()):
+            task.cancel()
+        self._refreshing.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.negative_hits + self.misses
+        return {
+            "enabled": DOMAIN_CACHE_ENABLED,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "stale_hits": self.stale_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": round((lookups - self.misses) / lookups, 3) if lookups else None,
+            "refreshing": len(self._refreshing),
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "disk_path": str(self.disk.path) if self.disk else None,
+        }
+
+
+_cache: Optional[DomainInfoCache] = None
+
+
+def get_domain_cache() -> Optional[DomainInfoCache]:
+    """Process-wide domain cache, or None when DOMAIN_CACHE_ENABLED is off."""
+    global _cache
+    if not DOMAIN_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = DomainInfoCache()
+    return _cache
@@ -0,0 +1,155 @@
+# backend/utils/duckduckgo.py
+import os
+import time
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from .ai_client import _http2_supported
+from .domain_cache import get_domain_cache
+
+# Point at a local stand-in server for tests / offline demos
+DUCKDUCKGO_API_URL = os.getenv("DUCKDUCKGO_API_URL", "https://api.duckduckgo.com/")
+DDG_TIMEOUT = float(os.getenv("DDG_TIMEOUT", "10"))
+# Total lookups in flight per request, and per upstream host across the process
+DDG_CONCURRENCY = int(os.getenv("DDG_CONCURRENCY", "8"))
+DDG_PER_HOST_LIMIT = int(os.getenv("DDG_PER_HOST_LIMIT", "4"))
+# Wall-clock budget for a whole batch; unfinished lookups come back as errors
+DDG_DEADLINE = float(os.getenv("DDG_DEADLINE", "8"))
+DDG_HTTP2 = os.getenv("DDG_HTTP2", "true").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger("duckduckgo")
+
+_http: Optional[httpx.AsyncClient] = None
+_host_limits: Dict[str, asyncio.Semaphore] = {}
+
+
+# -----------------------
+# Shared client lifecycle
+# -----------------------
+def _build_http() -> httpx.AsyncClient:
+    http2 = DDG_HTTP2 and _http2_supported()
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=DDG_TIMEOUT,
+        limits=httpx.Limits(max_connections=max(DDG_CONCURRENCY, DDG_PER_HOST_LIMIT), max_keepalive_connections=DDG_PER_HOST_LIMIT),
+        headers={"User-Agent": "geo-gap-compass/0.1"},
+    )
+
+
+def get_http() -> httpx.AsyncClient:
+    """Process-wide pooled client (created by init_http() in the app lifespan, or lazily)."""
+    global _http
+    if _http is None:
+        _http = _build_http()
+    return _http
+
+
+async def init_http() -> None:
+    get_http()
+
+
+async def close_http() -> None:
+    global _http
+    cache = get_domain_cache()
+    if cache is not None:
+        await cache.close()
+    if _http is not None:
+        client, _http = _http, None
+        await client.aclose()
+
+
+def _host_limit(url: str) -> asyncio.Semaphore:
+    host = urlparse(url).netloc
+    limit = _host_limits.get(host)
+    if limit is None:
+        limit = _host_limits[host] = asyncio.Semaphore(DDG_PER_HOST_LIMIT)
+    return limit
+
+
+# -----------------------
+# Lookups
+# -----------------------
+def _error_info(domain: str, description: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "title": domain,
+        "description": description or f"Could not fetch data for {domain}",
+        "image": "https://dummyimage.com/600x400/ddd/000.png&text=No+Data",
+        "source": "error"
+    }
+
+
+async def fetch_domain_info(domain: str) -> Dict[str, Any]:
+    """
+    Basic domain info from DuckDuckGo's Instant Answer API, through the
+    domain cache (fresh, stale-while-revalidate or negative); never raises.
+    """
+    cache = get_domain_cache()
+    if cache is None:
+        return await _fetch_uncached(domain)
+    return await cache.get_or_fetch(domain.strip().lower(), lambda: _fetch_uncached(domain))
+
+
+async def _fetch_uncached(domain: str) -> Dict[str, Any]:
+    try:
+        async with _host_limit(DUCKDUCKGO_API_URL):
+            resp = await get_http().get(
+                DUCKDUCKGO_API_URL, params={"q": domain, "format": "json", "no_html": "1"}
+            )
+        resp.raise_for_status()
+        data = resp.json()
+
+        return {
+            "title": data.get("Heading") or domain,
+            "description": data.get("Abstract") or "No description available.",
+            "image": data.get("Image") or "https://dummyimage.com/600x400/ccc/000.png&text=No+Image",
+            "source": "DuckDuckGo"
+        }
+    except Exception:
+        return _error_info(domain)
+
+
+async def fetch_domains_info(
+    domains: List[str],
+    concurrency: int = DDG_CONCURRENCY,
+    deadline: float = DDG_DEADLINE
+) -> Dict[str, Any]:
+    """
+    Look up many domains concurrently (at most `concurrency` at a time).
+
+    Returns {"results": {domain: info}, "timed_out": [...], "elapsed_ms"}.
+    Lookups still running at the deadline are cancelled and reported with
+    source "error", so a few slow answers never hold up the rest.
+    """
+    started = time.perf_counter()
+    limit = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(domain: str) -> Dict[str, Any]:
+        async with limit:
+            return await fetch_domain_info(domain)
+
+    unique = list(dict.fromkeys(domains))
+    tasks = {domain: asyncio.ensure_future(run(domain)) for domain in unique}
+    if tasks:
+        await asyncio.wait(tasks.values(), timeout=deadline)
+
+    results: Dict[str, Any] = {}
+    timed_out = []
+    for domain, task in tasks.items():
+        if task.done():
+            results[domain] = task.result()
+        else:
+            task.cancel()
+            timed_out.append(domain)
+            results[domain] = _error_info(domain, f"DuckDuckGo lookup for {domain} exceeded {deadline}s")
+    if timed_out:
+        logger.warning("DuckDuckGo deadline hit for %d of %d domains", len(timed_out), len(unique))
+
+    return {
+        "results": results,
+        "timed_out": timed_out,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
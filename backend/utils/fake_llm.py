@@ -0,0 +1,378 @@
+# backend/utils/fake_llm.py
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Latency per completion: "0", "fixed:<ms>", "uniform:<min_ms>:<max_ms>" or
+# "lognormal:<median_ms>:<sigma>" (long-tailed, like real providers)
+FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "lognormal:300:0.5")
+# Share of completions answered with 429 (with Retry-After) / 500
+FAKE_LLM_RATE_429 = float(os.getenv("FAKE_LLM_RATE_429", "0"))
+FAKE_LLM_RATE_500 = float(os.getenv("FAKE_LLM_RATE_500", "0"))
+FAKE_LLM_RETRY_AFTER = float(os.getenv("FAKE_LLM_RETRY_AFTER", "1"))
+# Same seed + same request = same answer
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+
+SOURCE_DOMAINS = [
+    "en.wikipedia.org", "reddit.com", "nytimes.com", "forbes.com", "techcrunch.com", "youtube.com",
+    "medium.com", "github.com", "stackoverflow.com", "theverge.com", "healthline.com", "investopedia.com",
+    "bbc.co.uk", "g2.com", "trustpilot.com", "quora.com",
+]
+
+_BRAND_RE = re.compile(r"helping with (.+?) (?:content|research)")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Latency sampler (seconds) for a FAKE_LLM_LATENCY spec."""
+    kind, *args = (spec or "0").split(":")
+    values = [float(a) for a in args]
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000.0
+    if kind == "lognormal":
+        median, sigma = values[0] / 1000.0, values[1] if len(values) > 1 else 0.5
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    if kind in ("0", "none", ""):
+        return lambda rng: 0.0
+    raise ValueError(f"Unknown latency spec: {spec!r}")
+
+
+class FakeLLMConfig:
+    """Runtime knobs of the fake; update() changes them without a restart."""
+
+    def __init__(
+        self,
+        latency: str = FAKE_LLM_LATENCY,
+        rate_429: float = FAKE_LLM_RATE_429,
+        rate_500: float = FAKE_LLM_RATE_500,
+        retry_after: float = FAKE_LLM_RETRY_AFTER,
+        seed: int = FAKE_LLM_SEED
+    ):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.rate_500 = rate_500
+        self.retry_after = retry_after
+        self.seed = seed
+        self._sample = parse_latency(latency)
+        self._rng = random.Random(seed)
+        self.requests = 0
+        self.errors_429 = 0
+        self.errors_500 = 0
+
+    def update(self, **changes: Any) -> None:
+        for name in ("latency", "rate_429", "rate_500", "retry_after", "seed"):
+            if name in changes:
+                setattr(self, name, type(getattr(self, name))(changes[name]))
+        self._sample = parse_latency(self.latency)
+        self._rng = random.Random(self.seed)
+
+    def sample_latency(self) -> float:
+        return max(0.0, self._sample(self._rng))
+
+    def roll_fault(self) -> Optional[int]:
+        """429, 500 or None for the next request."""
+        roll = self._rng.random()
+        if roll < self.rate_429:
+            self.errors_429 += 1
+            return 429
+        if roll < self.rate_429 + self.rate_500:
+            self.errors_500 += 1
+            return 500
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency,
+            "rate_429": self.rate_429,
+            "rate_500": self.rate_500,
+            "seed": self.seed,
+            "requests": self.requests,
+            "errors_429": self.errors_429,
+            "errors_500": self.errors_500,
+        }
+
+
+_config: Optional[FakeLLMConfig] = None
+
+
+def get_fake_config() -> FakeLLMConfig:
+    global _config
+    if _config is None:
+        _config = FakeLLMConfig()
+    return _config
+
+
+# -----------------------
+# Deterministic answers
+# -----------------------
+def _rng_for(*parts: Any) -> random.Random:
+    digest = hashlib.sha256(json.dumps([get_fake_config().seed, *parts], sort_keys=True, default=str).encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def _brand(messages: List[Dict[str, Any]]) -> Optional[str]:
+    for message in messages:
+        if message.get("role") == "system":
+            match = _BRAND_RE.search(str(message.get("content") or ""))
+            if match:
+                return match.group(1)
+    return None
+
+
+def _sources(rng: random.Random, brand: Optional[str], topic: str) -> List[str]:
+    slug = "-".join(_WORD_RE.findall(topic.lower())[:5]) or "overview"
+    urls = [f"https://{domain}/{slug}" for domain in rng.sample(SOURCE_DOMAINS, 3)]
+    token = "".join(_WORD_RE.findall((brand or "").lower()))
+    if token and rng.random() < 0.6:
+        urls.insert(rng.randrange(len(urls) + 1), f"https://www.{token}.com/{slug}")
+    return urls
+
+
+def fake_answer(messages: List[Dict[str, Any]], model: str, choice: int = 0) -> str:
+    """A plausible answer with citations, fixed for a given request (and choice index)."""
+    rng = _rng_for(model, messages, choice)
+    prompt = str(messages[-1].get("content") or "") if messages else ""
+    topic = prompt.strip()[:80].rstrip("?. ") or "this topic"
+    brand = _brand(messages)
+    urls = _sources(rng, brand, topic)
+    lines = [f"Here is an overview of {topic}."]
+    if brand and rng.random() < 0.7:
+        lines.append(f"{brand} is one of the names that comes up most often here, with strong coverage in guides and reviews.")
+    for i, url in enumerate(urls):
+        if i % 2:
+            lines.append(f"{i + 1}. See [{url.split('/')[2]}]({url}) for a detailed comparison.")
+        else:
+            lines.append(f"{i + 1}. According to {url}, most readers start with the basics before comparing options.")
+    return "\n".join(lines)
+
+
+def _schema_instance(schema: Dict[str, Any], defs: Dict[str, Any], rng: random.Random, name: str, context: Dict[str, Any]) -> Any:
+    if "$ref" in schema:
+        return _schema_instance(defs.get(schema["$ref"].rsplit("/", 1)[-1], {}), defs, rng, name, context)
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") != "null"] or schema[key]
+            return _schema_instance(options[0], defs, rng, name, context)
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    kind = schema.get("type", "object")
+    lowered = name.lower()
+    if kind == "object":
+        return {
+            key: _schema_instance(sub, defs, rng, key, context)
+            for key, sub in (schema.get("properties") or {}).items()
+        }
+    if kind == "array":
+        if "citation" in lowered or "url" in lowered or "source" in lowered:
+            return list(context["urls"])
+        return [_schema_instance(schema.get("items") or {"type": "string"}, defs, rng, name, context) for _ in range(rng.randint(2, 4))]
+    if kind == "integer":
+        low, high = int(schema.get("minimum", 0)), int(schema.get("maximum", 100))
+        return rng.randint(low, high)
+    if kind == "number":
+        return round(rng.uniform(float(schema.get("minimum", 0)), float(schema.get("maximum", 100))), 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if "summary" in lowered or "analysis" in lowered or "answer" in lowered:
+        return context["text"]
+    if "url" in lowered or "citation" in lowered:
+        return context["urls"][0]
+    return f"{name} {rng.randint(1, 99)}"
+
+
+def fake_structured(messages: List[Dict[str, Any]], model: str, response_format: Dict[str, Any], choice: int = 0) -> str:
+    """JSON for a response_format request: schema-valid for json_schema, an object for json_object."""
+    rng = _rng_for(model, messages, response_format, choice)
+    text = fake_answer(messages, model, choice)
+    context = {"text": text, "urls": re.findall(r"https://[^\s)\]]+", text)}
+    prompt = str(messages[-1].get("content") or "") if messages else ""
+
+    # Packed requests: a JSON list of {"id", "prompt"} items gets one answer per item
+    try:
+        items = json.loads(prompt)
+    except ValueError:
+        items = None
+    if isinstance(items, list) and all(isinstance(i, dict) and "id" in i for i in items):
+        answers = []
+        for item in items:
+            item_messages = messages[:-1] + [{"role": "user", "content": str(item.get("prompt", ""))}]
+            answers.append({"id": item["id"], "answer": fake_answer(item_messages, model, choice)})
+        return json.dumps({"answers": answers})
+
+    schema = (response_format.get("json_schema") or {}).get("schema")
+    if schema is None:
+        return json.dumps({"summary": text, "citations": context["urls"]})
+    return json.dumps(_schema_instance(schema, schema.get("$defs", {}), rng, "", context))
+
+
+def _usage(messages: List[Dict[str, Any]], texts: List[str]) -> Dict[str, int]:
+    prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4 + 4 * len(messages)
+    completion_tokens = sum(len(t) for t in texts) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+# -----------------------
+# OpenAI-compatible ASGI app
+# -----------------------
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def _send_json(send, status: int, payload: Any, headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())] + (headers or []),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _chat_completion(request: Dict[str, Any], send) -> None:
+    config = get_fake_config()
+    config.requests += 1
+    fault = config.roll_fault()
+    if fault == 429:
+        await _send_json(
+            send, 429,
+            {"error": {"message": "Rate limit reached (fake)", "type": "rate_limit_exceeded", "code": "rate_limit_exceeded"}},
+            [(b"retry-after", str(config.retry_after).encode())],
+        )
+        return
+    if fault == 500:
+        await _send_json(send, 500, {"error": {"message": "Internal server error (fake)", "type": "server_error"}})
+        return
+
+    model = request.get("model", "fake")
+    messages = request.get("messages") or []
+    response_format = request.get("response_format")
+    n = max(1, int(request.get("n") or 1))
+    texts = [
+        fake_structured(messages, model, response_format, i) if response_format else fake_answer(messages, model, i)
+        for i in range(n)
+    ]
+    await asyncio.sleep(config.sample_latency())
+    created = int(time.time())
+    completion_id = "chatcmpl-fake-" + hashlib.sha1(texts[0].encode("utf-8")).hexdigest()[:12]
+
+    if not request.get("stream"):
+        await _send_json(send, 200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [
+                {"index": i, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+                for i, text in enumerate(texts)
+            ],
+            "usage": _usage(messages, texts),
+        })
+        return
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")],
+    })
+    words = texts[0].split(" ")
+    for start in range(0, len(words), 4):
+        delta = " ".join(words[start:start + 4]) + (" " if start + 4 < len(words) else "")
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+        }
+        await send({"type": "http.response.body", "body": f"data: {json.dumps(chunk)}\n\n".encode("utf-8"), "more_body": True})
+    if (request.get("stream_options") or {}).get("include_usage"):
+        # Like OpenAI: one last chunk with no choices, carrying the usage
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [],
+            "usage": _usage(messages, texts),
+        }
+        await send({"type": "http.response.body", "body": f"data: {json.dumps(chunk)}\n\n".encode("utf-8"), "more_body": True})
+    await send({"type": "http.response.body", "body": b"data: [DONE]\n\n"})
+
+
+async def app(scope, receive, send) -> None:
+    """
+    Minimal OpenAI-compatible server (plain ASGI, no framework overhead).
+
+    POST /v1/chat/completions (n, stream and response_format supported),
+    GET /v1/models, and GET/POST /fake/config to read or change latency,
+    error rates and seed while it runs.
+    """
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"].rstrip("/")
+    method = scope["method"]
+    body = await _read_body(receive)
+    if method == "POST" and path.endswith("/chat/completions"):
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            await _send_json(send, 400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+            return
+        await _chat_completion(request, send)
+    elif method == "GET" and path.endswith("/models"):
+        await _send_json(send, 200, {"object": "list", "data": [{"id": "fake", "object": "model", "owned_by": "fake"}]})
+    elif path == "/fake/config":
+        if method == "POST":
+            try:
+                get_fake_config().update(**json.loads(body or b"{}"))
+            except (ValueError, TypeError) as e:
+                await _send_json(send, 400, {"error": {"message": str(e), "type": "invalid_request_error"}})
+                return
+        await _send_json(send, 200, get_fake_config().stats())
+    else:
+        await _send_json(send, 404, {"error": {"message": f"Unknown route {method} {path}", "type": "invalid_request_error"}})
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the fake as a localhost server: python -m utils.fake_llm --port 8765"""
+    parser = argparse.ArgumentParser(description="OpenAI-compatible fake LLM server for offline load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default=FAKE_LLM_LATENCY)
+    parser.add_argument("--rate-429", type=float, default=FAKE_LLM_RATE_429)
+    parser.add_argument("--rate-500", type=float, default=FAKE_LLM_RATE_500)
+    parser.add_argument("--seed", type=int, default=FAKE_LLM_SEED)
+    args = parser.parse_args(argv)
+    get_fake_config().update(latency=args.latency, rate_429=args.rate_429, rate_500=args.rate_500, seed=args.seed)
+
+    import uvicorn
+    print(f"Fake LLM on http://{args.host}:{args.port}/v1 (LLM_PROVIDER=openai_compatible, LLM_BASE_URL=...)", file=sys.stderr)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+# backend/utils/jobs.py
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import multiprocessing
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+
+HERE = Path(__file__).resolve().parent.parent  # backend/
+
+JOBS_DB_PATH = Path(os.getenv("JOBS_DB_PATH") or HERE / ".cache" / "jobs.sqlite3")
+JOBS_MODE = os.getenv("JOBS_MODE", "inprocess")  # inprocess | process
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_BATCH_SIZE = int(os.getenv("JOBS_BATCH_SIZE", "10"))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1.0"))
+# Items claimed longer ago than this are assumed lost (crashed worker) and re-queued
+JOBS_STALE_AFTER = float(os.getenv("JOBS_STALE_AFTER", "600"))
+
+logger = logging.getLogger("jobs")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    brand TEXT NOT NULL,
+    model TEXT NOT NULL,
+    concurrency INTEGER,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    tokens_used INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    prompt TEXT NOT NULL,
+    meta TEXT,
+    status TEXT NOT NULL,
+    claimed_at REAL,
+    result TEXT,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS idx_job_items_status ON job_items(status, job_id, idx);
+"""
+
+class JobStore:
+    """
+    SQLite-backed job queue. Every method opens its own short-lived
+    connection so the store can be used from threads and worker processes
+    alike; WAL mode keeps readers (progress polling) off the writers' backs.
+    """
+
+    def __init__(self, path: Path = JOBS_DB_PATH):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.path), timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def create_job(
+        self,
+        brand: str,
+        prompts: Iterable[Any],
+        model: str = "gpt-4o-mini",
+        concurrency: Optional[int] = None,
+        chunk_size: int = 1000
+    ) -> Dict[str, Any]:
+        """
+        Queue a job. `prompts` may be plain strings or dicts with a "prompt"
+        key (any other keys are kept as item metadata). It is consumed lazily
+        and written in chunks, so large generated suites never sit in memory.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        total = 0
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                "INSERT INTO jobs (id, brand, model, concurrency, status, created_at) VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, brand, model, concurrency, now),
+            )
+            chunk = []
+            for item in prompts:
+                if isinstance(item, dict):
+                    prompt = item["prompt"]
+                    meta = json.dumps({k: v for k, v in item.items() if k != "prompt"})
+                else:
+                    prompt, meta = item, None
+                chunk.append((job_id, total, prompt, meta))
+                total += 1
+                if len(chunk) >= chunk_size:
+                    conn.executemany(
+                        "INSERT INTO job_items (job_id, idx, prompt, meta, status) VALUES (?, ?, ?, ?, 'queued')", chunk
+                    )
+                    chunk = []
+            if chunk:
+                conn.executemany(
+                    "INSERT INTO job_items (job_id, idx, prompt, meta, status) VALUES (?, ?, ?, ?, 'queued')", chunk
+                )
+            conn.execute("UPDATE jobs SET total = ? WHERE id = ?", (total, job_id))
+            if total == 0:
+                conn.execute("UPDATE jobs SET status = 'done', finished_at = ? WHERE id = ?", (now, job_id))
+            conn.execute("COMMIT")
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_dict(row) if row else None
+
+    def list_jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [_job_dict(r) for r in rows]
+
+    def get_results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT idx, prompt, meta, status, result FROM job_items WHERE job_id = ? AND idx >= ? ORDER BY idx LIMIT ?",
+                (job_id, offset, limit),
+            ).fetchall()
+        results = []
+        for r in rows:
+            item = {"index": r["idx"], "prompt": r["prompt"], "status": r["status"]}
+            if r["meta"]:
+                item.update(json.loads(r["meta"]))
+            if r["result"]:
+                item["result"] = json.loads(r["result"])
+            results.append(item)
+        return results
+
+    def cancel(self, job_id: str) -> bool:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (now, job_id),
+            )
+            conn.execute("UPDATE job_items SET status = 'cancelled' WHERE job_id = ? AND status = 'queued'", (job_id,))
+            conn.execute("COMMIT")
+        return cur.rowcount > 0
+
+    def claim_batch(self, batch_size: int) -> Optional[Tuple[Dict[str, Any], List[Tuple[int, str, Dict[str, Any]]]]]:
+        """
+        Atomically claim up to batch_size queued items from the oldest active
+        job. BEGIN IMMEDIATE serializes claimers across processes.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                job = conn.execute(
+                    """SELECT j.* FROM jobs j
+                       WHERE j.status IN ('queued', 'running')
+                         AND EXISTS (SELECT 1 FROM job_items i WHERE i.job_id = j.id AND i.status = 'queued')
+                       ORDER BY j.created_at LIMIT 1"""
+                ).fetchone()
+                if job is None:
+                    conn.execute("COMMIT")
+                    return None
+                items = conn.execute(
+                    "SELECT idx, prompt, meta FROM job_items WHERE job_id = ? AND status = 'queued' ORDER BY idx LIMIT ?",
+                    (job["id"], batch_size),
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE job_items SET status = 'running', claimed_at = ? WHERE job_id = ? AND idx = ?",
+                    [(now, job["id"], r["idx"]) for r in items],
+                )
+                if job["status"] == "queued":
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (now, job["id"])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return _job_dict(job), [(r["idx"], r["prompt"], json.loads(r["meta"]) if r["meta"] else {}) for r in items]
+
+    def complete_items(self, job_id: str, results: List[Tuple[int, Dict[str, Any]]]) -> None:
+        now = time.time()
+        failed = sum(1 for _, r in results if r.get("error"))
+        tokens = sum(r.get("tokens_used") or 0 for _, r in results)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE job_items SET status = ?, result = ? WHERE job_id = ? AND idx = ? AND status = 'running'",
+                [("failed" if r.get("error") else "done", json.dumps(r), job_id, idx) for idx, r in results],
+            )
+            conn.execute(
+                """UPDATE jobs SET completed = completed + ?, failed = failed + ?, tokens_used = tokens_used + ?
+                   WHERE id = ?""",
+                (len(results) - failed, failed, tokens, job_id),
+            )
+            conn.execute(
+                """UPDATE jobs SET status = 'done', finished_at = ?
+                   WHERE id = ? AND status = 'running' AND completed + failed >= total""",
+                (now, job_id),
+            )
+            conn.execute("COMMIT")
+
+    def requeue_items(self, job_id: str, indexes: List[int]) -> None:
+        """Hand claimed items back to the queue (their batch failed or was cut short)."""
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE job_items SET status = 'queued', claimed_at = NULL WHERE job_id = ? AND idx = ? AND status = 'running'",
+                [(job_id, idx) for idx in indexes],
+            )
+
+    def requeue_stale(self, older_than: float = JOBS_STALE_AFTER) -> int:
+        """Put items claimed by a worker that never reported back into the queue again."""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE job_items SET status = 'queued', claimed_at = NULL WHERE status = 'running' AND claimed_at < ?",
+                (time.time() - older_than,),
+            )
+        return cur.rowcount
+
+
+def _job_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    done = job["completed"] + job["failed"]
+    job["progress"] = round(done / job["total"], 4) if job["total"] else 1.0
+    return job
+
+
+# -----------------------
+# Workers
+# -----------------------
+async def _worker_loop(store: JobStore, should_stop, batch_size: int, poll_interval: float) -> None:
+    from .circuit_breaker import get_breaker
+
+    while not should_stop():
+        if get_breaker().is_open():
+            # Provider incident: leave items queued rather than completing them with mock answers
+            await asyncio.sleep(poll_interval)
+            continue
+        try:
+            claimed = await asyncio.to_thread(store.claim_batch, batch_size)
+        except sqlite3.OperationalError as e:
+            logger.warning("Job claim failed: %s", e)
+            claimed = None
+        if claimed is None:
+            await asyncio.sleep(poll_interval)
+            continue
+
+        job, items = claimed
+        try:
+            await _run_batch(store, job, items)
+        except Exception as e:
+            # A bad batch (or a locked database) must not take the worker down with it
+            logger.exception("Job %s batch failed: %s", job["id"], e)
+            try:
+                await asyncio.to_thread(store.requeue_items, job["id"], [idx for idx, _, _ in items])
+            except sqlite3.OperationalError as requeue_error:
+                # requeue_stale() picks them up on the next start
+                logger.warning("Could not re-queue job %s items: %s", job["id"], requeue_error)
+            await asyncio.sleep(poll_interval)
+
+
+async def _run_batch(store: JobStore, job: Dict[str, Any], items: List[Tuple[int, str, Dict[str, Any]]]) -> None:
+    # Imported here so worker processes build their own pooled client
+    from .ai_client import generate_responses, OPENAI_AVAILABLE
+
+    # Suite jobs mix brands; each prompt runs with its own brand context
+    by_brand: Dict[str, List[Tuple[int, str, Optional[str]]]] = {}
+    for idx, prompt, meta in items:
+        by_brand.setdefault(meta.get("brand") or job["brand"], []).append((idx, prompt, meta.get("prompt_type")))
+
+    done: List[Tuple[int, Dict[str, Any]]] = []
+    for brand, group in by_brand.items():
+        results = await generate_responses(
+            [prompt for _, prompt, _ in group],
+            brand,
+            model=job["model"],
+            concurrency=job["concurrency"],
+            prompt_types=[prompt_type for _, _, prompt_type in group]
+        )
+        done.extend((idx, r) for (idx, _, _), r in zip(group, results))
+
+    # The circuit opened mid-batch: mock answers go back in the queue rather than becoming results
+    retry = [idx for idx, r in done if r.get("is_mock")] if OPENAI_AVAILABLE else []
+    if retry:
+        done = [(idx, r) for idx, r in done if not r.get("is_mock")]
+        await asyncio.to_thread(store.requeue_items, job["id"], retry)
+    if done:
+        await asyncio.to_thread(store.complete_items, job["id"], done)
+
+
+def _process_worker_main(db_path: str, stop_event, batch_size: int, poll_interval: float) -> None:
+    """Entry point for JOBS_MODE=process workers."""
+    from .citation_store import start_citation_store, stop_citation_store
+
+    async def main() -> None:
+        # Answers are written to the citation history from this process
+        await start_citation_store()
+        try:
+            await _worker_loop(JobStore(Path(db_path)), stop_event.is_set, batch_size, poll_interval)
+        finally:
+            await stop_citation_store()
+
+    asyncio.run(main())
+
+
+class JobRunner:
+    """Runs job workers as asyncio tasks in this process or as separate processes."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int = JOBS_WORKERS,
+        mode: str = JOBS_MODE,
+        batch_size: int = JOBS_BATCH_SIZE,
+        poll_interval: float = JOBS_POLL_INTERVAL
+    ):
+        self.store = store
+        self.workers = max(0, workers)
+        self.mode = mode
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._processes: List[multiprocessing.Process] = []
+        self._stopping = False
+        self._stop_event = None
+
+    def start(self) -> None:
+        requeued = self.store.requeue_stale()
+        if requeued:
+            logger.info("Re-queued %d stale job item(s)", requeued)
+
+        if self.mode == "process":
+            # spawn, not fork: a forked child would inherit this process's
+            # event-loop-bound client, semaphores and locks
+            ctx = multiprocessing.get_context("spawn")
+            self._stop_event = ctx.Event()
+            for _ in range(self.workers):
+                proc = ctx.Process(
+                    target=_process_worker_main,
+                    args=(str(self.store.path), self._stop_event, self.batch_size, self.poll_interval),
+                    daemon=True,
+                )
+                proc.start()
+                self._processes.append(proc)
+        else:
+            for _ in range(self.workers):
+                self._tasks.append(asyncio.create_task(
+                    _worker_loop(self.store, lambda: self._stopping, self.batch_size, self.poll_interval)
+                ))
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        self._stopping = True
+        if self._stop_event is not None:
+            self._stop_event.set()
+            for proc in self._processes:
+                await asyncio.to_thread(proc.join, timeout)
+                if proc.is_alive():
+                    proc.terminate()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+        self._tasks.clear()
+        self._processes.clear()
+
+
+_store: Optional[JobStore] = None
+_runner: Optional[JobRunner] = None
+
+
+def get_store() -> JobStore:
+    global _store
+    if _store is None:
+        _store = JobStore()
+    return _store
+
+
+async def start_workers() -> None:
+    global _runner
+    if _runner is None:
+        _runner = JobRunner(get_store())
+        _runner.start()
+
+
+async def stop_workers() -> None:
+    global _runner
+    if _runner is not None:
+        await _runner.stop()
+        _runner = None
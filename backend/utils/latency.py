@@ -0,0 +1,124 @@
+# backend/utils/latency.py
+import os
+import math
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# Upstream latencies kept per (model, endpoint) for the percentiles below
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+# Samples needed before timeouts/hedging adapt (fixed timeouts until then)
+LLM_LATENCY_MIN_SAMPLES = int(os.getenv("LLM_LATENCY_MIN_SAMPLES", "20"))
+
+# Adaptive timeouts: percentile x multiplier, clamped to [min, the caller's timeout]
+LLM_ADAPTIVE_TIMEOUT = os.getenv("LLM_ADAPTIVE_TIMEOUT", "true").lower() in ("1", "true", "yes")
+LLM_TIMEOUT_PERCENTILE = float(os.getenv("LLM_TIMEOUT_PERCENTILE", "99"))
+LLM_TIMEOUT_MULTIPLIER = float(os.getenv("LLM_TIMEOUT_MULTIPLIER", "3"))
+LLM_TIMEOUT_MIN = float(os.getenv("LLM_TIMEOUT_MIN", "5"))
+
+# Hedging: a duplicate request (optionally to LLM_HEDGE_MODEL) once the first
+# has run past this percentile; at most LLM_HEDGE_BUDGET of calls are hedged
+LLM_HEDGE = os.getenv("LLM_HEDGE", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MODEL = os.getenv("LLM_HEDGE_MODEL") or None
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+
+
+class LatencyWindow:
+    """The last `size` latencies of one (model, endpoint), with cached percentiles."""
+
+    def __init__(self, size: int = LLM_LATENCY_WINDOW):
+        self.samples: Deque[float] = deque(maxlen=max(1, size))
+        self.total = 0
+        self._sorted: Optional[List[float]] = None
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.total += 1
+        self._sorted = None
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Nearest-rank percentile of the window (None when empty)."""
+        if not self.samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self.samples)
+        rank = max(1, math.ceil(p / 100 * len(self._sorted)))
+        return self._sorted[rank - 1]
+
+
+class LatencyTracker:
+    """
+    Upstream call latencies per model and endpoint (the ai_client call
+    site: batch, single, packed, structured, ...).
+
+    Only calls that reached the provider are recorded; cache hits would
+    drag the percentiles toward zero. Calls cancelled by a timeout or a
+    winning hedge are recorded with the time they had run, a lower bound
+    that keeps slow tails from vanishing from the window.
+    """
+
+    def __init__(self, window: int = LLM_LATENCY_WINDOW, min_samples: int = LLM_LATENCY_MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._windows: Dict[Tuple[str, str], LatencyWindow] = {}
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def record(self, model: str, endpoint: str, seconds: float) -> None:
+        key = (model, endpoint)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = LatencyWindow(self.window)
+        window.add(seconds)
+
+    def percentile(self, model: str, endpoint: str, p: float) -> Optional[float]:
+        """Observed percentile, or None until min_samples calls have been seen."""
+        window = self._windows.get((model, endpoint))
+        if window is None or len(window.samples) < self.min_samples:
+            return None
+        return window.percentile(p)
+
+    def timeout(self, model: str, endpoint: str, cap: float) -> float:
+        """Timeout for the next call: LLM_TIMEOUT_PERCENTILE x multiplier, never above `cap`."""
+        if not LLM_ADAPTIVE_TIMEOUT:
+            return cap
+        observed = self.percentile(model, endpoint, LLM_TIMEOUT_PERCENTILE)
+        if observed is None:
+            return cap
+        return min(cap, round(max(LLM_TIMEOUT_MIN, observed * LLM_TIMEOUT_MULTIPLIER), 2))
+
+    def hedge_delay(self, model: str, endpoint: str) -> Optional[float]:
+        """Seconds to wait before hedging this call, or None to not hedge it."""
+        self.calls += 1
+        if not LLM_HEDGE or self.hedged >= LLM_HEDGE_BUDGET * self.calls:
+            return None
+        return self.percentile(model, endpoint, LLM_HEDGE_PERCENTILE)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "adaptive_timeout": LLM_ADAPTIVE_TIMEOUT,
+            "hedging": LLM_HEDGE,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "endpoints": {
+                f"{model}/{endpoint}": {
+                    "samples": window.total,
+                    "p50_ms": round(window.percentile(50) * 1000, 1),
+                    "p95_ms": round(window.percentile(95) * 1000, 1),
+                    "p99_ms": round(window.percentile(99) * 1000, 1),
+                }
+                for (model, endpoint), window in self._windows.items()
+            },
+        }
+
+
+_tracker: Optional[LatencyTracker] = None
+
+
+def get_latency_tracker() -> LatencyTracker:
+    global _tracker
+    if _tracker is None:
+        _tracker = LatencyTracker()
+    return _tracker
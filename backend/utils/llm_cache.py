@@ -0,0 +1,276 @@
+# backend/utils/llm_cache.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+HERE = Path(__file__).resolve().parent.parent  # backend/
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_MEMORY_BYTES = int(os.getenv("LLM_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+LLM_CACHE_DISK_BYTES = int(os.getenv("LLM_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH") or HERE / ".cache" / "llm_cache.sqlite3")
+# Expired answers are kept this much longer, served only while the provider is down
+LLM_CACHE_STALE_TTL = float(os.getenv("LLM_CACHE_STALE_TTL", "86400"))
+
+# Per-endpoint TTL overrides, e.g. "trending-topics=21600,brand-gap=3600"
+LLM_CACHE_TTLS = os.getenv("LLM_CACHE_TTLS", "")
+
+logger = logging.getLogger("llm_cache")
+
+
+def _parse_ttls(spec: str) -> Dict[str, float]:
+    ttls = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            try:
+                ttls[name.strip()] = float(value)
+            except ValueError:
+                logger.warning("Ignoring bad LLM_CACHE_TTLS entry: %s", item)
+    return ttls
+
+
+ENDPOINT_TTLS = {
+    "prompts": 6 * 3600,
+    "brand-gap": 3600,
+    "brand-missing": 3600,
+    "analyze-brand-presence": 3600,
+    "trending-topics": 6 * 3600,
+    "domain-comparison": 3600,
+    **_parse_ttls(LLM_CACHE_TTLS),
+}
+
+
+def ttl_for(endpoint: str) -> float:
+    """TTL in seconds for responses produced on behalf of `endpoint`."""
+    return ENDPOINT_TTLS.get(endpoint, LLM_CACHE_TTL)
+
+
+def make_key(
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+    **extra
+) -> str:
+    """Stable cache key for one completion request."""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        **extra,
+    }
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _MemoryTier:
+    """LRU over serialized values, bounded by total bytes."""
+
+    def __init__(self, max_bytes: int, stale_for: float = LLM_CACHE_STALE_TTL):
+        self.max_bytes = max_bytes
+        self.stale_for = stale_for
+        self.size = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str, now: float, stale: bool = False) -> Optional[Tuple[float, str]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] + self.stale_for <= now:
+            self.pop(key)
+            return None
+        if entry[0] <= now and not stale:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, expires_at: float, raw: str) -> None:
+        self.pop(key)
+        if len(raw) > self.max_bytes:
+            return
+        self._entries[key] = (expires_at, raw)
+        self.size += len(raw)
+        while self.size > self.max_bytes and self._entries:
+            _, (_, old) = self._entries.popitem(last=False)
+            self.size -= len(old)
+
+    def pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _DiskTier:
+    """
+    SQLite-backed tier. WAL mode lets every uvicorn worker on the host read
+    and write the same file; eviction drops least recently used rows once
+    the stored bytes exceed max_bytes.
+    """
+
+    def __init__(self, path: Path, max_bytes: int, stale_for: float = LLM_CACHE_STALE_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stale_for = stale_for
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+
+    def get(self, key: str, now: float, stale: bool = False) -> Optional[Tuple[float, str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at, value FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] + self.stale_for <= now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            if row[0] <= now and not stale:
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            return row[0], row[1]
+
+    def put(self, key: str, expires_at: float, raw: str, now: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, raw, len(raw), expires_at, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now - self.stale_for,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk oldest-first and drop rows until we are back under the cap
+        excess = total - self.max_bytes
+        doomed = []
+        cursor = self._conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access")
+        for key, size in cursor:
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        cursor.close()
+        self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LLMCache:
+    """Two-tier (memory LRU + SQLite) cache for completion results."""
+
+    def __init__(
+        self,
+        memory_bytes: int = LLM_CACHE_MEMORY_BYTES,
+        disk_path: Optional[Path] = LLM_CACHE_PATH,
+        disk_bytes: int = LLM_CACHE_DISK_BYTES
+    ):
+        self.memory = _MemoryTier(memory_bytes)
+        self.disk: Optional[_DiskTier] = None
+        if disk_path is not None:
+            try:
+                self.disk = _DiskTier(disk_path, disk_bytes)
+            except Exception as e:
+                logger.warning("LLM disk cache unavailable (%s); using memory only", e)
+        self.hits = 0
+        self.disk_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str, stale: bool = False) -> Optional[Dict[str, Any]]:
+        """Cached value, or None; stale=True also returns expired values still retained."""
+        now = time.time()
+        entry = self.memory.get(key, now, stale)
+        if entry is None and self.disk is not None:
+            try:
+                entry = await asyncio.to_thread(self.disk.get, key, now, stale)
+            except Exception as e:
+                logger.warning("LLM disk cache read failed: %s", e)
+                entry = None
+            if entry is not None:
+                self.disk_hits += 1
+                self.memory.put(key, entry[0], entry[1])
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] <= now:
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        return json.loads(entry[1])
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        if ttl <= 0:
+            return
+        now = time.time()
+        raw = json.dumps(value, ensure_ascii=False)
+        self.memory.put(key, now + ttl, raw)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.put, key, now + ttl, raw, now)
+            except Exception as e:
+                logger.warning("LLM disk cache write failed: %s", e)
+
+    def clear(self) -> None:
+        self.memory = _MemoryTier(self.memory.max_bytes, self.memory.stale_for)
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.size,
+            "disk_path": str(self.disk.path) if self.disk else None,
+        }
+
+
+_cache: Optional[LLMCache] = None
+
+
+def get_cache() -> Optional[LLMCache]:
+    """Process-wide cache instance, or None when LLM_CACHE_ENABLED is off."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = LLMCache()
+    return _cache
@@ -0,0 +1,134 @@
+# backend/utils/llm_provider.py
+import os
+import sys
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+
+HERE = Path(__file__).resolve().parent.parent  # backend/
+load_dotenv(dotenv_path=HERE / ".env")
+
+# openai (api.openai.com), openai_compatible (LLM_BASE_URL: vLLM, Ollama,
+# LM Studio, python -m utils.fake_llm, ...) or fake (in-process, no network)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai").lower()
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://localhost:8000/v1")
+# Local servers usually ignore the key; the SDK still wants a non-empty one
+LLM_API_KEY = os.getenv("LLM_API_KEY") or os.getenv("OPENAI_API_KEY")
+
+OPENAI_KEY = os.getenv("OPENAI_API_KEY")
+
+try:
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    SDK_AVAILABLE = True
+except ImportError:
+    SDK_AVAILABLE = False
+
+
+class LLMProvider(ABC):
+    """
+    Where ai_client's upstream calls go.
+
+    Every provider hands back an AsyncOpenAI client, so retries, rate
+    limiting, hedging, caching and the circuit breaker work the same
+    against all of them. `available` False means ai_client serves mock
+    answers instead.
+    """
+
+    name = "base"
+
+    @property
+    def available(self) -> bool:
+        return False
+
+    @abstractmethod
+    def client(self, **http_options: Any) -> "AsyncOpenAI":
+        """A new AsyncOpenAI client; http_options go to the httpx client."""
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name, "available": self.available}
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    @property
+    def available(self) -> bool:
+        return SDK_AVAILABLE and bool(OPENAI_KEY)
+
+    def client(self, **http_options: Any) -> "AsyncOpenAI":
+        # Retries (429s included) are handled in complete() so they go through the rate limiter
+        return AsyncOpenAI(api_key=OPENAI_KEY, http_client=DefaultAsyncHttpxClient(**http_options), max_retries=0)
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    name = "openai_compatible"
+
+    def __init__(self, base_url: str = LLM_BASE_URL, api_key: Optional[str] = LLM_API_KEY):
+        self.base_url = base_url
+        self.api_key = api_key or "not-needed"
+
+    @property
+    def available(self) -> bool:
+        return SDK_AVAILABLE and bool(self.base_url)
+
+    def client(self, **http_options: Any) -> "AsyncOpenAI":
+        return AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            http_client=DefaultAsyncHttpxClient(**http_options),
+            max_retries=0,
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), "base_url": self.base_url}
+
+
+class FakeProvider(LLMProvider):
+    """
+    utils.fake_llm served in-process through httpx's ASGI transport: the
+    real SDK, request and response parsing paths, with no sockets. Latency,
+    429/500 rates and the seed come from the FAKE_LLM_* settings.
+
+    The ASGI transport buffers the whole response before returning it, so
+    streamed answers arrive in one piece here. Load-test streaming against
+    `python -m utils.fake_llm` (LLM_PROVIDER=openai_compatible) instead.
+    """
+
+    name = "fake"
+
+    @property
+    def available(self) -> bool:
+        return SDK_AVAILABLE
+
+    def client(self, **http_options: Any) -> "AsyncOpenAI":
+        from .fake_llm import app
+
+        # The transport must come from the httpx build the SDK's client is based on
+        base = next(c for c in DefaultAsyncHttpxClient.__mro__ if c.__name__ == "AsyncClient")
+        httpx = sys.modules[base.__module__.split(".")[0]]
+        # Pool limits and HTTP/2 mean nothing without a network
+        http_client = DefaultAsyncHttpxClient(transport=httpx.ASGITransport(app=app))
+        return AsyncOpenAI(api_key="fake", base_url="http://fake-llm/v1", http_client=http_client, max_retries=0)
+
+    def describe(self) -> Dict[str, Any]:
+        from .fake_llm import get_fake_config
+        return {**super().describe(), **get_fake_config().stats()}
+
+
+PROVIDERS = {
+    OpenAIProvider.name: OpenAIProvider,
+    OpenAICompatibleProvider.name: OpenAICompatibleProvider,
+    FakeProvider.name: FakeProvider,
+}
+
+_provider: Optional[LLMProvider] = None
+
+
+def get_provider() -> LLMProvider:
+    global _provider
+    if _provider is None:
+        if LLM_PROVIDER not in PROVIDERS:
+            raise ValueError(f"Unknown LLM_PROVIDER {LLM_PROVIDER!r} (expected one of {', '.join(PROVIDERS)})")
+        _provider = PROVIDERS[LLM_PROVIDER]()
+    return _provider
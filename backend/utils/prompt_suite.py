@@ -0,0 +1,119 @@
+# backend/utils/prompt_suite.py
+import hashlib
+from string import Formatter
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Sequence, Tuple
+
+# Predefined prompt templates
+PROMPT_TEMPLATES = {
+    "how-to": "How to use {brand} for {topic}?",
+    "comparison": "Compare {brand} vs competitors for {topic}",
+    "definition": "What is {brand} and how does it work in {topic}?",
+    "use-case": "What are the best use cases for {brand} in {topic}?",
+    "benefits": "What are the key benefits of {brand} for {topic}?",
+    "problem-solution": "How does {brand} solve common problems in {topic}?",
+    "reviews": "What do users say about {brand} for {topic}?",
+    "pricing": "What is the pricing structure for {brand} in {topic}?",
+    "alternatives": "What are the best alternatives to {brand} for {topic}?",
+    "tutorial": "Step-by-step guide to getting started with {brand} in {topic}?",
+    "head-to-head": "How does {brand} compare to {competitor} for {topic}?"
+}
+
+DEFAULT_TOPIC = "general use"
+
+
+class CompiledTemplate:
+    """A template parsed once into literal/field parts."""
+
+    def __init__(self, prompt_type: str, template: str):
+        self.prompt_type = prompt_type
+        self.template = template
+        self.parts: List[Tuple[str, Optional[str]]] = [
+            (literal, field) for literal, field, _, _ in Formatter().parse(template)
+        ]
+        self.fields = {field for _, field in self.parts if field}
+        self.needs_competitor = "competitor" in self.fields
+
+    def render(self, values: Dict[str, str]) -> str:
+        out = []
+        for literal, field in self.parts:
+            out.append(literal)
+            if field:
+                out.append(values[field])
+        return "".join(out)
+
+
+_compiled: Dict[Tuple[str, str], CompiledTemplate] = {}
+
+
+def compile_template(prompt_type: str, template: str) -> CompiledTemplate:
+    key = (prompt_type, template)
+    compiled = _compiled.get(key)
+    if compiled is None:
+        compiled = _compiled[key] = CompiledTemplate(prompt_type, template)
+    return compiled
+
+
+def _digest(prompt: str) -> bytes:
+    normalized = " ".join(prompt.split()).casefold()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+
+
+class PromptSuite:
+    """
+    Lazy cartesian expansion of brands x topics x prompt types (x competitors
+    for templates that mention {competitor}).
+
+    Iterating yields one dict per unique rendered prompt:
+    {"id", "prompt", "brand", "topic", "prompt_type", "competitor"}.
+    Duplicates (after whitespace/case normalization) are dropped before
+    anything is sent upstream; only 8-byte digests are kept for that.
+    """
+
+    def __init__(
+        self,
+        brands: Sequence[str],
+        topics: Optional[Sequence[str]] = None,
+        competitors: Optional[Sequence[str]] = None,
+        prompt_types: Optional[Sequence[str]] = None,
+        templates: Optional[Dict[str, str]] = None
+    ):
+        templates = templates or PROMPT_TEMPLATES
+        prompt_types = list(prompt_types) if prompt_types else list(templates.keys())
+        unknown = [pt for pt in prompt_types if pt not in templates]
+        if unknown:
+            raise ValueError(f"Invalid prompt types: {unknown}. Valid types: {list(templates.keys())}")
+
+        self.brands = [b for b in brands if b]
+        self.topics = list(topics) if topics else [DEFAULT_TOPIC]
+        self.competitors = [c for c in (competitors or []) if c]
+        self.templates = [compile_template(pt, templates[pt]) for pt in prompt_types]
+
+    def max_size(self) -> int:
+        """Upper bound on the number of prompts (before dedupe)."""
+        per_brand_topic = sum(
+            len(self.competitors) if t.needs_competitor else 1 for t in self.templates
+        )
+        return len(self.brands) * len(self.topics) * per_brand_topic
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        seen = set()
+        for brand in self.brands:
+            for topic in self.topics:
+                for template in self.templates:
+                    rivals: Iterable[Optional[str]] = self.competitors if template.needs_competitor else (None,)
+                    for competitor in rivals:
+                        if competitor is not None and competitor.casefold() == brand.casefold():
+                            continue
+                        prompt = template.render({"brand": brand, "topic": topic, "competitor": competitor or ""})
+                        digest = _digest(prompt)
+                        if digest in seen:
+                            continue
+                        seen.add(digest)
+                        yield {
+                            "id": digest.hex(),
+                            "prompt": prompt,
+                            "brand": brand,
+                            "topic": topic,
+                            "prompt_type": template.prompt_type,
+                            "competitor": competitor,
+                        }
@@ -0,0 +1,153 @@
+# backend/utils/public_suffix.py
+import os
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+# Full list from https://publicsuffix.org/list/public_suffix_list.dat, if provided;
+# otherwise the built-in subset below (generic TLDs and common country second levels)
+PUBLIC_SUFFIX_LIST = os.getenv("PUBLIC_SUFFIX_LIST")
+
+logger = logging.getLogger("public_suffix")
+
+BUILTIN_RULES = """
+com org net edu gov mil int info biz name pro mobi asia tel travel jobs museum aero coop
+io co ai app dev me tv cc ly fm gg to xyz tech site online store shop blog news cloud page
+us ca mx br ar cl pe uk ie de fr es it pt nl be lu ch at dk se no fi is pl cz sk hu ro bg gr
+ru ua tr il ae sa in pk bd lk cn hk tw jp kr sg my th vn ph id au nz za ng ke eg eu
+co.uk org.uk ac.uk gov.uk ltd.uk plc.uk me.uk net.uk nhs.uk sch.uk
+com.au net.au org.au edu.au gov.au asn.au id.au
+co.nz net.nz org.nz ac.nz govt.nz
+co.jp ne.jp or.jp ac.jp go.jp ad.jp ed.jp gr.jp lg.jp
+co.kr or.kr ne.kr ac.kr go.kr re.kr
+com.cn net.cn org.cn gov.cn edu.cn ac.cn
+com.hk org.hk net.hk edu.hk gov.hk
+com.tw org.tw net.tw edu.tw gov.tw idv.tw
+com.sg org.sg net.sg edu.sg gov.sg
+com.my org.my net.my edu.my gov.my
+co.in net.in org.in firm.in gen.in ind.in ac.in edu.in gov.in res.in
+co.id or.id ac.id go.id web.id
+co.th or.th ac.th go.th in.th
+com.vn net.vn org.vn edu.vn gov.vn
+com.ph net.ph org.ph edu.ph gov.ph
+com.pk net.pk org.pk edu.pk gov.pk
+co.il org.il ac.il gov.il net.il
+com.tr org.tr net.tr edu.tr gov.tr
+com.sa org.sa net.sa edu.sa gov.sa
+co.ae net.ae org.ae ac.ae gov.ae
+co.za org.za net.za ac.za gov.za web.za
+com.ng org.ng edu.ng gov.ng
+co.ke or.ke ac.ke go.ke
+com.eg org.eg edu.eg gov.eg
+com.br net.br org.br edu.br gov.br
+com.mx org.mx net.mx edu.mx gob.mx
+com.ar org.ar net.ar edu.ar gob.ar
+com.es org.es edu.es gob.es
+com.pl net.pl org.pl edu.pl gov.pl
+com.ua org.ua net.ua edu.ua gov.ua
+com.ru org.ru net.ru
+com.pe org.pe edu.pe gob.pe
+github.io gitlab.io netlify.app vercel.app herokuapp.com pages.dev web.app firebaseapp.com
+blogspot.com wordpress.com substack.com medium.com appspot.com azurewebsites.net cloudfront.net
+s3.amazonaws.com
+*.ck !www.ck
+""".split()
+
+
+class _Node:
+    __slots__ = ("children", "rule", "wildcard", "exception")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.rule = False       # a suffix ends here
+        self.wildcard = False   # "*.<this>": any one label below is a suffix
+        self.exception = False  # "!<this>": not a suffix despite a wildcard
+
+
+class PublicSuffixTrie:
+    """
+    Public Suffix List rules in a trie keyed by reversed labels.
+
+    A lookup walks the host's labels right to left once, so finding the
+    registrable domain ("news.bbc.co.uk" -> "bbc.co.uk") costs
+    O(number of labels) dict probes however many rules are loaded.
+    Supports the list's wildcard ("*.ck") and exception ("!www.ck") rules.
+    """
+
+    def __init__(self, rules: Iterable[str] = ()):
+        self.root = _Node()
+        self.size = 0
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, rule: str) -> None:
+        rule = rule.strip().lower()
+        if not rule or rule.startswith("//"):
+            return
+        exception = rule.startswith("!")
+        labels = rule.lstrip("!").split(".")
+        wildcard = labels[0] == "*"
+        if wildcard:
+            labels = labels[1:]
+        node = self.root
+        for label in reversed(labels):
+            node = node.children.setdefault(label, _Node())
+        if exception:
+            node.exception = True
+        elif wildcard:
+            node.wildcard = True
+        else:
+            node.rule = True
+        self.size += 1
+
+    def suffix_length(self, labels: list) -> int:
+        """Number of trailing labels forming the public suffix (at least 1)."""
+        node = self.root
+        length = 1  # unlisted TLDs count as suffixes ("*" default rule)
+        for depth, label in enumerate(reversed(labels), start=1):
+            child = node.children.get(label)
+            if node.wildcard and (child is None or not child.exception):
+                length = max(length, depth)
+            if child is None:
+                break
+            if child.exception:
+                return depth - 1
+            if child.rule:
+                length = depth
+            node = child
+        return length
+
+    def public_suffix(self, host: str) -> str:
+        labels = host.lower().strip(".").split(".")
+        return ".".join(labels[-self.suffix_length(labels):])
+
+    def registrable_domain(self, host: str) -> str:
+        """Suffix plus one label; a host that is itself a suffix is returned as is."""
+        labels = host.lower().strip(".").split(".")
+        keep = self.suffix_length(labels) + 1
+        return ".".join(labels[-keep:]) if len(labels) >= keep else ".".join(labels)
+
+
+def load_rules(path: Optional[str] = PUBLIC_SUFFIX_LIST) -> Iterable[str]:
+    if path:
+        try:
+            with Path(path).open("r", encoding="utf-8") as f:
+                return [line.split()[0] for line in f if line.strip() and not line.startswith("//")]
+        except OSError as e:
+            logger.warning("Could not read public suffix list %s (%s); using built-in rules", path, e)
+    return BUILTIN_RULES
+
+
+_trie: Optional[PublicSuffixTrie] = None
+
+
+def get_public_suffixes() -> PublicSuffixTrie:
+    global _trie
+    if _trie is None:
+        _trie = PublicSuffixTrie(load_rules())
+    return _trie
+
+
+def registrable_domain(host: str) -> str:
+    """Registrable part of a host: "blog.nike.com" -> "nike.com", "news.bbc.co.uk" -> "bbc.co.uk"."""
+    return get_public_suffixes().registrable_domain(host)
@@ -0,0 +1,162 @@
+# backend/utils/rate_limiter.py
+import os
+import time
+import random
+import asyncio
+from typing import Any, Dict, List, Optional
+
+# Account limits; the limiter aims slightly below them (LLM_RATE_HEADROOM)
+LLM_RPM = float(os.getenv("LLM_RPM", "500"))
+LLM_TPM = float(os.getenv("LLM_TPM", "200000"))
+LLM_RATE_HEADROOM = float(os.getenv("LLM_RATE_HEADROOM", "0.9"))
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+
+# Rough characters-per-token ratio for English prompts
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: Optional[int], n: int = 1) -> int:
+    """Upper-bound token estimate for a request before it is sent."""
+    prompt_chars = sum(len(str(m.get("content") or "")) for m in messages)
+    # ~4 tokens of framing per message
+    prompt_tokens = prompt_chars // CHARS_PER_TOKEN + 4 * len(messages)
+    return prompt_tokens + (max_tokens or 0) * max(1, n)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read Retry-After (or retry-after-ms) from a provider error response."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Exponential backoff with full jitter, never shorter than Retry-After."""
+    ceiling = min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt))
+    jitter = random.uniform(0, ceiling)
+    if retry_after is not None:
+        return retry_after + jitter * 0.25
+    return jitter
+
+
+class TokenBucket:
+    """Classic token bucket; capacity refills at `rate` units per second."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # Requests larger than the bucket are allowed once it is full
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate if self.rate > 0 else float("inf")
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+    def give(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """
+    Client-side RPM + TPM limiter.
+
+    Every call reserves one request and an estimated token count before it
+    goes upstream; settle() corrects the token reservation with the real
+    usage (refund() gives it back when the call failed). A 429 pauses all
+    callers for Retry-After and shrinks the effective rate (multiplicative
+    decrease); successes grow it back slowly (additive increase), so
+    throughput settles just under the account limits.
+    """
+
+    MIN_SCALE = 0.2
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM, headroom: float = LLM_RATE_HEADROOM):
+        self.rpm = rpm * headroom
+        self.tpm = tpm * headroom
+        self.requests = TokenBucket(self.rpm, self.rpm / 60.0)
+        self.tokens = TokenBucket(self.tpm, self.tpm / 60.0)
+        self.scale = 1.0
+        self.blocked_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self.throttled = 0
+        self.rate_limited = 0
+
+    def _apply_scale(self) -> None:
+        self.requests.rate = self.rpm * self.scale / 60.0
+        self.tokens.rate = self.tpm * self.scale / 60.0
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # The lock keeps waiters in FIFO order so big requests are not starved
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.requests.refill(now)
+                self.tokens.refill(now)
+                wait = max(
+                    self.blocked_until - now,
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(estimated_tokens),
+                )
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(estimated_tokens)
+                    return
+                self.throttled += 1
+                await asyncio.sleep(wait)
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """After a success: return over-reserved tokens (or charge the shortfall) and grow the rate."""
+        if actual_tokens is None:
+            return
+        self.tokens.give(estimated_tokens - actual_tokens)
+        self.scale = min(1.0, self.scale + 0.02)
+        self._apply_scale()
+
+    def refund(self, estimated_tokens: int) -> None:
+        """After a failed call: return its token reservation without growing the rate."""
+        self.tokens.give(estimated_tokens)
+
+    def on_rate_limited(self, retry_after: Optional[float]) -> None:
+        self.rate_limited += 1
+        now = time.monotonic()
+        pause = retry_after if retry_after is not None else 1.0
+        # A burst of 429s from the same window only shrinks the rate once
+        if now >= self.blocked_until:
+            self.scale = max(self.MIN_SCALE, self.scale * 0.7)
+            self._apply_scale()
+        self.blocked_until = max(self.blocked_until, now + pause)
+        # Drain what is left so the resumed traffic starts from an empty bucket
+        self.requests.level = min(self.requests.level, 0)
+        self.tokens.level = min(self.tokens.level, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rpm_limit": self.rpm,
+            "tpm_limit": self.tpm,
+            "scale": round(self.scale, 3),
+            "throttled_waits": self.throttled,
+            "rate_limited": self.rate_limited,
+        }
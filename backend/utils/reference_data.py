@@ -0,0 +1,152 @@
+# backend/utils/reference_data.py
+import os
+import json
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional
+
+ROOT = Path(__file__).resolve().parents[2]  # repo root
+
+DEMO_DATA_DIR = Path(os.getenv("DEMO_DATA_DIR") or ROOT / "demo_data")
+# How often the watcher checks dataset files for changes
+REFERENCE_DATA_POLL_INTERVAL = float(os.getenv("REFERENCE_DATA_POLL_INTERVAL", "5"))
+
+logger = logging.getLogger("reference_data")
+
+
+def _freeze(value: Any) -> Any:
+    """Deep-convert parsed JSON into read-only mappings and tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _time_series(raw: Any) -> Mapping[str, Any]:
+    # Keys are domains; lowercase them so lookups are a single dict probe
+    return _freeze({str(k).lower(): v for k, v in (raw or {}).items()})
+
+
+def _citations(raw: Any) -> Any:
+    return _freeze((raw or {}).get("samples", []) if isinstance(raw, dict) else raw or [])
+
+
+class Dataset:
+    """
+    One JSON file parsed into an immutable snapshot.
+
+    Readers just take `.data`; reload() builds a complete new snapshot and
+    swaps the reference in one assignment, so a reader never sees a
+    half-loaded dataset.
+    """
+
+    def __init__(self, name: str, path: Path, transform: Callable[[Any], Any], fallback: Any):
+        self.name = name
+        self.path = path
+        self.transform = transform
+        self.fallback = _freeze(fallback)
+        self.data: Any = self.fallback
+        self.mtime: Optional[float] = None
+        self.loads = 0
+
+    def _current_mtime(self) -> Optional[float]:
+        try:
+            return self.path.stat().st_mtime
+        except OSError:
+            return None
+
+    def reload(self, force: bool = False) -> bool:
+        """Re-read the file if its mtime changed; returns True if a new snapshot was installed."""
+        mtime = self._current_mtime()
+        if not force and mtime == self.mtime:
+            return False
+        if mtime is None:
+            self.data, self.mtime = self.fallback, None
+            return True
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                snapshot = self.transform(json.load(f))
+        except Exception as e:
+            # Keep serving the previous snapshot
+            logger.warning("Could not load %s (%s): %s", self.name, self.path, e)
+            return False
+        self.data, self.mtime = snapshot, mtime
+        self.loads += 1
+        return True
+
+
+class ReferenceRegistry:
+    """Datasets loaded once and refreshed by a background mtime watcher."""
+
+    def __init__(self, data_dir: Path = DEMO_DATA_DIR):
+        self.datasets: Dict[str, Dataset] = {
+            "time_series": Dataset(
+                "time_series", data_dir / "fake_time_series.json", _time_series,
+                {"default": {"visibility": 50, "trend": [45, 47, 49, 50]}}
+            ),
+            "citations": Dataset("citations", data_dir / "fake_citations.json", _citations, []),
+        }
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._watcher: Optional[asyncio.Task] = None
+
+    def load(self) -> None:
+        with self._load_lock:
+            for dataset in self.datasets.values():
+                dataset.reload(force=True)
+            self._loaded = True
+
+    def get(self, name: str) -> Any:
+        """Current snapshot of a dataset (no disk I/O once loaded)."""
+        if not self._loaded:
+            self.load()
+        return self.datasets[name].data
+
+    def domain_trend(self, domain: str) -> Mapping[str, Any]:
+        """Demo visibility/trend for a domain, or the "default" entry."""
+        series = self.get("time_series")
+        return series.get(domain.lower()) or series.get("default") or self.datasets["time_series"].fallback["default"]
+
+    async def _watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            for dataset in self.datasets.values():
+                try:
+                    if await asyncio.to_thread(dataset.reload):
+                        logger.info("Reloaded %s from %s", dataset.name, dataset.path)
+                except Exception as e:
+                    logger.warning("Reference data watch failed for %s: %s", dataset.name, e)
+
+    async def start(self, interval: float = REFERENCE_DATA_POLL_INTERVAL) -> None:
+        await asyncio.to_thread(self.load)
+        if self._watcher is None and interval > 0:
+            self._watcher = asyncio.create_task(self._watch(interval))
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {"path": str(d.path), "mtime": d.mtime, "loads": d.loads, "entries": len(d.data)}
+            for name, d in self.datasets.items()
+        }
+
+
+_registry: Optional[ReferenceRegistry] = None
+
+
+def get_reference_data() -> ReferenceRegistry:
+    global _registry
+    if _registry is None:
+        _registry = ReferenceRegistry()
+    return _registry
@@ -0,0 +1,68 @@
+# backend/utils/singleflight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """
+    Registry of in-flight calls keyed by request identity.
+
+    Concurrent callers with the same key await one shared task instead of
+    each issuing their own upstream request. A caller that is cancelled (or
+    times out) only detaches itself; the shared task is cancelled once its
+    last waiter has gone away.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        result, _ = await self.do_shared(key, fn)
+        return result
+
+    async def do_shared(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Like do(), plus whether this caller joined a call another caller started."""
+        task = self._calls.get(key)
+        joined = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self._waiters[task] = 0
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), joined
+        except asyncio.CancelledError:
+            remaining = self._waiters.get(task, 1) - 1
+            if remaining <= 0 and not task.done():
+                # Nobody is left to read the result
+                task.cancel()
+                self.abandoned += 1
+            raise
+        finally:
+            if task in self._waiters:
+                self._waiters[task] -= 1
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        self._waiters.pop(task, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved when every waiter has left
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "inflight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+        }
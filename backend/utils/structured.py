@@ -0,0 +1,286 @@
+# backend/utils/structured.py
+import os
+import re
+import json
+from typing import List, Dict, Any, ClassVar, Optional, Tuple, Type
+
+from pydantic import BaseModel, Field, ValidationError
+
+# json_schema (schema-constrained), json_object (JSON mode) or off (prompt-only)
+STRUCTURED_OUTPUT_MODE = os.getenv("STRUCTURED_OUTPUT_MODE", "json_schema").lower()
+# Follow-up calls that only fix malformed JSON (0 = local repair only)
+STRUCTURED_REPAIR_ATTEMPTS = int(os.getenv("STRUCTURED_REPAIR_ATTEMPTS", "1"))
+
+
+# -----------------------
+# Schemas
+# -----------------------
+# Fields default to empty so partial documents validate while streaming;
+# `required_content` names the ones a finished answer must fill in.
+class BrandMissingAnalysis(BaseModel):
+    required_content: ClassVar[Tuple[str, ...]] = ("summary",)
+
+    summary: str = ""
+    missing: List[str] = Field(default_factory=list, description="Prompt types where the brand is weak or absent")
+    strong: List[str] = Field(default_factory=list, description="Prompt types where the brand is well covered")
+    citations: List[str] = Field(default_factory=list, description="Source URLs")
+
+
+class BrandPresenceAnalysis(BaseModel):
+    required_content: ClassVar[Tuple[str, ...]] = ("summary",)
+
+    summary: str = ""
+    citations: List[str] = Field(default_factory=list, description="Source URLs")
+    recommendations: List[str] = Field(default_factory=list)
+
+
+class BrandGapRow(BaseModel):
+    promptType: str
+    yourBrandScore: int = Field(ge=0, le=100)
+    competitorScore: int = Field(ge=0, le=100)
+
+
+class BrandGapAnalysis(BaseModel):
+    required_content: ClassVar[Tuple[str, ...]] = ("data",)
+
+    data: List[BrandGapRow] = Field(default_factory=list)
+
+
+class PackedAnswer(BaseModel):
+    id: int
+    answer: str
+
+
+class PackedAnswers(BaseModel):
+    required_content: ClassVar[Tuple[str, ...]] = ("answers",)
+
+    answers: List[PackedAnswer] = Field(default_factory=list)
+
+
+def response_format(schema: Type[BaseModel], mode: str = STRUCTURED_OUTPUT_MODE) -> Optional[Dict[str, Any]]:
+    """The `response_format` request parameter for a schema, or None when disabled."""
+    if mode == "json_schema":
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": schema.__name__, "schema": schema.model_json_schema()},
+        }
+    if mode == "json_object":
+        return {"type": "json_object"}
+    return None
+
+
+def schema_hint(schema: Type[BaseModel]) -> str:
+    """Compact JSON schema for prompts (JSON mode and repairs do not enforce one)."""
+    return json.dumps(schema.model_json_schema(), separators=(",", ":"))
+
+
+# -----------------------
+# Incremental parsing
+# -----------------------
+class IncrementalJSON:
+    """
+    Parses a JSON document as it streams in.
+
+    feed() tracks nesting and string state character by character and
+    remembers the last point where the prefix ended on a complete value;
+    partial() closes the open containers there (or inside an open string
+    value) to produce the structure received so far. Leading prose or code
+    fences before the first "{" or "[" are skipped.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.done = False
+        self._stack: List[str] = []
+        self._expect_key: List[bool] = []
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        self._in_scalar = False
+        self._safe: Tuple[int, str] = (0, "")
+
+    def _closers(self) -> str:
+        return "".join("}" if c == "{" else "]" for c in reversed(self._stack))
+
+    def _mark_safe(self, length: int) -> None:
+        self._safe = (length, self._closers())
+
+    def _end_scalar(self, length: int) -> None:
+        if self._in_scalar:
+            self._in_scalar = False
+            self._mark_safe(length)
+
+    def feed(self, delta: str) -> None:
+        if self.done:
+            return
+        if not self.text:
+            starts = [i for i in (delta.find("{"), delta.find("[")) if i != -1]
+            if not starts:
+                return
+            delta = delta[min(starts):]
+        base = len(self.text)
+        self.text += delta
+        for offset, ch in enumerate(delta):
+            pos = base + offset
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if not self._string_is_key:
+                        self._mark_safe(pos + 1)
+                continue
+            if ch in "{[":
+                self._stack.append(ch)
+                self._expect_key.append(ch == "{")
+            elif ch in "}]":
+                self._end_scalar(pos)
+                if self._stack:
+                    self._stack.pop()
+                    self._expect_key.pop()
+                self._mark_safe(pos + 1)
+                if not self._stack:
+                    self.done = True
+                    self.text = self.text[:pos + 1]
+                    return
+            elif ch == '"':
+                self._in_string = True
+                self._string_is_key = bool(self._expect_key) and self._expect_key[-1]
+            elif ch == ":":
+                if self._expect_key:
+                    self._expect_key[-1] = False
+            elif ch == ",":
+                self._end_scalar(pos)
+                if self._stack and self._stack[-1] == "{":
+                    self._expect_key[-1] = True
+            elif ch.isspace():
+                self._end_scalar(pos)
+            else:
+                self._in_scalar = True
+
+    def partial(self) -> Optional[Any]:
+        """Best-effort value for everything received so far (None before the first value)."""
+        if not self.text:
+            return None
+        candidates = []
+        if self.done:
+            candidates.append(self.text)
+        elif self._in_string and not self._string_is_key and "[" not in self._stack:
+            # Open strings are closed for plain fields (a summary streams in);
+            # inside lists only complete items are shown
+            candidates.append(self.text + '"' + self._closers())
+        length, closers = self._safe
+        if length:
+            candidates.append(self.text[:length] + closers)
+        for candidate in candidates:
+            try:
+                return json.loads(candidate)
+            except ValueError:
+                continue
+        return None
+
+
+# -----------------------
+# Validation and repair
+# -----------------------
+_FENCE_RE = re.compile(r"```(?:json)?", re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+def local_repair(text: str) -> Optional[Any]:
+    """
+    Fix the common ways model JSON breaks without another call: code
+    fences, prose around the object, trailing commas and truncation
+    (unclosed strings/containers are closed at the last complete value).
+    """
+    cleaned = _TRAILING_COMMA_RE.sub(r"\1", _FENCE_RE.sub("", text or ""))
+    parser = IncrementalJSON()
+    parser.feed(cleaned)
+    return parser.partial()
+
+
+def _coerce(schema: Type[BaseModel], data: Any) -> Any:
+    # A bare list is accepted for single-list schemas ({"data": [...]})
+    if isinstance(data, list):
+        lists = [name for name, f in schema.model_fields.items() if getattr(f.annotation, "__origin__", None) in (list, List)]
+        if len(lists) == 1:
+            return {lists[0]: data}
+    return data
+
+
+def _missing_content(model: BaseModel) -> Optional[str]:
+    empty = [name for name in getattr(model, "required_content", ()) if not getattr(model, name)]
+    return f"Missing content: {', '.join(empty)} must not be empty" if empty else None
+
+
+def validate(schema: Type[BaseModel], data: Any, partial: bool = False) -> Tuple[Optional[BaseModel], Optional[str]]:
+    """
+    (model, None) or (None, error). A complete answer must also fill in the
+    schema's required_content. With partial=True (a document still
+    streaming in) empty content is accepted and list items that do not
+    validate yet are dropped instead.
+    """
+    data = _coerce(schema, data)
+    try:
+        model = schema.model_validate(data)
+        if not partial:
+            missing = _missing_content(model)
+            if missing:
+                return None, missing
+        return model, None
+    except ValidationError as e:
+        if not partial or not isinstance(data, dict):
+            return None, str(e)
+    kept = {}
+    for name, value in data.items():
+        field = schema.model_fields.get(name)
+        args = getattr(field.annotation, "__args__", ()) if field else ()
+        item_model = args[0] if args and isinstance(args[0], type) and issubclass(args[0], BaseModel) else None
+        if item_model is not None and isinstance(value, list):
+            value = [v for v in value if validate(item_model, v)[0] is not None]
+        kept[name] = value
+    try:
+        return schema.model_validate(kept), None
+    except ValidationError as e:
+        return None, str(e)
+
+
+def parse(schema: Type[BaseModel], text: str, allow_dropped: bool = False) -> Tuple[Optional[BaseModel], Optional[str], bool]:
+    """
+    (model, error, repaired): strict parse first, then local_repair(). The
+    repaired document must validate as a whole; with allow_dropped=True
+    (callers that check which items came back) invalid or truncated list
+    items are dropped instead.
+    """
+    try:
+        model, error = validate(schema, json.loads(text))
+        if model is not None:
+            return model, None, False
+    except ValueError as e:
+        error = f"Invalid JSON: {e}"
+    repaired = local_repair(text)
+    if repaired is not None:
+        model, repair_error = validate(schema, repaired)
+        if model is None and allow_dropped:
+            model, _ = validate(schema, repaired, partial=True)
+            model = model if model is not None and _missing_content(model) is None else None
+        if model is not None:
+            return model, None, True
+        error = repair_error or error
+    return None, error, False
+
+
+def repair_messages(schema: Type[BaseModel], text: str, error: str) -> List[Dict[str, str]]:
+    """A short follow-up asking only to fix the JSON (no re-analysis)."""
+    return [
+        {
+            "role": "system",
+            "content": "You fix malformed JSON. Reply with corrected JSON only, keeping every value that is already present.",
+        },
+        {
+            "role": "user",
+            "content": f"JSON schema: {schema_hint(schema)}\n\nValidation error: {error[:500]}\n\nJSON to fix:\n{text}",
+        },
+    ]
@@ -0,0 +1,128 @@
+# backend/utils/text_index.py
+import re
+import bisect
+from collections import deque
+from functools import lru_cache
+from typing import List, Dict, Iterable, Set, Tuple
+
+# Default proximity window, in tokens (~150 characters of English)
+PROXIMITY_WINDOW = 25
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+class PatternMatcher:
+    """
+    Aho-Corasick automaton over lowercased patterns.
+
+    One pass over the text reports every occurrence of every pattern, so
+    the cost is O(len(text) + matches) no matter how many patterns there are.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = list(dict.fromkeys(p.lower() for p in patterns if p))
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        for pid, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(pid)
+
+        # Breadth-first fail links; outputs inherit their fail state's outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                if state:
+                    fail = self._fail[state]
+                    while fail and ch not in self._goto[fail]:
+                        fail = self._fail[fail]
+                    self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def finditer(self, text: str) -> Iterable[Tuple[int, int]]:
+        """Yield (start offset, pattern id) for every match in already-lowercased text."""
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pid in out[state]:
+                yield i - len(patterns[pid]) + 1, pid
+
+
+@lru_cache(maxsize=256)
+def compile_patterns(patterns: Tuple[str, ...]) -> PatternMatcher:
+    """Shared automaton for a fixed pattern set (keyword lists are reused across requests)."""
+    return PatternMatcher(patterns)
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class TextIndex:
+    """
+    Positional index of one answer: where each pattern occurs, in tokens.
+
+    Built in a single pass; afterwards occurrence and proximity questions
+    are answered from the sorted position lists without rescanning text.
+    Matches must start and end on word boundaries, so "good" does not
+    match inside "goodwill" and "nike.com" does not match "mynike.com".
+    """
+
+    def __init__(self, text: str, patterns: Iterable[str]):
+        self.text = (text or "").lower()
+        matcher = compile_patterns(tuple(sorted({p.lower() for p in patterns if p})))
+        starts = [m.start() for m in TOKEN_RE.finditer(self.text)]
+        self.token_count = len(starts)
+        self.positions: Dict[str, List[int]] = {p: [] for p in matcher.patterns}
+
+        text_len = len(self.text)
+        for offset, pid in matcher.finditer(self.text):
+            pattern = matcher.patterns[pid]
+            end = offset + len(pattern)
+            if offset > 0 and _is_word_char(self.text[offset - 1]) and _is_word_char(pattern[0]):
+                continue
+            if end < text_len and _is_word_char(self.text[end]) and _is_word_char(pattern[-1]):
+                continue
+            token = max(0, bisect.bisect_right(starts, offset) - 1)
+            self.positions[pattern].append(token)
+
+    def occurrences(self, pattern: str) -> List[int]:
+        return self.positions.get(pattern.lower(), [])
+
+    def count(self, pattern: str) -> int:
+        return len(self.occurrences(pattern))
+
+    def contains(self, pattern: str) -> bool:
+        return bool(self.occurrences(pattern))
+
+    def any(self, patterns: Iterable[str]) -> bool:
+        return any(self.contains(p) for p in patterns)
+
+    def _near(self, anchors: List[int], position: int, window: int) -> bool:
+        i = bisect.bisect_left(anchors, position - window)
+        return i < len(anchors) and anchors[i] <= position + window
+
+    def near(self, anchor: str, patterns: Iterable[str], window: int = PROXIMITY_WINDOW) -> Set[str]:
+        """The subset of `patterns` that occur within `window` tokens of `anchor`."""
+        anchors = self.occurrences(anchor)
+        if not anchors:
+            return set()
+        return {
+            p for p in patterns
+            if any(self._near(anchors, position, window) for position in self.occurrences(p))
+        }
@@ -0,0 +1,262 @@
+# backend/utils/timeseries.py
+import os
+import mmap
+import time
+import struct
+import bisect
+import hashlib
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer only
+    fcntl = None
+
+HERE = Path(__file__).resolve().parent.parent  # backend/
+
+TIMESERIES_PATH = Path(os.getenv("TIMESERIES_PATH") or HERE / ".cache" / "timeseries")
+# Raw points per segment file (16 bytes each)
+TIMESERIES_SEGMENT_POINTS = int(os.getenv("TIMESERIES_SEGMENT_POINTS", "65536"))
+# Upper bound on points returned when resolution="auto"
+TIMESERIES_MAX_POINTS = int(os.getenv("TIMESERIES_MAX_POINTS", "500"))
+
+# Downsampled tiers, maintained on every append
+TIERS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+
+RAW = struct.Struct("<dd")    # ts, value
+TIER = struct.Struct("<ddd")  # bucket start, count, sum
+
+
+class _Column:
+    """Read-only sequence view of one field of fixed-size records in a mmap (for bisect)."""
+
+    def __init__(self, buf, record: struct.Struct, field: int = 0):
+        self.buf = buf
+        self.record = record
+        self.field = field
+        self.length = len(buf) // record.size
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, i: int) -> float:
+        return self.record.unpack_from(self.buf, i * self.record.size)[self.field]
+
+
+@contextmanager
+def _mapped(path: Path):
+    """mmap a file read-only; yields b"" for missing or empty files."""
+    try:
+        f = path.open("rb")
+    except FileNotFoundError:
+        yield b""
+        return
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            yield b""
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mm
+        finally:
+            mm.close()
+
+
+class TimeSeriesStore:
+    """
+    Append-only numeric time series on disk, one directory per series.
+
+    Raw points go to fixed-size segment files (raw-000000.seg, ...); every
+    append also folds the point into hour/day/week tier files, each a
+    sorted array of (bucket, count, sum) records whose last record is
+    updated in place. Queries mmap only the files they need and bisect to
+    the requested range, so reading a month of daily points never touches
+    raw history.
+
+    Series names look like "domain:nike.com" or "brand:Nike". Points within
+    a series are kept in time order: a point older than the last one is
+    stored at the last timestamp.
+    """
+
+    def __init__(self, root: Path = TIMESERIES_PATH, segment_points: int = TIMESERIES_SEGMENT_POINTS):
+        self.root = root
+        self.segment_points = segment_points
+        self._lock = threading.Lock()
+        root.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, series: str) -> Path:
+        kind, _, name = series.partition(":")
+        shard = hashlib.sha1(series.encode("utf-8")).hexdigest()[:2]
+        return self.root / quote(kind, safe="") / shard / quote(name, safe="")
+
+    @staticmethod
+    def _segments(directory: Path) -> List[Path]:
+        return sorted(directory.glob("raw-*.seg"))
+
+    # -----------------------
+    # Writes
+    # -----------------------
+    def append(self, points: Iterable[Tuple[str, float, float]]) -> int:
+        """Append (series, ts, value) points; grouped so each series is opened once."""
+        by_series: Dict[str, List[Tuple[float, float]]] = {}
+        for series, ts, value in points:
+            by_series.setdefault(series, []).append((ts, value))
+        with self._lock:
+            for series, rows in by_series.items():
+                self._append_series(series, sorted(rows))
+        return sum(len(rows) for rows in by_series.values())
+
+    def _append_series(self, series: str, rows: List[Tuple[float, float]]) -> None:
+        directory = self._dir(series)
+        directory.mkdir(parents=True, exist_ok=True)
+        with (directory / ".lock").open("a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            segments = self._segments(directory)
+            current = segments[-1] if segments else directory / "raw-000000.seg"
+            last_ts = self._last_ts(current)
+            rows = [(max(ts, last_ts), value) for ts, value in rows]
+
+            while rows:
+                used = current.stat().st_size // RAW.size if current.exists() else 0
+                if used >= self.segment_points:
+                    current = directory / f"raw-{int(current.stem[4:]) + 1:06d}.seg"
+                    used = 0
+                take = rows[:self.segment_points - used]
+                with current.open("ab") as f:
+                    f.write(b"".join(RAW.pack(ts, value) for ts, value in take))
+                for tier, width in TIERS.items():
+                    self._fold(directory / f"{tier}.tier", width, take)
+                rows = rows[len(take):]
+
+    @staticmethod
+    def _last_ts(segment: Path) -> float:
+        try:
+            with segment.open("rb") as f:
+                f.seek(-RAW.size, os.SEEK_END)
+                return RAW.unpack(f.read(RAW.size))[0]
+        except (FileNotFoundError, OSError):
+            return float("-inf")
+
+    @staticmethod
+    def _fold(path: Path, width: int, rows: List[Tuple[float, float]]) -> None:
+        """Merge time-ordered points into a tier file, rewriting only its last record."""
+        buckets: List[List[float]] = []
+        for ts, value in rows:
+            start = (ts // width) * width
+            if buckets and buckets[-1][0] == start:
+                buckets[-1][1] += 1
+                buckets[-1][2] += value
+            else:
+                buckets.append([start, 1, value])
+
+        with path.open("a+b") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size >= TIER.size:
+                f.seek(size - TIER.size)
+                last = TIER.unpack(f.read(TIER.size))
+                if last[0] == buckets[0][0]:
+                    buckets[0][1] += last[1]
+                    buckets[0][2] += last[2]
+                    f.truncate(size - TIER.size)
+            f.seek(0, os.SEEK_END)
+            f.write(b"".join(TIER.pack(*b) for b in buckets))
+
+    # -----------------------
+    # Queries
+    # -----------------------
+    @staticmethod
+    def pick_resolution(start: float, end: float, max_points: int = TIMESERIES_MAX_POINTS) -> str:
+        """Finest tier that keeps the range under max_points buckets."""
+        span = max(0.0, end - start)
+        for tier, width in TIERS.items():
+            if span / width <= max_points:
+                return tier
+        return "week"
+
+    def query(
+        self,
+        series: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        resolution: str = "auto"
+    ) -> List[Dict[str, Any]]:
+        """
+        Points in [start, end) at `resolution` ("raw", "hour", "day", "week"
+        or "auto"). Tier points are {"t", "count", "sum", "mean"}; raw points
+        are {"t", "value"}.
+        """
+        end = time.time() if end is None else end
+        start = end - 30 * 86400 if start is None else start
+        if resolution == "auto":
+            resolution = self.pick_resolution(start, end)
+        directory = self._dir(series)
+
+        if resolution == "raw":
+            points = []
+            for segment in self._segments(directory):
+                with _mapped(segment) as buf:
+                    column = _Column(buf, RAW)
+                    if not len(column) or column[len(column) - 1] < start:
+                        continue
+                    if column[0] >= end:
+                        break
+                    for i in range(bisect.bisect_left(column, start), bisect.bisect_left(column, end)):
+                        ts, value = RAW.unpack_from(buf, i * RAW.size)
+                        points.append({"t": ts, "value": value})
+            return points
+
+        if resolution not in TIERS:
+            raise ValueError(f"Invalid resolution: {resolution}. Valid: raw, auto, {', '.join(TIERS)}")
+        width = TIERS[resolution]
+        with _mapped(directory / f"{resolution}.tier") as buf:
+            column = _Column(buf, TIER)
+            lo = bisect.bisect_left(column, (start // width) * width)
+            hi = bisect.bisect_left(column, end)
+            points = []
+            for i in range(lo, hi):
+                bucket, count, total = TIER.unpack_from(buf, i * TIER.size)
+                points.append({"t": bucket, "count": int(count), "sum": total, "mean": total / count if count else 0.0})
+        return points
+
+    def share(
+        self,
+        series: str,
+        total_series: str = "answers:all",
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        resolution: str = "auto"
+    ) -> List[Dict[str, Any]]:
+        """
+        Per-bucket share (0-100) of `total_series` events also counted in
+        `series`, e.g. the percentage of answers that cite a domain.
+        Buckets without any total are skipped.
+        """
+        if resolution == "raw":
+            raise ValueError("Shares need a tier resolution")
+        end = time.time() if end is None else end
+        start = end - 30 * 86400 if start is None else start
+        if resolution == "auto":
+            resolution = self.pick_resolution(start, end)
+        hits = {p["t"]: p["count"] for p in self.query(series, start, end, resolution)}
+        return [
+            {"t": p["t"], "count": hits.get(p["t"], 0), "total": p["count"],
+             "share": round(100 * hits.get(p["t"], 0) / p["count"], 1)}
+            for p in self.query(total_series, start, end, resolution) if p["count"]
+        ]
+
+
+_store: Optional[TimeSeriesStore] = None
+
+
+def get_timeseries() -> TimeSeriesStore:
+    global _store
+    if _store is None:
+        _store = TimeSeriesStore()
+    return _store
@@ -0,0 +1,185 @@
+# backend/utils/visibility.py
+import os
+import math
+from typing import Dict, Any, Optional, Tuple
+
+from .ai_client import complete_samples
+from .citation_store import record_result
+from .brand_match import cites_brand
+from .brand_aliases import brand_matcher
+from .citation_extract import citation_urls
+
+VISIBILITY_MAX_SAMPLES = int(os.getenv("VISIBILITY_MAX_SAMPLES", "20"))
+VISIBILITY_BATCH_SIZE = int(os.getenv("VISIBILITY_BATCH_SIZE", "5"))
+# Stop once every tracked rate is known to within +/- this much
+VISIBILITY_TARGET_HALF_WIDTH = float(os.getenv("VISIBILITY_TARGET_HALF_WIDTH", "0.15"))
+# Heatmaps are served from stored rollups once every cell has this many answers
+VISIBILITY_ROLLUP_MIN_ANSWERS = int(os.getenv("VISIBILITY_ROLLUP_MIN_ANSWERS", "5"))
+VISIBILITY_ROLLUP_DAYS = int(os.getenv("VISIBILITY_ROLLUP_DAYS", "30"))
+# Deadline (seconds) for one sampled heatmap; past it the single-estimate path is used
+VISIBILITY_SAMPLING_TIMEOUT = float(os.getenv("VISIBILITY_SAMPLING_TIMEOUT", "60"))
+
+# Sampling prompts per prompt type. Unlike PROMPT_TEMPLATES they never name
+# the brand: an answer to "How to use Nike for ...?" mentions Nike no matter
+# how visible it really is, so the mention rate would measure nothing.
+SAMPLING_PROMPTS = {
+    "how-to": "How do I get started with {topic}? Which tools or brands should I use?",
+    "comparison": "Compare the leading brands for {topic}.",
+    "definition": "What are the main products and brands in {topic}?",
+    "use-case": "What are the best tools or brands for common {topic} use cases?",
+    "benefits": "Which brands offer the biggest benefits for {topic}?",
+    "problem-solution": "What are the best solutions to common problems in {topic}?",
+    "reviews": "Which brands for {topic} get the best user reviews?",
+    "pricing": "How does pricing compare across the main brands for {topic}?",
+    "alternatives": "What are the best options for {topic}?",
+    "tutorial": "Step-by-step guide to getting started with {topic}: which brands or tools should I use?",
+}
+
+
+def sampling_prompt(prompt_type: str, topic: str) -> str:
+    """Brand-neutral prompt for a prompt type (free-text topics are asked about directly)."""
+    if prompt_type in SAMPLING_PROMPTS:
+        return SAMPLING_PROMPTS[prompt_type].format(topic=topic)
+    return f"What are the best resources and brands for {prompt_type}?"
+
+
+def wilson_interval(successes: int, trials: int, z: float = 1.96) -> Tuple[float, float]:
+    """95% Wilson score interval for a binomial proportion."""
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denom = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denom
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denom
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def _rate(successes: int, trials: int) -> Dict[str, Any]:
+    low, high = wilson_interval(successes, trials)
+    return {
+        "rate": round(successes / trials, 4) if trials else 0.0,
+        "ci_low": round(low, 4),
+        "ci_high": round(high, 4),
+        "successes": successes
+    }
+
+
+async def sample_visibility(
+    prompt: str,
+    brand: str,
+    competitor: Optional[str] = None,
+    max_samples: int = VISIBILITY_MAX_SAMPLES,
+    batch_size: int = VISIBILITY_BATCH_SIZE,
+    target_half_width: float = VISIBILITY_TARGET_HALF_WIDTH,
+    model: str = "gpt-4o-mini",
+    max_tokens: int = 300,
+    prompt_type: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Estimate how often answers to `prompt` mention / cite the brand (and the
+    competitor, if given).
+
+    Samples are drawn `batch_size` at a time with one n-choice call each;
+    sampling stops early once all tracked rates have a 95% interval no wider
+    than +/- target_half_width, or after max_samples answers. Every sampled
+    answer is stored (source "sampling") under `prompt_type`, which is what
+    the visibility rollups are built from.
+
+    Returns:
+        Dict with samples, calls, tokens_used and per-metric rate/ci_low/ci_high
+    """
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant. Cite URLs when applicable."},
+        {"role": "user", "content": prompt}
+    ]
+    matcher = brand_matcher([brand, competitor] if competitor else [brand])
+
+    counts = {"brand_mentions": 0, "brand_citations": 0, "competitor_mentions": 0, "competitor_citations": 0}
+    samples = 0
+    calls = 0
+    tokens_used = 0
+    converged = False
+
+    while samples < max_samples:
+        n = min(batch_size, max_samples - samples)
+        drawn = await complete_samples(messages, n=n, model=model, max_tokens=max_tokens, temperature=0.7)
+        calls += 1
+        tokens_used += drawn["tokens_used"] or 0
+        if not drawn["texts"]:
+            break
+        share = round(drawn["tokens_used"] / len(drawn["texts"])) if drawn["tokens_used"] else None
+        for text, mentions in zip(drawn["texts"], matcher.scan_many(drawn["texts"])):
+            urls = citation_urls(text)
+            record_result(
+                {"prompt": prompt, "response": text, "citations": urls, "model": model, "tokens_used": share},
+                brand, prompt_type, source="sampling"
+            )
+            samples += 1
+            counts["brand_mentions"] += bool(mentions[brand]["count"])
+            counts["brand_citations"] += cites_brand(urls, brand)
+            if competitor:
+                counts["competitor_mentions"] += bool(mentions[competitor]["count"])
+                counts["competitor_citations"] += cites_brand(urls, competitor)
+
+        tracked = ["brand_mentions", "brand_citations"]
+        if competitor:
+            tracked += ["competitor_mentions", "competitor_citations"]
+        widths = []
+        for metric in tracked:
+            low, high = wilson_interval(counts[metric], samples)
+            widths.append((high - low) / 2)
+        if max(widths) <= target_half_width:
+            converged = True
+            break
+
+    result = {
+        "prompt": prompt,
+        "samples": samples,
+        "calls": calls,
+        "tokens_used": tokens_used,
+        "converged": converged,
+        "brand_mention": _rate(counts["brand_mentions"], samples),
+        "brand_citation": _rate(counts["brand_citations"], samples),
+    }
+    if competitor:
+        result["competitor_mention"] = _rate(counts["competitor_mentions"], samples)
+        result["competitor_citation"] = _rate(counts["competitor_citations"], samples)
+    return result
+
+
+def heatmap_cell(prompt_type: str, estimate: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a sample_visibility() estimate into a GapHeatmap row."""
+    cell = {
+        "promptType": prompt_type,
+        "yourBrandScore": round(estimate["brand_mention"]["rate"] * 100),
+        "yourBrandCI": [round(estimate["brand_mention"]["ci_low"] * 100), round(estimate["brand_mention"]["ci_high"] * 100)],
+        "yourBrandCitationRate": estimate["brand_citation"]["rate"],
+        "samples": estimate["samples"],
+    }
+    if "competitor_mention" in estimate:
+        cell["competitorScore"] = round(estimate["competitor_mention"]["rate"] * 100)
+        cell["competitorCI"] = [
+            round(estimate["competitor_mention"]["ci_low"] * 100),
+            round(estimate["competitor_mention"]["ci_high"] * 100)
+        ]
+        cell["competitorCitationRate"] = estimate["competitor_citation"]["rate"]
+    return cell
+
+
+def rollup_cell(prompt_type: str, counts: Dict[str, int], has_competitor: bool = True) -> Dict[str, Any]:
+    """Turn CitationStore.heatmap() counts for one prompt type into a GapHeatmap row."""
+    answers = counts["answers"]
+    brand = _rate(counts["brand_mentions"], answers)
+    cell = {
+        "promptType": prompt_type,
+        "yourBrandScore": round(brand["rate"] * 100),
+        "yourBrandCI": [round(brand["ci_low"] * 100), round(brand["ci_high"] * 100)],
+        "yourBrandCitationRate": _rate(counts["brand_citations"], answers)["rate"],
+        "samples": answers,
+    }
+    if has_competitor:
+        competitor = _rate(counts["competitor_mentions"], answers)
+        cell["competitorScore"] = round(competitor["rate"] * 100)
+        cell["competitorCI"] = [round(competitor["ci_low"] * 100), round(competitor["ci_high"] * 100)]
+        cell["competitorCitationRate"] = _rate(counts["competitor_citations"], answers)["rate"]
+    return cell